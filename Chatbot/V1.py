@@ -1,5 +1,18 @@
 import tkinter as tk
 import random
+import uuid
+
+try:
+    from .keyword_index import KeywordIndex
+    from .transcript_log import writer_from_environment
+except ImportError:  # run as a script from this folder
+    from keyword_index import KeywordIndex
+    from transcript_log import writer_from_environment
+
+# Writer keeping a copy of the conversation, set up by main() when
+# CHATBOT_TRANSCRIPT_DIR names a directory
+transcript = None
+session_id = uuid.uuid4().hex
 
 # Function to get a random agent name from a predefined list
 def get_agent_name():
@@ -14,26 +27,33 @@ def handle_user_input(event=None):
         window.quit()  # Close the application
     else:
         response = generate_response(user_input)  # Generate a response based on user input
+        if transcript is not None:
+            transcript.append(session_id, "user", user_input)
+            transcript.append(session_id, "bot", response)
         chat_log.config(state=tk.NORMAL)  # Enable chat log to insert new text
         chat_log.insert(tk.END, f"User: {user_input}\n{chatbot_name}: {response}\n\n")  # Display user input and agent response
         chat_log.config(state=tk.DISABLED)  # Disable chat log to prevent user editing
 
         entry.delete(0, tk.END)  # Clear the entry field for new input
 
+# Predefined responses based on specific keywords
+responses = {
+    "coffee": "The campus coffee bar opens from 8:00 AM to 5:00 PM",
+    "library": "The library is open from 9:00 AM to 6:00 PM",
+    "admission": "For Admission inquiries, please visit our admission page",
+    "admissions": "For Admission inquiries, please visit our admission page",
+    "courses": "You can check the available courses in the student portal"
+}
+
+# Index the keywords once so lookups don't loop over every keyword
+keyword_index = KeywordIndex(responses)
+
 # Function to generate a response based on user input
 def generate_response(user_input):
-    # Predefined responses based on specific keywords
-    responses = {
-        "coffee": "The campus coffee bar opens from 8:00 AM to 5:00 PM",
-        "library": "The library is open from 9:00 AM to 6:00 PM",
-        "admission": "For Admission inquiries, please visit our admission page",
-        "courses": "You can check the available courses in the student portal"
-    }
-
     # Check if any keyword from the responses is in the user input
-    for keyword, response in responses.items():
-        if keyword.lower() in user_input.lower():
-            return response  # Return the corresponding response if a keyword is found
+    keyword = keyword_index.best_match(user_input)
+    if keyword is not None:
+        return responses[keyword]  # Return the corresponding response if a keyword is found
 
     # If no keywords match, return a random generic response
     random_responses = [
@@ -61,42 +81,55 @@ def handle_name_submission(event=None):
     entry.pack()  # Show the user input entry field
     submit_button.pack()  # Show the submit button
 
-# Create the main application window
-window = tk.Tk()
-window.title("Samaaye Interactive Bot")  # Set the title of the window
+# Build the application window; handlers above reach the widgets as globals
+def main():
+    global window, chat_log, name_entry, chatbot_name_entry, name_submit_button, entry, submit_button, transcript
+
+    # Create the main application window
+    window = tk.Tk()
+    window.title("Samaaye Interactive Bot")  # Set the title of the window
+
+    # Create a text area for displaying the chat log
+    chat_log = tk.Text(window, state=tk.DISABLED, height=20, width=50)
+    chat_log.pack()
+
+    # Create a label to prompt the user to enter their name
+    name_label = tk.Label(window, text="What should I address you as?")
+    name_label.pack()
 
-# Create a text area for displaying the chat log
-chat_log = tk.Text(window, state=tk.DISABLED, height=20, width=50)
-chat_log.pack()
+    # Create an entry field for the user to enter their name
+    name_entry = tk.Entry(window, width=50)
+    name_entry.pack()
+    name_entry.bind("<Return>", handle_name_submission)  # Bind Enter key to name submission
 
-# Create a label to prompt the user to enter their name
-name_label = tk.Label(window, text="What should I address you as?")
-name_label.pack()
+    # Create a label to prompt the user to enter the chatbot's name
+    chatbot_name_label = tk.Label(window, text="Will you give me a name?")
+    chatbot_name_label.pack()
 
-# Create an entry field for the user to enter their name
-name_entry = tk.Entry(window, width=50)
-name_entry.pack()
-name_entry.bind("<Return>", handle_name_submission)  # Bind Enter key to name submission
+    # Create an entry field for the user to enter the chatbot's name
+    chatbot_name_entry = tk.Entry(window, width=50)
+    chatbot_name_entry.pack()
+    chatbot_name_entry.bind("<Return>", handle_name_submission)  # Bind Enter key to chatbot name submission
 
-# Create a label to prompt the user to enter the chatbot's name
-chatbot_name_label = tk.Label(window, text="Will you give me a name?")
-chatbot_name_label.pack()
+    # Create a button that triggers the handle_name_submission function when clicked
+    name_submit_button = tk.Button(window, text="Submit Name", command=handle_name_submission)
+    name_submit_button.pack()
 
-# Create an entry field for the user to enter the chatbot's name
-chatbot_name_entry = tk.Entry(window, width=50)
-chatbot_name_entry.pack()
-chatbot_name_entry.bind("<Return>", handle_name_submission)  # Bind Enter key to chatbot name submission
+    # Create an entry field for user input (initially hidden)
+    entry = tk.Entry(window, width=50)
+    entry.bind("<Return>", handle_user_input)  # Bind Enter key to user input submission
 
-# Create a button that triggers the handle_name_submission function when clicked
-name_submit_button = tk.Button(window, text="Submit Name", command=handle_name_submission)
-name_submit_button.pack()
+    # Create a button that triggers the handle_user_input function when clicked (initially hidden)
+    submit_button = tk.Button(window, text="Ask", command=handle_user_input)
 
-# Create an entry field for user input (initially hidden)
-entry = tk.Entry(window, width=50)
-entry.bind("<Return>", handle_user_input)  # Bind Enter key to user input submission
+    # Keep a transcript if a directory for one is configured
+    transcript = writer_from_environment()
 
-# Create a button that triggers the handle_user_input function when clicked (initially hidden)
-submit_button = tk.Button(window, text="Ask", command=handle_user_input)
+    # Start the main event loop of the application
+    window.mainloop()
+    if transcript is not None:
+        transcript.close()
 
-# Start the main event loop of the application
-window.mainloop()
\ No newline at end of file
+# Entry point for the application
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Samaaye Interactive Bot: the response engine plus optional GUI and server front ends.
+
+Importing the package only loads the engine. The tkinter GUIs and the
+server are imported the first time one of their names is used, so a
+worker process can use the engine without a display.
+"""
+from .chatbot_logic import (
+    ChatSession,
+    IntentEngine,
+    generate_response,
+    generate_responses,
+    get_default_engine,
+    get_random_agent_name
+)
+from .instrumentation import Instrumentation
+from .session_store import MemorySessionStore, SQLiteSessionStore, SessionState
+
+# Names loaded on first use, mapped to the module that defines them
+LAZY_ATTRIBUTES = {
+    "AdmissionController": "admission",
+    "ModernChatbotGUI": "chatbot_gui",
+    "ChatServer": "chat_server",
+    "PreforkServer": "prefork",
+    "ReloadingEngine": "hot_reload",
+    "TranscriptWriter": "transcript_log",
+    "read_transcripts": "transcript_log"
+}
+
+
+def __getattr__(name):
+    module_name = LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+    value = getattr(import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+__all__ = [
+    "AdmissionController",
+    "ChatServer",
+    "ChatSession",
+    "Instrumentation",
+    "IntentEngine",
+    "MemorySessionStore",
+    "ModernChatbotGUI",
+    "PreforkServer",
+    "ReloadingEngine",
+    "SQLiteSessionStore",
+    "SessionState",
+    "TranscriptWriter",
+    "generate_response",
+    "generate_responses",
+    "get_default_engine",
+    "get_random_agent_name",
+    "read_transcripts"
+]
@@ -0,0 +1,206 @@
+import asyncio
+from collections import OrderedDict, deque
+from concurrent.futures import Executor
+import time
+from typing import Callable, Deque, Dict, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Clients whose token buckets are remembered; past this the one seen least
+# recently is forgotten, and starts with a full bucket if it comes back
+MAX_CLIENTS = 100000
+
+
+class Rejected(Exception):
+    """Raised when a request is turned away instead of being queued."""
+
+    def __init__(self, status: int, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Allows rate requests a second on average, in bursts of up to burst."""
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now: float) -> bool:
+        """Spend a token if there's one, refilling for the time since the last call first."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+    def wait_time(self) -> float:
+        """Seconds until the next token, as of the last call to take()."""
+        return max(0.0, (1.0 - self.tokens) / self.rate)
+
+
+class AdmissionController:
+    """Decides for each request whether to answer it in full, answer it cheaply or turn it away.
+
+    Each client gets a token bucket of rate requests a second with bursts
+    of burst, and a request beyond it is refused with 429. Admitted
+    requests wait in one queue for the engine and are taken in arrival
+    order by up to workers at once, with the event loop let go between
+    answers, so new requests are still read (and refused cheaply) while
+    the queue drains. With max_pending already waiting, new requests are
+    refused with 503. A request still queued deadline seconds after it
+    arrived, or taken while degrade_at or more wait behind it, gets the
+    cheap answer instead of the full one. The counters say how often each
+    happened, for sizing capacity. Given an executor, full answers are
+    worked out on it so the loop isn't held up by a slow one, and workers
+    should match its threads; cheap answers are quick enough to run on
+    the loop. ChatServer hands over its engine threads.
+    """
+
+    def __init__(
+        self,
+        rate: Optional[float] = None,
+        burst: Optional[float] = None,
+        max_pending: int = 1000,
+        deadline: Optional[float] = 1.0,
+        degrade_at: Optional[int] = None,
+        max_clients: int = MAX_CLIENTS,
+        clock: Callable[[], float] = time.monotonic,
+        executor: Optional[Executor] = None,
+        workers: Optional[int] = None
+    ):
+        if rate is not None and rate <= 0:
+            raise ValueError("rate must be positive")
+        if burst is not None and burst < 1:
+            raise ValueError("burst must be at least 1")
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate or 0.0)
+        self.max_pending = max_pending
+        self.deadline = deadline
+        self.degrade_at = degrade_at if degrade_at is not None else max(1, max_pending // 2)
+        self.max_clients = max_clients
+        self.clock = clock
+        self.executor = executor
+        # Requests answered at once; None for one, or as many as the
+        # engine threads when ChatServer hands them over
+        self.workers = workers
+        self.buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        # Requests waiting for the engine: when each expires, its full and
+        # cheap answers, and the future its caller is waiting on
+        self.queue: Deque[Tuple[float, Callable, Callable, asyncio.Future]] = deque()
+        # Worker tasks taking requests off the queue; each one stops when
+        # it finds the queue empty
+        self.running = 0
+
+        self.admitted = 0
+        self.answered = 0
+        self.degraded = 0
+        self.rate_limited = 0
+        self.shed = 0
+        self.abandoned = 0
+
+    def check_rate(self, client: str, now: float):
+        """Spend one of client's tokens, raising Rejected if it has none."""
+        bucket = self.buckets.get(client)
+        if bucket is None:
+            bucket = self.buckets[client] = TokenBucket(self.rate, self.burst, now)
+            if len(self.buckets) > self.max_clients:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(client)
+        if not bucket.take(now):
+            self.rate_limited += 1
+            raise Rejected(429, "too many requests", bucket.wait_time())
+
+    async def submit(self, client: str, full: Callable[[], T], cheap: Callable[[], T]) -> Tuple[T, bool]:
+        """Queue a request from client and return its answer and whether it's the cheap one.
+
+        full is called on the executor, if there is one, and cheap on the
+        event loop when the request's turn comes. Raises Rejected if the client is over its rate
+        or the queue is full.
+        """
+        now = self.clock()
+        if self.rate is not None:
+            self.check_rate(client, now)
+        if len(self.queue) >= self.max_pending:
+            self.shed += 1
+            raise Rejected(503, "server overloaded", self.deadline or 1.0)
+
+        self.admitted += 1
+        future = asyncio.get_running_loop().create_future()
+        expires = now + self.deadline if self.deadline is not None else float("inf")
+        self.queue.append((expires, full, cheap, future))
+        if self.running < (self.workers or 1):
+            self.running += 1
+            asyncio.ensure_future(self.work())
+        return await future
+
+    async def work(self):
+        """Answer queued requests one at a time until the queue is empty, alongside the other workers."""
+        loop = asyncio.get_running_loop()
+        try:
+            while self.queue:
+                expires, full, cheap, future = self.queue.popleft()
+                # The client went away while it waited
+                if future.done():
+                    self.abandoned += 1
+                    continue
+                degraded = len(self.queue) >= self.degrade_at or self.clock() > expires
+                try:
+                    if degraded:
+                        result = cheap()
+                    elif self.executor is None:
+                        result = full()
+                    else:
+                        result = await loop.run_in_executor(self.executor, full)
+                except Exception as error:
+                    if not future.done():
+                        future.set_exception(error)
+                else:
+                    if not future.done():
+                        future.set_result((result, degraded))
+                if degraded:
+                    self.degraded += 1
+                else:
+                    self.answered += 1
+                # Let the loop read new requests before answering the next one
+                await asyncio.sleep(0)
+        finally:
+            self.running -= 1
+
+    def metrics(self) -> Dict[str, object]:
+        """Return the admission counters and the current queue length."""
+        return {
+            "admitted": self.admitted,
+            "answered": self.answered,
+            "degraded": self.degraded,
+            "rate_limited": self.rate_limited,
+            "shed": self.shed,
+            "abandoned": self.abandoned,
+            "pending": len(self.queue),
+            "max_pending": self.max_pending
+        }
+
+    def prometheus_text(self, prefix: str = "chatbot") -> str:
+        """Return the counters in the Prometheus text exposition format."""
+        lines = []
+        for name, help_text, value in (
+            ("admitted_total", "Requests let into the queue.", self.admitted),
+            ("answered_total", "Queued requests given the full answer.", self.answered),
+            ("degraded_total", "Queued requests given the cheap answer because of the queue or their deadline.", self.degraded),
+            ("rate_limited_total", "Requests refused for being over their client's rate.", self.rate_limited),
+            ("shed_total", "Requests refused because the queue was full.", self.shed),
+            ("abandoned_total", "Queued requests whose client left before their turn.", self.abandoned)
+        ):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            lines.append(f"{prefix}_{name} {value}")
+        lines.append(f"# HELP {prefix}_pending_requests Requests waiting for the engine.")
+        lines.append(f"# TYPE {prefix}_pending_requests gauge")
+        lines.append(f"{prefix}_pending_requests {len(self.queue)}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,148 @@
+"""Time the GUI's add_message path and chat log rendering under a real Tk.
+
+Without a DISPLAY the script starts its own Xvfb server, so it runs on
+headless machines (or run it under xvfb-run). Four cases are timed:
+adding messages one at a time with the window updated after each, as a
+conversation does; adding a whole batch before a single update; bulk
+inserting a batch with add_messages until every queued message is laid
+out; and scrolling from the top of the filled log back to the bottom.
+
+No GUI baseline is committed, as it depends on the display server as much
+as the machine; record one with --save where you'll compare against it.
+
+Usage: python Chatbot/benchmarks/bench_gui.py [--messages N] [--save FILE]
+       [--compare FILE] [--tolerance 0.1]
+"""
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import time
+
+from corpora import HIT_MESSAGES, long_inputs
+from reporting import compare_baseline, print_table, save_baseline, summarise
+
+# Directory holding the Chatbot package
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+COLUMNS = ("p50_us", "p99_us", "mean_us", "per_second")
+
+# Seconds to wait for a freshly started Xvfb to accept connections
+XVFB_STARTUP_TIMEOUT = 10.0
+
+
+def start_xvfb():
+    """Start Xvfb on a free display number and point DISPLAY at it; return the process."""
+    if shutil.which("Xvfb") is None:
+        sys.exit("No DISPLAY and Xvfb isn't installed; install it or run under xvfb-run")
+    for number in range(99, 199):
+        if os.path.exists(f"/tmp/.X11-unix/X{number}") or os.path.exists(f"/tmp/.X{number}-lock"):
+            continue
+        server = subprocess.Popen(
+            ["Xvfb", f":{number}", "-screen", "0", "1280x1024x24", "-nolisten", "tcp"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        deadline = time.monotonic() + XVFB_STARTUP_TIMEOUT
+        while time.monotonic() < deadline and server.poll() is None:
+            if os.path.exists(f"/tmp/.X11-unix/X{number}"):
+                os.environ["DISPLAY"] = f":{number}"
+                return server
+            time.sleep(0.05)
+        server.kill()
+    sys.exit("Couldn't start Xvfb")
+
+def conversation(count: int, rng: random.Random):
+    """Alternate user and bot messages, with a long one now and then."""
+    longer = long_inputs(max(count // 20, 1), rng)
+    for number in range(count):
+        message = rng.choice(longer) if number % 20 == 19 else rng.choice(HIT_MESSAGES)
+        yield message, number % 2 == 0
+
+def run(count: int, seed: int) -> dict:
+    """Time each case in one GUI window and return their summaries."""
+    sys.path.insert(0, REPO_ROOT)
+    from Chatbot.chatbot_gui import ModernChatbotGUI
+
+    gui = ModernChatbotGUI()
+    window = gui.window
+    window.update()
+    results = {}
+    clock = time.perf_counter_ns
+
+    # One message at a time, drawn before the next arrives
+    timings = []
+    for message, is_user in conversation(count, random.Random(seed)):
+        start = clock()
+        gui.add_message(message, is_user)
+        window.update()
+        timings.append(clock() - start)
+    results["add_message"] = summarise(timings)
+
+    # A whole batch, drawn once at the end; reported per message
+    messages = list(conversation(count, random.Random(seed + 1)))
+    start = clock()
+    for message, is_user in messages:
+        gui.add_message(message, is_user)
+    window.update()
+    elapsed = clock() - start
+    results["add_batch"] = summarise([elapsed // len(messages)] * len(messages))
+
+    # The same through the bulk insert, until its last batch is laid out
+    messages = list(conversation(count, random.Random(seed + 2)))
+    chat_log = gui.chat_log
+    start = clock()
+    gui.add_messages(messages, log=False)
+    while chat_log.queued or chat_log.flush_pending:
+        window.update()
+    window.update()
+    elapsed = clock() - start
+    results["add_many"] = summarise([elapsed // len(messages)] * len(messages))
+
+    # Scroll the filled log from top to bottom a page at a time
+    canvas = gui.chat_log.canvas
+    canvas.yview_moveto(0.0)
+    window.update()
+    timings = []
+    while canvas.yview()[1] < 1.0:
+        start = clock()
+        canvas.yview_scroll(1, "pages")
+        window.update()
+        timings.append(clock() - start)
+        if len(timings) > 100000:
+            break
+    results["scroll_page"] = summarise(timings or [0])
+
+    gui.executor.shutdown(wait=False)
+    window.destroy()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", help="write the results to this baseline file")
+    parser.add_argument("--compare", help="compare the results against this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed slowdown before a case counts as a regression")
+    args = parser.parse_args()
+
+    server = start_xvfb() if not os.environ.get("DISPLAY") else None
+    try:
+        results = run(args.messages, args.seed)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print_table(results, COLUMNS)
+    if args.save:
+        save_baseline(args.save, results)
+    if args.compare and not compare_baseline(args.compare, results, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Measure latency, throughput and memory of the response pipeline.
+
+Each corpus is answered by each target: the engine's respond(), the
+module-level generate_response() and V1.generate_response(). The
+large-catalogue corpus asks about a few thousand synthetic facilities, so
+it only runs against an engine built over them. Every case runs in a fresh
+process, which keeps its allocations and peak RSS separate from the others.
+
+Reports p50/p99 latency, single-core throughput, peak traced allocations
+and peak RSS. Timing passes are repeated and the fastest kept, since
+scheduling noise only ever adds time. --save writes the results as a JSON baseline and --compare
+exits with status 1 if latency or throughput regressed past --tolerance.
+
+baselines/pipeline.json was recorded with the defaults under CPython 3.11
+on a single-vCPU Linux x86_64 VM (Intel Xeon); the file lists the exact
+machine. Compare against it only on similar hardware, or --save your own.
+
+Usage: python Chatbot/benchmarks/bench_pipeline.py [--messages N] [--corpus NAME ...]
+       [--replay FILE] [--catalogue N] [--repeat N] [--save FILE] [--compare FILE] [--tolerance 0.1]
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+from corpora import CORPORA, catalogue_questions, load_replay, synthetic_facilities
+from reporting import compare_baseline, print_table, save_baseline, summarise
+
+# Directory holding the Chatbot package
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TARGETS = ("engine", "generate_response", "V1")
+COLUMNS = ("p50_us", "p99_us", "mean_us", "per_second", "alloc_peak_kib", "rss_peak_mib")
+
+# Messages answered before timing starts, so caches and lazy set-up are warm
+WARMUP_MESSAGES = 200
+
+
+def build_case(corpus: str, target: str, count: int, seed: int, catalogue: int, replay: Optional[str]):
+    """Return the messages for a case and the function that answers one."""
+    sys.path.insert(0, REPO_ROOT)
+    rng = random.Random(seed)
+
+    if corpus == "large-catalogue":
+        from Chatbot.knowledge_base import KnowledgeBase
+        facilities = synthetic_facilities(catalogue, rng)
+        knowledge_base = KnowledgeBase.builtin()
+        knowledge_base.merge(KnowledgeBase(facilities=facilities))
+        return catalogue_questions(facilities, count, rng), knowledge_base.build_engine().respond
+    if corpus == "replay":
+        messages = load_replay(replay)
+    else:
+        messages = CORPORA[corpus](count, rng)
+
+    if target == "engine":
+        from Chatbot.chatbot_logic import IntentEngine
+        return messages, IntentEngine().respond
+    if target == "generate_response":
+        from Chatbot.chatbot_logic import generate_response
+        return messages, generate_response
+    from Chatbot import V1
+    return messages, V1.generate_response
+
+def run_case(corpus: str, target: str, count: int, seed: int, catalogue: int, replay: Optional[str], repeat: int) -> dict:
+    """Time one corpus against one target in this process."""
+    messages, respond = build_case(corpus, target, count, seed, catalogue, replay)
+    for message in messages[:WARMUP_MESSAGES]:
+        respond(message)
+
+    # Time every message on its own for the latency distribution, keeping
+    # the pass with the lowest median
+    metrics = None
+    clock = time.perf_counter_ns
+    for _ in range(repeat):
+        timings = []
+        for message in messages:
+            start = clock()
+            respond(message)
+            timings.append(clock() - start)
+        summary = summarise(timings)
+        if metrics is None or summary["p50_us"] < metrics["p50_us"]:
+            metrics = summary
+
+    # A second pass under tracemalloc, which slows things down too much to time
+    tracemalloc.start()
+    for message in messages:
+        respond(message)
+    metrics["alloc_peak_kib"] = tracemalloc.get_traced_memory()[1] / 1024
+    tracemalloc.stop()
+
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        metrics["rss_peak_mib"] = peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=5000, help="messages per generated corpus")
+    parser.add_argument("--corpus", nargs="*", help="corpora to run (default: all)")
+    parser.add_argument("--target", nargs="*", choices=TARGETS, help="targets to run (default: all)")
+    parser.add_argument("--replay", help="file of recorded messages to replay as its own corpus")
+    parser.add_argument("--catalogue", type=int, default=5000, help="facilities in the large catalogue")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3, help="timing passes per case; the fastest is reported")
+    parser.add_argument("--save", help="write the results to this baseline file")
+    parser.add_argument("--compare", help="compare the results against this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed slowdown before a case counts as a regression")
+    parser.add_argument("--run-case", nargs=2, metavar=("CORPUS", "TARGET"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Child process: run a single case and hand the metrics back as JSON
+    if args.run_case:
+        corpus, target = args.run_case
+        print(json.dumps(run_case(corpus, target, args.messages, args.seed, args.catalogue, args.replay, args.repeat)))
+        return
+
+    corpora = args.corpus or list(CORPORA) + ["large-catalogue"] + (["replay"] if args.replay else [])
+    if "replay" in corpora and not args.replay:
+        parser.error("the replay corpus needs --replay FILE")
+    targets = args.target or TARGETS
+
+    results = {}
+    for corpus in corpora:
+        for target in targets:
+            # The synthetic catalogue only exists in an engine built for it
+            if corpus == "large-catalogue" and target != "engine":
+                continue
+            command = [
+                sys.executable, os.path.abspath(__file__), "--run-case", corpus, target,
+                "--messages", str(args.messages), "--seed", str(args.seed),
+                "--catalogue", str(args.catalogue), "--repeat", str(args.repeat)
+            ]
+            if args.replay:
+                command += ["--replay", args.replay]
+            child = subprocess.run(command, check=True, capture_output=True, text=True)
+            results[f"{corpus}/{target}"] = json.loads(child.stdout.splitlines()[-1])
+
+    print_table(results, COLUMNS)
+    if args.save:
+        save_baseline(args.save, results)
+    if args.compare and not compare_baseline(args.compare, results, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Measure how long a fresh interpreter takes to import the response engine.
+
+Each case runs in a new process, so the numbers include interpreter start-up;
+the bare "python -c pass" case shows that floor. The script also checks that
+importing the package prints nothing and never loads tkinter.
+
+Usage: python Chatbot/benchmarks/bench_startup.py [--runs N]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Directory holding the Chatbot package
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CASES = [
+    ("interpreter only", "pass"),
+    ("import package", "import Chatbot"),
+    ("import + build engine", "import Chatbot; Chatbot.get_default_engine()"),
+    ("import + first reply", "import Chatbot; Chatbot.generate_response('where is the library')"),
+]
+
+# Run inside the child to report anything the import shouldn't have done
+CHECK = "import sys, Chatbot; print('tkinter' in sys.modules)"
+
+
+def time_case(code: str, runs: int) -> list:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, check=True, stdout=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    # Importing must be silent and must not pull in the GUI toolkit
+    check = subprocess.run([sys.executable, "-c", CHECK], cwd=REPO_ROOT, check=True, capture_output=True, text=True)
+    if check.stdout.strip() != "False":
+        sys.exit(f"importing Chatbot loaded tkinter or printed output: {check.stdout!r}")
+
+    baseline = None
+    print(f"{'case':<24}{'median ms':>12}{'min ms':>10}{'over bare':>12}")
+    for label, code in CASES:
+        timings = time_case(code, args.runs)
+        median = statistics.median(timings)
+        if baseline is None:
+            baseline = median
+        print(f"{label:<24}{median:>12.1f}{min(timings):>10.1f}{median - baseline:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Message corpora for the benchmarks, generated from a seed or replayed from a file.
+
+Every generator takes a count and a random.Random, so a seed always gives
+the same messages.
+"""
+import json
+import random
+from typing import Callable, Dict, List
+
+# Building blocks for the synthetic catalogue
+DEPARTMENTS = [
+    "biology", "chemistry", "physics", "history", "music", "economics", "nursing",
+    "law", "art", "philosophy", "geology", "computing", "languages", "drama"
+]
+KINDS = ["office", "lab", "lounge", "clinic", "studio", "archive", "hall", "workshop"]
+HOURS = ["9:00 AM to 5:00 PM", "8:00 AM to 8:00 PM", "Open 24/7", "10:00 AM to 4:00 PM"]
+
+# Messages the built-in rules answer
+HIT_MESSAGES = [
+    "hi", "hello there", "good morning", "good evening everyone", "how are you",
+    "what's up", "i'm good thanks", "i'm tired", "thank you so much",
+    "where is the library", "where is the gym?", "when does the cafeteria open",
+    "when does the coffee shop open and close", "is the bookstore open today",
+    "where can i find parking", "i need the administration office"
+]
+
+# Words that trigger no rule, for messages that fall through to the default
+FILLER_WORDS = [
+    "could", "you", "tell", "me", "about", "weather", "tomorrow", "campus", "please",
+    "wondering", "whether", "anyone", "knows", "lecture", "notes", "exam", "schedule",
+    "semester", "professor", "assignment", "deadline", "printer", "wifi", "password",
+    "shuttle", "bus", "route", "lost", "found", "umbrella", "laptop", "charger"
+]
+
+# Questions asked about catalogue facilities
+TEMPLATES = [
+    "where is the {name}",
+    "where is {name}",
+    "when does the {name} open",
+    "is the {name} open on sunday",
+    "i am looking for the {name}"
+]
+
+
+def synthetic_facilities(count: int, rng: random.Random) -> Dict[str, Dict[str, str]]:
+    """Return a catalogue of count made-up facilities in the engine's table format."""
+    facilities = {}
+    for number in range(count):
+        name = f"{rng.choice(DEPARTMENTS)} {rng.choice(KINDS)} {number}"
+        facilities[name] = {
+            "location": f"Building {rng.randint(1, 60)}",
+            "hours": rng.choice(HOURS),
+            "details": "Ask at the front desk."
+        }
+    return facilities
+
+def misspell(word: str, rng: random.Random) -> str:
+    """Drop, double or swap one letter of word."""
+    if len(word) < 4:
+        return word
+    position = rng.randrange(1, len(word) - 1)
+    edit = rng.randrange(3)
+    if edit == 0:
+        return word[:position] + word[position + 1:]
+    if edit == 1:
+        return word[:position] + word[position] + word[position:]
+    return word[:position - 1] + word[position] + word[position - 1] + word[position + 1:]
+
+def hit_heavy(count: int, rng: random.Random) -> List[str]:
+    """Short messages nearly all of which a rule answers."""
+    return [rng.choice(HIT_MESSAGES) for _ in range(count)]
+
+def miss_heavy(count: int, rng: random.Random) -> List[str]:
+    """Messages of five to fifteen words that no rule matches."""
+    return [" ".join(rng.choices(FILLER_WORDS, k=rng.randint(5, 15))) for _ in range(count)]
+
+def long_inputs(count: int, rng: random.Random) -> List[str]:
+    """Messages of a couple of hundred words, half with a question at the very end."""
+    messages = []
+    for number in range(count):
+        words = rng.choices(FILLER_WORDS, k=200)
+        if number % 2 == 0:
+            words.append(rng.choice(HIT_MESSAGES))
+        messages.append(" ".join(words))
+    return messages
+
+def catalogue_questions(facilities: Dict[str, Dict[str, str]], count: int, rng: random.Random) -> List[str]:
+    """Questions about random facilities in a catalogue, a quarter of them misspelt."""
+    names = list(facilities)
+    messages = []
+    for number in range(count):
+        name = rng.choice(names)
+        if number % 4 == 0:
+            name = " ".join(misspell(word, rng) for word in name.split())
+        messages.append(rng.choice(TEMPLATES).format(name=name))
+    return messages
+
+def load_replay(path: str) -> List[str]:
+    """Read messages to replay, one per line, or JSON lines with a "message" field."""
+    messages = []
+    with open(path, encoding="utf-8") as source:
+        for line in source:
+            line = line.rstrip("\n")
+            if not line:
+                continue
+            if line.startswith("{"):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    pass
+                else:
+                    if isinstance(record, dict) and isinstance(record.get("message"), str):
+                        messages.append(record["message"])
+                        continue
+            messages.append(line)
+    return messages
+
+
+# Generated corpora that run against the built-in tables, by name
+CORPORA: Dict[str, Callable[[int, random.Random], List[str]]] = {
+    "hit-heavy": hit_heavy,
+    "miss-heavy": miss_heavy,
+    "long-inputs": long_inputs
+}
@@ -0,0 +1,83 @@
+"""Summaries, result tables and baseline files shared by the benchmark scripts."""
+import json
+import os
+import platform
+import sys
+from typing import Dict, List, Sequence
+
+# Metrics where a larger value is a regression, and those where smaller is
+LOWER_IS_BETTER = ("p50_us", "p99_us")
+HIGHER_IS_BETTER = ("per_second",)
+
+
+def percentile(ordered: Sequence[float], fraction: float) -> float:
+    """Return the nearest-rank percentile of already sorted values."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def summarise(timings_ns: List[int]) -> Dict[str, float]:
+    """Turn per-message timings into latency percentiles and throughput."""
+    ordered = sorted(timings_ns)
+    total = sum(ordered)
+    return {
+        "messages": len(ordered),
+        "p50_us": percentile(ordered, 0.50) / 1000,
+        "p99_us": percentile(ordered, 0.99) / 1000,
+        "mean_us": total / len(ordered) / 1000 if ordered else 0.0,
+        "per_second": len(ordered) / (total / 1e9) if total else 0.0
+    }
+
+def print_table(results: Dict[str, Dict[str, float]], columns: Sequence[str]):
+    """Print one row per case with the chosen metrics."""
+    width = max([len(case) for case in results] + [4]) + 2
+    print(f"{'case':<{width}}" + "".join(f"{column:>16}" for column in columns))
+    for case, metrics in results.items():
+        print(f"{case:<{width}}" + "".join(f"{metrics.get(column, 0):>16.1f}" for column in columns))
+
+def processor_name() -> str:
+    """Return the CPU model, as far as the platform says."""
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as cpuinfo:
+            for line in cpuinfo:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor()
+
+def save_baseline(path: str, results: Dict[str, Dict[str, float]]):
+    """Write results to a JSON baseline, noting the interpreter and machine they came from."""
+    document = {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": processor_name(),
+        "cpus": os.cpu_count(),
+        "results": results
+    }
+    with open(path, "w", encoding="utf-8") as baseline:
+        json.dump(document, baseline, indent=2, sort_keys=True)
+    print(f"Saved baseline to {path}")
+
+def compare_baseline(path: str, results: Dict[str, Dict[str, float]], tolerance: float) -> bool:
+    """Print how results moved against a saved baseline; return False if any regressed past tolerance."""
+    with open(path, encoding="utf-8") as baseline:
+        previous = json.load(baseline)["results"]
+
+    passed = True
+    print(f"\nAgainst {path} (tolerance {tolerance:.0%}):")
+    for case, metrics in results.items():
+        before = previous.get(case)
+        if before is None:
+            print(f"  {case}: not in baseline")
+            continue
+        for metric in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+            if not before.get(metric) or metric not in metrics:
+                continue
+            change = metrics[metric] / before[metric] - 1
+            worse = change > tolerance if metric in LOWER_IS_BETTER else change < -tolerance
+            if worse:
+                passed = False
+            print(f"  {case} {metric}: {before[metric]:.1f} -> {metrics[metric]:.1f} ({change:+.1%}){'  REGRESSION' if worse else ''}")
+    return passed
@@ -0,0 +1,288 @@
+import argparse
+from collections import OrderedDict, deque
+from contextlib import ExitStack
+import json
+import os
+import random
+import sys
+import time
+from itertools import islice
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import zlib
+
+try:
+    from .chatbot_logic import (
+        BATCH_CHUNK_SIZE,
+        ChatSession,
+        IntentEngine,
+        generate_responses,
+        get_default_engine,
+        get_worker_engine,
+        set_worker_engine
+    )
+except ImportError:  # run as a script from this folder
+    from chatbot_logic import (
+        BATCH_CHUNK_SIZE,
+        ChatSession,
+        IntentEngine,
+        generate_responses,
+        get_default_engine,
+        get_worker_engine,
+        set_worker_engine
+    )
+
+# Bytes read from an input or written to stdout per system call
+INPUT_BUFFER = 1024 * 1024
+OUTPUT_BUFFER = 1024 * 1024
+
+# Conversations kept going in JSONL mode, across all workers; past this the
+# least recently active one is dropped and starts afresh if it comes back
+MAX_SESSIONS = 100000
+
+# Keys a JSONL message may hold its text under, in order of preference
+TEXT_KEYS = ("message", "text")
+
+# A JSONL message: the decoded object, its session id (None for a one-off) and its text
+Message = Tuple[Dict, Optional[str], str]
+
+
+class InputError(Exception):
+    """Raised when a JSONL input line isn't a message object."""
+
+
+def read_lines(paths: Sequence[str]) -> Iterator[str]:
+    """Yield the lines of each file in turn without their line endings; "-" or no paths reads stdin."""
+    for path in paths or ["-"]:
+        if path == "-":
+            stream = open(sys.stdin.fileno(), encoding="utf-8", errors="replace", buffering=INPUT_BUFFER, closefd=False)
+        else:
+            stream = open(path, encoding="utf-8", errors="replace", buffering=INPUT_BUFFER)
+        with stream:
+            for line in stream:
+                yield line.rstrip("\r\n")
+
+def read_messages(lines: Iterable[str]) -> Iterator[Message]:
+    """Decode JSONL lines into messages, skipping blank lines and the bot's side of a transcript."""
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            raise InputError(f"line {number} isn't JSON: {error}") from None
+        if not isinstance(record, dict):
+            raise InputError(f"line {number} isn't a JSON object")
+        # Lets transcript_log.py's output be piped straight back in
+        if record.get("speaker", "user") != "user":
+            continue
+        text = next((record[key] for key in TEXT_KEYS if isinstance(record.get(key), str)), None)
+        if text is None:
+            raise InputError(f'line {number} has no "message" or "text" string')
+        session_id = record.get("session")
+        yield record, None if session_id is None else str(session_id), text
+
+
+# Conversations this worker process is carrying on; which ones are dropped
+# is decided by generate_message_replies()
+sessions: Dict[str, ChatSession] = {}
+
+def get_session(session_id: str, seed: Optional[int]) -> ChatSession:
+    """Return this process's conversation for session_id, starting it if need be."""
+    session = sessions.get(session_id)
+    if session is None:
+        # Seeded from the session id, so its replies don't depend on which
+        # worker it lands on or what else was in the input
+        session_seed = zlib.crc32(f"{seed}:{session_id}".encode()) if seed is not None else None
+        session = sessions[session_id] = ChatSession(seed=session_seed, engine=get_worker_engine())
+    return session
+
+def answer_job(job: Tuple[Optional[int], int, List[Tuple[Optional[str], Optional[str]]]]) -> List[str]:
+    """Answer one worker's share of a chunk of JSONL messages, in order.
+
+    Messages without a session share an RNG derived from the seed and
+    chunk number, as generate_responses() does; the rest are answered in
+    their conversation. An entry with no text drops its conversation.
+    """
+    seed, number, messages = job
+    engine = get_worker_engine()
+    rng = None
+    replies = []
+    for session_id, text in messages:
+        if text is None:
+            sessions.pop(session_id, None)
+            continue
+        if session_id is not None:
+            replies.append(get_session(session_id, seed).respond(text))
+            continue
+        if rng is None:
+            rng = random.Random(f"{seed}:{number}") if seed is not None else random.Random()
+        replies.append(engine.respond(text, rng))
+    return replies
+
+def plan_chunk(
+    chunk: List[Message],
+    active: "OrderedDict[str, None]",
+    max_sessions: int
+) -> List[Tuple[Optional[str], Optional[str]]]:
+    """Return a chunk's (session id, text) pairs, with a (session id, None) wherever a conversation is dropped.
+
+    active holds every conversation still going, least recently active
+    first, and is updated to match. It's kept here rather than in each
+    worker, so the same conversations are dropped at the same points for
+    any number of processes.
+    """
+    entries: List[Tuple[Optional[str], Optional[str]]] = []
+    for _, session_id, text in chunk:
+        if session_id is not None:
+            if session_id in active:
+                active.move_to_end(session_id)
+            else:
+                active[session_id] = None
+                if len(active) > max_sessions:
+                    entries.append((active.popitem(last=False)[0], None))
+        entries.append((session_id, text))
+    return entries
+
+def generate_message_replies(
+    messages: Iterable[Message],
+    seed: Optional[int] = None,
+    processes: Optional[int] = None,
+    chunksize: int = BATCH_CHUNK_SIZE,
+    max_sessions: int = MAX_SESSIONS
+) -> Iterator[Tuple[Dict, str]]:
+    """Yield each JSONL message's object with its reply, in order.
+
+    With processes set, each chunk is split between single-process pools:
+    a session always goes to the same one, so its messages are answered in
+    order and with its history, and one-off messages go to the chunk's
+    pool as a group. Beyond max_sessions conversations the least recently
+    active is dropped, counted over the whole input, so replies are the
+    same for any number of processes.
+    """
+    iterator = iter(messages)
+    chunks = enumerate(iter(lambda: list(islice(iterator, chunksize)), []))
+    active: "OrderedDict[str, None]" = OrderedDict()
+
+    if not processes or processes == 1:
+        # Conversations left over from an earlier run aren't in active
+        sessions.clear()
+        for number, chunk in chunks:
+            replies = answer_job((seed, number, plan_chunk(chunk, active, max_sessions)))
+            yield from zip((record for record, _, _ in chunk), replies)
+        return
+
+    # Imported here as it's only needed for sharded runs and is slow to load
+    import multiprocessing
+
+    engine = get_worker_engine()
+    with ExitStack() as stack:
+        pools = [stack.enter_context(multiprocessing.Pool(1, set_worker_engine, (engine,))) for _ in range(processes)]
+        pending: Deque = deque()
+        for number, chunk in chunks:
+            shares: List[List[Tuple[Optional[str], Optional[str]]]] = [[] for _ in pools]
+            positions: List[List[int]] = [[] for _ in pools]
+            position = 0
+            for session_id, text in plan_chunk(chunk, active, max_sessions):
+                shard = number % processes if session_id is None else zlib.crc32(session_id.encode()) % processes
+                shares[shard].append((session_id, text))
+                # Dropping a conversation has no reply to put back in place
+                if text is not None:
+                    positions[shard].append(position)
+                    position += 1
+            results = [
+                (positions[shard], pools[shard].apply_async(answer_job, ((seed, number, shares[shard]),)))
+                for shard in range(processes) if shares[shard]
+            ]
+            pending.append((chunk, results))
+            if len(pending) >= 2 * processes:
+                yield from merge_replies(*pending.popleft())
+        while pending:
+            yield from merge_replies(*pending.popleft())
+
+def merge_replies(chunk: List[Message], results) -> Iterator[Tuple[Dict, str]]:
+    """Put the pools' replies for a chunk back in input order."""
+    replies: List[str] = [""] * len(chunk)
+    for positions, result in results:
+        for position, reply in zip(positions, result.get()):
+            replies[position] = reply
+    return zip((record for record, _, _ in chunk), replies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer messages from files or stdin, writing the replies to stdout.")
+    parser.add_argument("inputs", nargs="*", metavar="FILE", help='files of messages, one per line; stdin if none or "-"')
+    parser.add_argument("--jsonl", action="store_true", help='read JSON objects with a "message" or "text" and an optional "session", and write each back with its "reply"')
+    parser.add_argument("--workers", type=int, default=1, help="worker processes, forked after the rules are loaded; 0 for one per CPU")
+    parser.add_argument("--seed", type=int, help="seed for reply variants, so a rerun gives the same output")
+    parser.add_argument("--cache-size", type=int, default=0, help="resolved messages each worker caches")
+    parser.add_argument("--chunk-size", type=int, default=BATCH_CHUNK_SIZE, help="messages answered and written at a time")
+    parser.add_argument("--rules", nargs="*", default=[], help="JSON, YAML or CSV rule files to answer from")
+    parser.add_argument("--snapshot", help="compiled snapshot of the rule files to load from and keep up to date")
+    parser.add_argument("--timing", action="store_true", help="report the message count and rate on stderr")
+    args = parser.parse_args()
+
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1")
+    workers = args.workers or os.cpu_count() or 1
+
+    options = {"cache_size": args.cache_size} if args.cache_size else {}
+    if args.rules:
+        # Imported here as only custom rules need the loaders
+        try:
+            from .knowledge_base import KnowledgeBaseError, load_engine
+        except ImportError:  # run as a script from this folder
+            from knowledge_base import KnowledgeBaseError, load_engine
+        try:
+            engine = load_engine(args.rules, args.snapshot, **options)
+        except KnowledgeBaseError as error:
+            sys.exit(str(error))
+    elif options:
+        engine = IntentEngine(**options)
+    else:
+        engine = get_default_engine()
+    # Loaded before any worker is forked, so they all share one copy
+    set_worker_engine(engine)
+
+    lines = read_lines(args.inputs)
+    if args.jsonl:
+        replies = (
+            json.dumps({**record, "reply": reply}, ensure_ascii=False)
+            for record, reply in generate_message_replies(read_messages(lines), args.seed, workers, args.chunk_size)
+        )
+    else:
+        replies = generate_responses(lines, args.seed, workers, args.chunk_size, engine)
+
+    output = open(sys.stdout.fileno(), "w", encoding="utf-8", buffering=OUTPUT_BUFFER, closefd=False)
+    count = 0
+    started = time.perf_counter()
+    try:
+        # A chunk's replies go out in one write, flushed so a pipeline downstream sees them
+        for batch in iter(lambda: list(islice(replies, args.chunk_size)), []):
+            output.write("\n".join(batch))
+            output.write("\n")
+            output.flush()
+            count += len(batch)
+    except InputError as error:
+        output.flush()
+        sys.exit(f"Bad input: {error}")
+    except BrokenPipeError:
+        # The reader went away (e.g. head); stop quietly rather than
+        # failing again when the interpreter flushes stdout on exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+    except KeyboardInterrupt:
+        sys.exit(130)
+    finally:
+        output.close()
+    elapsed = time.perf_counter() - started
+
+    if args.timing:
+        rate = count / elapsed if elapsed else 0.0
+        print(f"{count} messages in {elapsed:.3f}s ({rate:,.0f} per second) with {workers} worker(s)", file=sys.stderr)
+        if engine.cache is not None and workers == 1:
+            info = engine.cache.info()
+            print(f"cache: {info.hits} hits, {info.misses} misses, {info.currsize}/{info.maxsize} entries", file=sys.stderr)
+
+# Entry point for the command-line client
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,674 @@
+import argparse
+import asyncio
+import base64
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import hashlib
+from itertools import chain
+import json
+import logging
+import os
+import struct
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+import uuid
+
+try:
+    from .admission import AdmissionController, Rejected
+    from .chatbot_logic import DEFAULT_USER_NAME, ChatSession, IntentEngine, get_default_engine, get_random_agent_name
+    from .instrumentation import Instrumentation
+    from .session_store import SESSION_TTL, MemorySessionStore, SQLiteSessionStore, SessionState
+    from .transcript_log import TranscriptWriter
+except ImportError:  # run as a script from this folder
+    from admission import AdmissionController, Rejected
+    from chatbot_logic import DEFAULT_USER_NAME, ChatSession, IntentEngine, get_default_engine, get_random_agent_name
+    from instrumentation import Instrumentation
+    from session_store import SESSION_TTL, MemorySessionStore, SQLiteSessionStore, SessionState
+    from transcript_log import TranscriptWriter
+
+logger = logging.getLogger(__name__)
+
+# Magic GUID from RFC 6455 used to answer the WebSocket handshake
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# WebSocket opcodes
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+# Limits that keep one client from tying up the process
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 64 * 1024
+IDLE_TIMEOUT = 60.0
+
+# Threads answering messages, so a slow one (a fallback classifier call,
+# say) doesn't hold up the event loop and every other connection with it
+ENGINE_THREADS = 4
+
+# Content type of the Prometheus text exposition format
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Content type of streamed replies: one JSON object per line
+STREAM_CONTENT_TYPE = "application/x-ndjson"
+
+HTTP_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    429: "Too Many Requests",
+    500: "Internal Server Error",
+    503: "Service Unavailable"
+}
+
+
+class ProtocolError(Exception):
+    """Raised when a client sends something the server can't parse."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class ChatServer:
+    """Headless asyncio server answering chat messages over HTTP and WebSocket.
+
+    POST /chat takes {"message": ..., "session": ..., "name": ...} and returns
+    the reply along with a session id to send back on the next request.
+    With "stream": true the reply comes back as chunked JSON lines, a
+    {"delta": ...} for each part as it's ready and then the usual object
+    with "done": true; WebSocket messages sent as JSON can ask for the same.
+    HTTP sessions live in session_store, by default in memory, where they
+    expire after session_ttl idle seconds and beyond max_sessions the least
+    recently used is dropped; pass a SQLiteSessionStore to share them
+    between processes. Requests in one HTTP session are answered one at a
+    time, and one the engine fails on gets a 500.
+    Messages are answered on a pool of engine_threads threads rather than
+    on the event loop; 0 answers them on the loop, which is faster while
+    every message is quick but lets a slow one stall every connection.
+    GET /ws upgrades to a WebSocket where each text frame is one message and
+    the connection itself is the session. Each connection handles one
+    message at a time and waits for the client to read the reply before
+    taking the next one, and connections beyond max_connections are turned
+    away with 503 rather than queued. Given the engine's instrumentation,
+    GET /metrics serves its counters and histograms to Prometheus, and
+    given a TranscriptWriter, every message and reply is logged to it.
+    Given an AdmissionController, messages are rate limited per client
+    address and queued for the engine, refused with 429 or 503 when over
+    the limits, and answered cheaply (marked "degraded": true) once the
+    queue is long or their deadline has passed.
+    """
+
+    def __init__(
+        self,
+        engine: Optional[IntentEngine] = None,
+        host: str = "127.0.0.1",
+        port: int = 8080,
+        max_connections: int = 10000,
+        max_sessions: int = 100000,
+        instrumentation: Optional[Instrumentation] = None,
+        session_store=None,
+        session_ttl: Optional[float] = SESSION_TTL,
+        transcript: Optional[TranscriptWriter] = None,
+        admission: Optional[AdmissionController] = None,
+        engine_threads: int = ENGINE_THREADS
+    ):
+        self.engine = engine if engine is not None else get_default_engine()
+        self.host = host
+        self.port = port
+        self.max_connections = max_connections
+        self.max_sessions = max_sessions
+        self.instrumentation = instrumentation
+        self.transcript = transcript
+        self.admission = admission
+        self.executor: Optional[ThreadPoolExecutor] = None
+        if engine_threads:
+            self.executor = ThreadPoolExecutor(max_workers=engine_threads, thread_name_prefix="engine")
+        if admission is not None and admission.executor is None:
+            admission.executor = self.executor
+            if admission.workers is None:
+                admission.workers = engine_threads
+        self.connections = 0
+        self.sessions = session_store if session_store is not None else MemorySessionStore(session_ttl, max_sessions)
+        # Per HTTP session, the lock its requests take turns with and how many hold or wait for it
+        self.session_locks: Dict[str, List] = {}
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, sock=None):
+        """Start listening, on sock if given, otherwise on host and port."""
+        if sock is not None:
+            self.server = await asyncio.start_server(self.handle_connection, sock=sock, limit=MAX_HEADER_BYTES)
+        else:
+            self.server = await asyncio.start_server(self.handle_connection, self.host, self.port, limit=MAX_HEADER_BYTES)
+        return self.server
+
+    async def serve_forever(self, sock=None):
+        """Start the server and run until cancelled."""
+        server = await self.start(sock)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run_engine(self, function, *args):
+        """Call function(*args) on an engine thread, or on the loop without any, and return what it returns."""
+        if self.executor is None:
+            return function(*args)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    def get_session(self, session_id: Optional[str], user_name: Optional[str]) -> Tuple[str, SessionState]:
+        """Return the state of the HTTP session for session_id, starting a new one if it is unknown or expired."""
+        state = self.sessions.get(session_id) if session_id else None
+        if state is None:
+            session_id = uuid.uuid4().hex
+            state = SessionState(user_name or DEFAULT_USER_NAME, get_random_agent_name())
+        return session_id, state
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # Turn connections away instead of letting them pile up
+        if self.connections >= self.max_connections:
+            await self.send_response(writer, 503, {"error": "server busy"}, keep_alive=False)
+            writer.close()
+            return
+
+        self.connections += 1
+        peer = writer.get_extra_info("peername")
+        client = peer[0] if isinstance(peer, tuple) else str(peer)
+        try:
+            # Serve requests on this connection until it closes or upgrades
+            while True:
+                try:
+                    request = await asyncio.wait_for(self.read_request(reader), IDLE_TIMEOUT)
+                except ProtocolError as error:
+                    await self.send_response(writer, error.status, {"error": str(error)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+
+                method, path, query, headers, body = request
+                if path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+                    await self.handle_websocket(reader, writer, headers, query, client)
+                    break
+
+                keep_alive = headers.get("connection", "").lower() != "close"
+                status, payload = await self.route(method, path, body, client)
+                await self.send_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception:
+            # A reply that fails once it's streaming can't become a 500
+            logger.exception("Error serving %s", client)
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def read_request(self, reader: asyncio.StreamReader):
+        """Read one HTTP request, or return None when the client has gone."""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError:
+            raise ProtocolError(413, "headers too large")
+
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise ProtocolError(400, "malformed request line")
+        headers: Dict[str, str] = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise ProtocolError(400, "bad Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise ProtocolError(413, "body too large")
+        body = await reader.readexactly(length) if length else b""
+
+        url = urlsplit(target)
+        return method.upper(), url.path, parse_qs(url.query), headers, body
+
+    async def route(self, method: str, path: str, body: bytes, client: str = "") -> Tuple[int, Union[dict, str, AsyncIterator[dict]]]:
+        """Dispatch a plain HTTP request from client's address and return (status, payload).
+
+        The payload is a JSON object, metrics text, or for a streamed reply
+        an async iterator of JSON objects.
+        """
+        if path == "/health":
+            health = {"status": "ok", "connections": self.connections, "sessions": len(self.sessions)}
+            # Engines that reload their rules report the version being served
+            if hasattr(self.engine, "metrics"):
+                health["knowledge_base"] = self.engine.metrics()
+            if self.admission is not None:
+                health["admission"] = self.admission.metrics()
+            return 200, health
+        if path == "/metrics" and (self.instrumentation is not None or self.admission is not None):
+            return 200, "".join(
+                source.prometheus_text() for source in (self.instrumentation, self.admission) if source is not None
+            )
+        if path != "/chat":
+            return 404, {"error": "not found"}
+        if method != "POST":
+            return 405, {"error": "use POST"}
+
+        try:
+            data = json.loads(body or b"{}")
+            message = data["message"]
+        except (ValueError, KeyError, TypeError):
+            return 400, {"error": "expected a JSON object with a message"}
+        if not isinstance(message, str):
+            return 400, {"error": "message must be a string"}
+
+        session_id = data.get("session")
+        if session_id is not None and not isinstance(session_id, str):
+            return 400, {"error": "session must be a string"}
+        user_name = data.get("name")
+        if user_name is not None and not isinstance(user_name, str):
+            return 400, {"error": "name must be a string"}
+        stream = bool(data.get("stream"))
+
+        # Requests in the same session take turns, so two never read and
+        # update its state at once; the state is fetched once it's this
+        # one's turn, as the last one may have changed it
+        async with self.session_turn(session_id):
+            session_id, state = self.get_session(session_id, user_name)
+            try:
+                parts, degraded = await self.answer(client, message, state, stream)
+            except Rejected as error:
+                return error.status, {"error": str(error), "retry_after": round(error.retry_after, 3)}
+            except Exception:
+                logger.exception("Error answering a message in session %s", session_id)
+                return 500, {"error": "internal error"}
+            self.sessions.put(session_id, state)
+
+        if stream:
+            return 200, self.stream_reply(session_id, state, message, parts, degraded)
+        response = "".join(parts)
+        self.log_exchange(session_id, message, response)
+        payload = {
+            "response": response,
+            "session": session_id,
+            "agent_name": state.agent_name
+        }
+        if degraded:
+            payload["degraded"] = True
+        return 200, payload
+
+    @asynccontextmanager
+    async def session_turn(self, session_id: Optional[str]):
+        """Wait until no other request in session_id is being answered, and hold it until done."""
+        if not session_id:
+            yield
+            return
+        # The lock and how many requests are holding or waiting for it;
+        # dropped with the last of them
+        entry = self.session_locks.get(session_id)
+        if entry is None:
+            entry = self.session_locks[session_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self.session_locks[session_id]
+
+    async def answer(self, client: str, message: str, state: SessionState, stream: bool) -> Tuple[Iterable[str], bool]:
+        """Work out the reply to message in a conversation, returning its parts and whether it's the cheap one.
+
+        A streamed reply is worked out as far as its first part, which
+        settles the conversation's state; the rest follow as they're sent.
+        """
+        if self.admission is None:
+            if stream:
+                return await self.start_parts(self.engine.respond_stream(message, state=state)), False
+            return [await self.run_engine(self.engine.respond_in_context, message, state)], False
+
+        # Under admission control the whole reply, every part of it, is
+        # worked out when the request's turn in the queue comes
+        if stream:
+            return await self.admission.submit(
+                client,
+                lambda: list(self.engine.respond_stream(message, state=state)),
+                lambda: [self.engine.respond_quickly(message)]
+            )
+        response, degraded = await self.admission.submit(
+            client,
+            lambda: self.engine.respond_in_context(message, state),
+            lambda: self.engine.respond_quickly(message)
+        )
+        return [response], degraded
+
+    async def start_parts(self, parts: Iterator[str]) -> Iterable[str]:
+        """Work out the first of a reply's parts on an engine thread, returning them all to be sent."""
+        first = await self.run_engine(next, parts, None)
+        return [] if first is None else chain([first], parts)
+
+    async def engine_parts(self, parts: Iterable[str]) -> AsyncIterator[str]:
+        """Yield each part of a reply as the engine works it out, a part at a time on an engine thread.
+
+        Parts already worked out, in a list, are yielded as they are.
+        """
+        if isinstance(parts, list):
+            for part in parts:
+                yield part
+            return
+        iterator = iter(parts)
+        while True:
+            part = await self.run_engine(next, iterator, None)
+            if part is None:
+                return
+            yield part
+
+    async def stream_reply(
+        self,
+        session_id: str,
+        state: SessionState,
+        message: str,
+        parts: Iterable[str],
+        degraded: bool = False
+    ) -> AsyncIterator[dict]:
+        """Yield each part of the reply as a delta, as soon as it's worked out, then the whole reply with the session details."""
+        sent = []
+        async for part in self.engine_parts(parts):
+            sent.append(part)
+            yield {"delta": part}
+        response = "".join(sent)
+        self.log_exchange(session_id, message, response)
+        payload = {"response": response, "session": session_id, "agent_name": state.agent_name, "done": True}
+        if degraded:
+            payload["degraded"] = True
+        yield payload
+
+    def log_exchange(self, session_id: str, message: str, response: str):
+        if self.transcript is not None:
+            self.transcript.append(session_id, "user", message)
+            self.transcript.append(session_id, "bot", response)
+
+    async def send_response(
+        self,
+        writer: asyncio.StreamWriter,
+        status: int,
+        payload: Union[dict, str, AsyncIterator[dict]],
+        keep_alive: bool = True
+    ):
+        if not isinstance(payload, (dict, str)):
+            await self.send_stream(writer, status, payload, keep_alive)
+            return
+
+        # Text payloads are metrics; everything else goes out as JSON
+        if isinstance(payload, str):
+            body = payload.encode("utf-8")
+            content_type = METRICS_CONTENT_TYPE
+        else:
+            body = json.dumps(payload).encode("utf-8")
+            content_type = "application/json"
+        head = (
+            f"HTTP/1.1 {status} {HTTP_REASONS.get(status, 'Error')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        # Wait for the client to take the data before reading more from it
+        await writer.drain()
+
+    async def send_stream(self, writer: asyncio.StreamWriter, status: int, payload: AsyncIterator[dict], keep_alive: bool):
+        """Send JSON objects as lines of a chunked response, each one flushed as soon as it's ready."""
+        writer.write((
+            f"HTTP/1.1 {status} {HTTP_REASONS.get(status, 'Error')}\r\n"
+            f"Content-Type: {STREAM_CONTENT_TYPE}\r\n"
+            f"Transfer-Encoding: chunked\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        ).encode("latin-1"))
+        async for item in payload:
+            line = json.dumps(item).encode("utf-8") + b"\n"
+            writer.write(f"{len(line):X}\r\n".encode("latin-1") + line + b"\r\n")
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def handle_websocket(self, reader, writer, headers: Dict[str, str], query: Dict[str, list], client: str = ""):
+        key = headers.get("sec-websocket-key")
+        if not key:
+            await self.send_response(writer, 400, {"error": "missing Sec-WebSocket-Key"}, keep_alive=False)
+            return
+
+        # Complete the handshake
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode("ascii")).digest()).decode("ascii")
+        writer.write(
+            b"HTTP/1.1 101 Switching Protocols\r\n"
+            b"Upgrade: websocket\r\n"
+            b"Connection: Upgrade\r\n"
+            b"Sec-WebSocket-Accept: " + accept.encode("ascii") + b"\r\n\r\n"
+        )
+
+        # The connection is the session; greet the user like the GUI does
+        session = ChatSession(user_name=query.get("name", [None])[0], engine=self.engine)
+        session_id = uuid.uuid4().hex
+        await self.send_json(writer, {
+            "response": f"Welcome {session.user_name}! I'm {session.agent_name}, your personal assistant. How can I help you today?",
+            "agent_name": session.agent_name
+        })
+
+        fragments = []
+        while True:
+            opcode, payload = await asyncio.wait_for(self.read_frame(reader), IDLE_TIMEOUT)
+            if opcode == OP_CLOSE:
+                await self.send_frame(writer, OP_CLOSE, payload[:2])
+                return
+            if opcode == OP_PING:
+                await self.send_frame(writer, OP_PONG, payload)
+                continue
+            if opcode == OP_PONG:
+                continue
+
+            # Reassemble fragmented messages before answering them
+            fragments.append(payload)
+            if opcode & 0x80 == 0:
+                continue
+            text = b"".join(fragments).decode("utf-8", errors="replace")
+            fragments = []
+
+            message = text
+            stream = False
+            if text.startswith("{"):
+                try:
+                    data = json.loads(text)
+                    message = str(data["message"])
+                    stream = bool(data.get("stream"))
+                except (ValueError, KeyError, TypeError):
+                    pass
+
+            degraded = False
+            try:
+                if self.admission is None:
+                    # A streamed reply is worked out a part at a time as it's sent
+                    if stream:
+                        parts = await self.start_parts(session.respond_stream(message))
+                    else:
+                        parts = [await self.run_engine(session.respond, message)]
+                else:
+                    parts, degraded = await self.admission.submit(
+                        client,
+                        (lambda: list(session.respond_stream(message))) if stream else (lambda: [session.respond(message)]),
+                        lambda: [self.engine.respond_quickly(message, session.rng)]
+                    )
+            except Rejected as error:
+                await self.send_json(writer, {"error": str(error), "retry_after": round(error.retry_after, 3)})
+                continue
+            except Exception:
+                logger.exception("Error answering a message in WebSocket session %s", session_id)
+                await self.send_json(writer, {"error": "internal error"})
+                continue
+
+            if stream:
+                sent = []
+                async for part in self.engine_parts(parts):
+                    sent.append(part)
+                    await self.send_json(writer, {"delta": part})
+                response = "".join(sent)
+            else:
+                response = "".join(parts)
+            self.log_exchange(session_id, message, response)
+            payload = {"response": response, "done": True} if stream else {"response": response}
+            if degraded:
+                payload["degraded"] = True
+            await self.send_json(writer, payload)
+
+    async def read_frame(self, reader: asyncio.StreamReader) -> Tuple[int, bytes]:
+        """Read one WebSocket frame; the returned opcode has 0x80 set on the final fragment."""
+        first, second = await reader.readexactly(2)
+        final = first & 0x80
+        opcode = first & 0x0F
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", await reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", await reader.readexactly(8))[0]
+        if length > MAX_BODY_BYTES:
+            raise ConnectionError("frame too large")
+
+        mask = await reader.readexactly(4) if second & 0x80 else None
+        payload = await reader.readexactly(length)
+        if mask and length:
+            # Unmask the whole payload as one big integer XOR
+            repeated = (mask * (length // 4 + 1))[:length]
+            payload = (int.from_bytes(payload, "big") ^ int.from_bytes(repeated, "big")).to_bytes(length, "big")
+
+        # Control frames are never fragmented, so report them on their own
+        if opcode >= OP_CLOSE:
+            return opcode, payload
+        return opcode | final, payload
+
+    async def send_frame(self, writer: asyncio.StreamWriter, opcode: int, payload: bytes):
+        length = len(payload)
+        if length < 126:
+            header = struct.pack("!BB", 0x80 | opcode, length)
+        elif length < 1 << 16:
+            header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+        writer.write(header + payload)
+        await writer.drain()
+
+    async def send_json(self, writer: asyncio.StreamWriter, payload: dict):
+        await self.send_frame(writer, OP_TEXT, json.dumps(payload).encode("utf-8"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the chatbot over HTTP and WebSocket.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-connections", type=int, default=10000, help="open connections per worker")
+    parser.add_argument("--max-sessions", type=int, default=100000, help="HTTP sessions kept in memory")
+    parser.add_argument("--session-ttl", type=float, default=SESSION_TTL, help="seconds an idle HTTP session is kept")
+    parser.add_argument("--session-db", help="SQLite file to keep HTTP sessions in, shared with other server processes")
+    parser.add_argument("--transcripts", help="directory to log every message and reply to")
+    parser.add_argument("--rules", nargs="*", default=[], help="JSON, YAML or CSV rule files, reloaded when they change")
+    parser.add_argument("--snapshot", help="compiled snapshot of the rule files to load from and keep up to date")
+    parser.add_argument("--reload-interval", type=float, default=2.0, help="seconds between checks of the rule files")
+    parser.add_argument("--fallback-threshold", type=float, help="score unmatched messages with the TF-IDF fallback (needs NumPy and SciPy)")
+    parser.add_argument("--metrics", action="store_true", help="time every reply and serve the metrics at GET /metrics, per worker")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes forked after the rules are loaded once; 0 for one per CPU")
+    parser.add_argument("--reuse-port", action="store_true", help="give each worker its own SO_REUSEPORT socket so the kernel balances connections")
+    parser.add_argument("--engine-threads", type=int, default=ENGINE_THREADS, help="threads answering messages per worker; 0 answers them on the event loop")
+    parser.add_argument("--rate", type=float, help="messages a second each client address may send, per worker")
+    parser.add_argument("--burst", type=float, help="messages a client may send at once before --rate applies (default: the rate)")
+    parser.add_argument("--max-pending", type=int, help="messages queued for the engine before new ones get 503, per worker")
+    parser.add_argument("--deadline", type=float, help="seconds a queued message may wait before it gets a cheap reply")
+    args = parser.parse_args()
+
+    if args.rate is not None and args.rate <= 0:
+        parser.error("--rate must be positive")
+    if args.burst is not None and args.burst < 1:
+        parser.error("--burst must be at least 1")
+    workers = args.workers or os.cpu_count() or 1
+    if workers > 1 and not args.session_db:
+        parser.error("--workers above 1 needs --session-db, so follow-up questions reach whichever worker answers them")
+
+    options = {}
+    if args.fallback_threshold is not None:
+        options["fallback_threshold"] = args.fallback_threshold
+    instrumentation = Instrumentation() if args.metrics else None
+    if instrumentation is not None:
+        options["instrumentation"] = instrumentation
+
+    # Load the rules before any worker is forked, so they all share one copy
+    reloader = None
+    if args.rules:
+        try:
+            from .hot_reload import ReloadingEngine
+        except ImportError:  # run as a script from this folder
+            from hot_reload import ReloadingEngine
+        engine = reloader = ReloadingEngine(args.rules, args.snapshot, interval=args.reload_interval, **options)
+    elif options:
+        engine = IntentEngine(**options)
+    else:
+        engine = get_default_engine()
+
+    def serve(sock=None):
+        # Threads and open files don't survive a fork, so each worker starts
+        # its own; a reload builds the new rules separately in every worker
+        if reloader is not None:
+            reloader.start()
+        session_store = SQLiteSessionStore(args.session_db, args.session_ttl) if args.session_db else None
+        transcript = TranscriptWriter(args.transcripts) if args.transcripts else None
+        admission = None
+        if args.rate is not None or args.max_pending is not None or args.deadline is not None:
+            admission = AdmissionController(
+                rate=args.rate,
+                burst=args.burst,
+                max_pending=args.max_pending or 1000,
+                deadline=args.deadline if args.deadline is not None else 1.0
+            )
+        server = ChatServer(
+            engine,
+            host=args.host,
+            port=args.port,
+            max_connections=args.max_connections,
+            max_sessions=args.max_sessions,
+            instrumentation=instrumentation,
+            session_store=session_store,
+            session_ttl=args.session_ttl,
+            transcript=transcript,
+            admission=admission,
+            engine_threads=args.engine_threads
+        )
+        try:
+            asyncio.run(server.serve_forever(sock))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if reloader is not None:
+                reloader.stop()
+            if session_store is not None:
+                session_store.close()
+            if transcript is not None:
+                transcript.close()
+
+    if workers == 1:
+        serve()
+        return
+    try:
+        from .prefork import PreforkServer
+    except ImportError:  # run as a script from this folder
+        from prefork import PreforkServer
+    PreforkServer(serve, workers, args.host, args.port, args.reuse_port).run()
+
+# Entry point for the server
+if __name__ == "__main__":
+    main()
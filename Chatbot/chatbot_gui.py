@@ -1,11 +1,23 @@
 import tkinter as tk
 from tkinter import ttk
-from chatbot_logic import get_random_agent_name, generate_response
+import argparse
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-
-# Add a custom method to create rounded rectangles on a Canvas
-tk.Canvas.create_rounded_rectangle = lambda self, x1, y1, x2, y2, radius=25, **kwargs: \
-    self.create_polygon(
+import queue
+import uuid
+try:
+    from .chatbot_logic import EXIT_COMMANDS, ChatSession, is_exit_message
+    from .transcript_log import read_transcripts, writer_from_environment
+except ImportError:  # run as a script from this folder
+    from chatbot_logic import EXIT_COMMANDS, ChatSession, is_exit_message
+    from transcript_log import read_transcripts, writer_from_environment
+
+# Outline of a rounded rectangle, for a smoothed canvas polygon
+def rounded_rectangle_points(x1, y1, x2, y2, radius=25):
+    return (
         x1+radius, y1,
         x2-radius, y1,
         x2, y1,
@@ -17,30 +29,17 @@ tk.Canvas.create_rounded_rectangle = lambda self, x1, y1, x2, y2, radius=25, **k
         x1, y2,
         x1, y2-radius,
         x1, y1+radius,
-        x1, y1,
+        x1, y1
+    )
+
+# Add a custom method to create rounded rectangles on a Canvas
+tk.Canvas.create_rounded_rectangle = lambda self, x1, y1, x2, y2, radius=25, **kwargs: \
+    self.create_polygon(
+        rounded_rectangle_points(x1, y1, x2, y2, radius),
         smooth=True,
         **kwargs
     )
 
-# Custom Canvas class to create rounded frames
-class RoundedFrame(tk.Canvas):
-    def __init__(self, parent, width, height, corner_radius, color, **kwargs):
-        tk.Canvas.__init__(self, parent, width=width, height=height, bg=parent.cget('bg'), highlightthickness=0, **kwargs)
-        self.corner_radius = corner_radius
-        self.color = color
-        self.width = width
-        self.height = height
-        self.draw_rounded_rect()
-        
-    def draw_rounded_rect(self):
-        # Draw a rounded rectangle on the canvas
-        self.create_rounded_rectangle(
-            2, 2, self.width-2, self.height-2,
-            radius=self.corner_radius,
-            fill=self.color,
-            outline=self.color
-        )
-
 # Custom Frame class to create rounded entry fields
 class RoundedEntryFrame(tk.Frame):
     def __init__(self, parent, width, height, corner_radius, color, **kwargs):
@@ -96,30 +95,293 @@ class RoundedEntryFrame(tk.Frame):
     def focus(self):
         return self.entry.focus()
 
-# Custom Frame class to create a scrollable frame
-class ScrolledFrame(tk.Frame):
-    def __init__(self, parent, *args, **kwargs):
-        tk.Frame.__init__(self, parent, *args, **kwargs)
-        
-        # Create a canvas and a viewport frame
-        self.canvas = tk.Canvas(self, borderwidth=0, background="#000000")
-        self.viewPort = tk.Frame(self.canvas, background="#000000")
-        
-        # Add a vertical scrollbar
+# Compact record of every message in the chat log
+class ChatHistory:
+    """Messages stored as parallel arrays, with the vertical offset of each one.
+
+    offsets[i] is the top of message i and offsets[-1] the total height, so
+    finding the messages inside a viewport is a binary search however long
+    the conversation gets.
+    """
+
+    def __init__(self):
+        self.messages = []  # Message text
+        self.senders = bytearray()  # 1 for the user, 0 for the bot
+        self.minutes = array("H")  # Time sent, as minutes past midnight
+        self.heights = array("I")  # Height of each bubble including its gap
+        self.offsets = array("Q", [0])
+
+    def __len__(self):
+        return len(self.messages)
+
+    @property
+    def total_height(self):
+        return self.offsets[-1]
+
+    def append(self, message, is_user, minute, height):
+        self.messages.append(message)
+        self.senders.append(1 if is_user else 0)
+        self.minutes.append(minute)
+        self.heights.append(height)
+        self.offsets.append(self.offsets[-1] + height)
+
+    def update_last(self, message, height):
+        # Change the newest message's text and height
+        self.messages[-1] = message
+        self.heights[-1] = height
+        self.offsets[-1] = self.offsets[-2] + height
+
+    def pop(self):
+        # Drop the newest message
+        self.messages.pop()
+        self.senders.pop()
+        self.minutes.pop()
+        self.heights.pop()
+        self.offsets.pop()
+
+    def visible_range(self, top, bottom):
+        # Index of the first message reaching below top, and one past the
+        # last message starting above bottom
+        first = max(bisect_right(self.offsets, top) - 1, 0)
+        last = min(bisect_left(self.offsets, bottom), len(self.messages))
+        return first, last
+
+# Scrollable chat log that only draws the bubbles near the viewport
+class VirtualChatLog(tk.Frame):
+    BUBBLE_GAP = 10  # Space between bubbles
+    TEXT_TOP = 22  # Message text starts below the timestamp
+    TEXT_BOTTOM = 10  # Padding under the message text
+    BUFFER = 5  # Bubbles kept drawn above and below the viewport
+    BATCH_SIZE = 500  # Queued messages laid out per frame by add_many
+    BATCH_INTERVAL = 16  # Milliseconds between batches, about one frame
+    RESIZE_DELAY = 50  # Milliseconds a resize must settle for before redrawing
+    MEASURE_CACHE_SIZE = 4096  # Message heights remembered by text
+    MESSAGE_FONT = ("Helvetica", 11)
+    TIME_FONT = ("Helvetica", 8)
+    TIME_COLOR = "#757575"
+
+    def __init__(self, parent, bubble_width, user_color, bot_color, text_color, background="#000000", **kwargs):
+        tk.Frame.__init__(self, parent, bg=background, **kwargs)
+        self.bubble_width = bubble_width
+        self.wrap_width = bubble_width - 40
+        self.colors = (bot_color, user_color)
+        self.text_color = text_color
+        self.history = ChatHistory()
+
+        # Bubbles are canvas items rather than widgets; each slot holds the
+        # ids for one bubble and is reused as messages scroll in and out
+        self.slots = []  # [shape id, time id, text id]
+        self.slot_for = {}  # Message index -> slot currently drawing it
+        self.spare = []  # Hidden slots ready for reuse
+        self.render_pending = False
+
+        # Messages from add_many waiting to be laid out, a batch per frame
+        self.queued = deque()  # (message, is_user, minute)
+        self.flush_pending = False
+        self.scroll_pending = False
+        self.resize_job = None
+        # Message text -> measured bubble height. The wrap width is fixed
+        # when the log is created, so a measured height never goes stale
+        self.heights_by_text = {}
+
+        # Create a canvas and a vertical scrollbar
+        self.canvas = tk.Canvas(self, borderwidth=0, background=background, highlightthickness=0, yscrollincrement=20)
         self.vsb = tk.Scrollbar(self, orient="vertical", command=self.canvas.yview)
-        self.canvas.configure(yscrollcommand=self.vsb.set)
-        
-        # Pack the scrollbar and canvas
+        self.canvas.configure(yscrollcommand=self.on_scroll)
         self.vsb.pack(side="right", fill="y")
         self.canvas.pack(side="left", fill="both", expand=True)
-        self.canvas.create_window((4,4), window=self.viewPort, anchor="nw", tags="self.viewPort")
 
-        # Bind the configure event to adjust the scroll region
-        self.viewPort.bind("<Configure>", self.onFrameConfigure)
+        # Off-screen text item used to measure how tall a message wraps to
+        self.measure_item = self.canvas.create_text(
+            -10000, 0, anchor="nw", width=self.wrap_width, font=self.MESSAGE_FONT
+        )
 
-    def onFrameConfigure(self, event):
-        # Update the scroll region to encompass the inner frame
-        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+        self.canvas.bind("<Configure>", self.on_configure)
+        self.canvas.bind("<MouseWheel>", self.on_mousewheel)
+        self.canvas.bind("<Button-4>", lambda event: self.canvas.yview_scroll(-3, "units"))
+        self.canvas.bind("<Button-5>", lambda event: self.canvas.yview_scroll(3, "units"))
+
+    def measure(self, message):
+        # Height of the whole bubble for message, gap included. Each
+        # measurement is a round trip to Tk, and greetings, placeholders and
+        # canned replies recur, so heights are remembered by text
+        height = self.heights_by_text.get(message)
+        if height is not None:
+            return height
+        self.canvas.itemconfigure(self.measure_item, text=message)
+        box = self.canvas.bbox(self.measure_item)
+        text_height = box[3] - box[1] if box else 0
+        height = text_height + self.TEXT_TOP + self.TEXT_BOTTOM + self.BUBBLE_GAP
+        if len(self.heights_by_text) >= self.MEASURE_CACHE_SIZE:
+            self.heights_by_text.clear()
+        self.heights_by_text[message] = height
+        return height
+
+    def add(self, message, is_user=True, when=None):
+        # Anything still queued by add_many comes first
+        if self.queued:
+            self.flush(limit=None)
+        when = when or datetime.now()
+        self.history.append(message, is_user, when.hour * 60 + when.minute, self.measure(message))
+        self.update_scrollregion()
+
+    def add_many(self, entries):
+        # Queue (message, is_user, when) entries, when being optional, to be
+        # laid out BATCH_SIZE a frame with one scroll region update and one
+        # redraw each, so thousands of messages don't freeze the window
+        now = datetime.now()
+        for entry in entries:
+            message, is_user = entry[0], entry[1]
+            when = (entry[2] if len(entry) > 2 else None) or now
+            self.queued.append((message, is_user, when.hour * 60 + when.minute))
+        if self.queued and not self.flush_pending:
+            self.flush_pending = True
+            self.after_idle(self.flush)
+
+    def flush(self, limit=BATCH_SIZE):
+        # Lay out up to limit queued messages (all of them for None), then
+        # leave the rest for the next frame so the window stays responsive
+        self.flush_pending = False
+        count = len(self.queued) if limit is None else min(limit, len(self.queued))
+        append, measure, popleft = self.history.append, self.measure, self.queued.popleft
+        for _ in range(count):
+            message, is_user, minute = popleft()
+            append(message, is_user, minute, measure(message))
+        self.update_scrollregion()
+        self.schedule_render()
+        if self.queued:
+            self.flush_pending = True
+            self.after(self.BATCH_INTERVAL, self.flush)
+
+    def update_scrollregion(self):
+        self.canvas.configure(scrollregion=(0, 0, self.bubble_width, self.history.total_height))
+
+    def remove_last(self):
+        # Forget the newest message and free the slot drawing it; anything
+        # still queued by add_many is laid out first, as it came before
+        if self.queued:
+            self.flush(limit=None)
+        index = len(self.history) - 1
+        if index < 0:
+            return
+        self.history.pop()
+        slot = self.slot_for.pop(index, None)
+        if slot is not None:
+            for item in slot:
+                self.canvas.itemconfigure(item, state="hidden")
+            self.spare.append(slot)
+        self.update_scrollregion()
+        self.schedule_render()
+
+    def replace_last(self, message):
+        # Swap the newest message's text, keeping its sender and time; its
+        # bubble is redrawn in place rather than recreated
+        if self.queued:
+            self.flush(limit=None)
+        index = len(self.history) - 1
+        if index < 0:
+            return
+        self.history.update_last(message, self.measure(message))
+        self.update_scrollregion()
+        slot = self.slot_for.get(index)
+        if slot is not None:
+            self.draw(slot, index)
+
+    def extend_last(self, text):
+        # Add text to the end of the newest message, as a streamed reply arrives
+        if self.queued:
+            self.flush(limit=None)
+        if len(self.history):
+            self.replace_last(self.history.messages[-1] + text)
+
+    def scroll_to_bottom(self):
+        # Deferred to the next redraw, so a burst of messages scrolls once
+        self.scroll_pending = True
+        self.schedule_render()
+
+    def on_configure(self, event):
+        # Dragging the window edge sends a stream of these; redraw once
+        # they've stopped for RESIZE_DELAY
+        if self.resize_job is not None:
+            self.after_cancel(self.resize_job)
+        self.resize_job = self.after(self.RESIZE_DELAY, self.on_resized)
+
+    def on_resized(self):
+        self.resize_job = None
+        self.schedule_render()
+
+    def on_scroll(self, first, last):
+        self.vsb.set(first, last)
+        self.schedule_render()
+
+    def on_mousewheel(self, event):
+        self.canvas.yview_scroll(int(-event.delta / 120) or (-1 if event.delta > 0 else 1), "units")
+
+    def schedule_render(self):
+        # Coalesce the many scroll and resize events of one frame into a single redraw
+        if not self.render_pending:
+            self.render_pending = True
+            self.after_idle(self.render)
+
+    def render(self):
+        self.render_pending = False
+        if self.scroll_pending:
+            self.scroll_pending = False
+            self.canvas.yview_moveto(1.0)
+        top = self.canvas.canvasy(0)
+        bottom = top + self.canvas.winfo_height()
+        first, last = self.history.visible_range(top, bottom)
+        first = max(first - self.BUFFER, 0)
+        last = min(last + self.BUFFER, len(self.history))
+
+        # Hide and free the slots whose messages have scrolled out of range
+        for index in list(self.slot_for):
+            if not first <= index < last:
+                slot = self.slot_for.pop(index)
+                for item in slot:
+                    self.canvas.itemconfigure(item, state="hidden")
+                self.spare.append(slot)
+
+        # Draw the newly visible messages into spare or new slots
+        for index in range(first, last):
+            if index in self.slot_for:
+                continue
+            slot = self.spare.pop() if self.spare else self.create_slot()
+            self.draw(slot, index)
+            self.slot_for[index] = slot
+
+    def create_slot(self):
+        shape = self.canvas.create_polygon(0, 0, 0, 0, smooth=True)
+        time_item = self.canvas.create_text(0, 0, anchor="ne", font=self.TIME_FONT, fill=self.TIME_COLOR)
+        text_item = self.canvas.create_text(
+            0, 0, width=self.wrap_width, justify="left", font=self.MESSAGE_FONT, fill=self.text_color
+        )
+        slot = [shape, time_item, text_item]
+        self.slots.append(slot)
+        return slot
+
+    def draw(self, slot, index):
+        history = self.history
+        is_user = history.senders[index]
+        color = self.colors[is_user]
+        top = history.offsets[index] + self.BUBBLE_GAP // 2
+        bottom = top + history.heights[index] - self.BUBBLE_GAP
+        left, right = 10, self.bubble_width - 10
+        minute = history.minutes[index]
+
+        shape, time_item, text_item = slot
+        self.canvas.coords(shape, *rounded_rectangle_points(left + 2, top, right - 2, bottom, 20))
+        self.canvas.itemconfigure(shape, fill=color, outline=color, state="normal")
+        self.canvas.coords(time_item, right - 10, top + 4)
+        self.canvas.itemconfigure(time_item, text=f"{minute // 60:02d}:{minute % 60:02d}", state="normal")
+        # User messages sit on the left of the bubble, bot replies on the right
+        if is_user:
+            self.canvas.coords(text_item, left + 15, top + self.TEXT_TOP)
+            self.canvas.itemconfigure(text_item, anchor="nw")
+        else:
+            self.canvas.coords(text_item, right - 15, top + self.TEXT_TOP)
+            self.canvas.itemconfigure(text_item, anchor="ne")
+        self.canvas.itemconfigure(text_item, text=history.messages[index], state="normal")
 
 # Main class for the chatbot GUI
 class ModernChatbotGUI:
@@ -134,19 +396,35 @@ class ModernChatbotGUI:
     TEXT_COLOR = "#FFFFFF"
     INPUT_HEIGHT = 40
 
-    # Set of phrases that trigger exit commands
-    EXIT_PHRASES = {
-        "bye", "quit", "exit", "shutdown", "good bye", "goodbye",
-        "you can go", "sleep", "close", "ok bye", "okay bye"
-    }
+    # Placeholder shown while a reply is being generated
+    TYPING_MESSAGE = "Typing..."
+    POLL_INTERVAL = 30  # Milliseconds between checks for finished replies
+    # One worker, so replies are generated one after another: each reads and
+    # updates the session's state and draws from its RNG
+    RESPONSE_WORKERS = 1
 
-    def __init__(self):
+    # Set of phrases that trigger exit commands when they're the whole message
+    EXIT_PHRASES = EXIT_COMMANDS
+
+    def __init__(self, transcript=None):
         self.window = tk.Tk()  # Create the main window
         self.setup_window()  # Setup window properties
         self.create_styles()  # Create styles for widgets
         self.create_widgets()  # Create the GUI widgets
         self.name = None  # User's name
         self.chatbot_name = None  # Chatbot's name
+        self.session = None  # Conversation state, including its own RNG
+        self.transcript = transcript  # TranscriptWriter keeping a copy of the conversation, if any
+        self.session_id = uuid.uuid4().hex  # Identifies this conversation in the transcript
+
+        # Replies are generated on worker threads and handed back through a
+        # queue, so a slow responder never blocks the Tk event loop
+        self.executor = ThreadPoolExecutor(max_workers=self.RESPONSE_WORKERS, thread_name_prefix="responder")
+        self.finished = queue.Queue()
+        self.request_id = 0  # Id of the newest request
+        self.pending = None  # (request id, future) still waiting for a reply
+        self.reply_parts = []  # Parts of the pending reply shown so far
+        self.polling = False
 
     def setup_window(self):
         # Set window title and dimensions
@@ -180,43 +458,6 @@ class ModernChatbotGUI:
             background=self.BACKGROUND_COLOR
         )
 
-    def create_message_bubble(self, message, is_user=True):
-        # Determine bubble color based on message sender
-        bubble_color = self.USER_MSG_COLOR if is_user else self.BOT_MSG_COLOR
-        bubble_frame = RoundedFrame(
-            self.chat_log.viewPort,
-            width=self.WINDOW_WIDTH - 40,
-            height=60,
-            corner_radius=20,
-            color=bubble_color
-        )
-        
-        # Create a label for the time of the message
-        time_label = tk.Label(
-            bubble_frame,
-            text=datetime.now().strftime("%H:%M"),
-            font=("Helvetica", 8),
-            fg="#757575",
-            bg=bubble_color
-        )
-        time_label.pack(anchor="e", padx=5, pady=(2, 0))
-        
-        # Create a label for the message text
-        msg_label = tk.Label(
-            bubble_frame,
-            text=message,
-            wraplength=self.WINDOW_WIDTH - 80,
-            justify="left",
-            font=("Helvetica", 11),
-            bg=bubble_color,
-            fg=self.TEXT_COLOR,
-            padx=10,
-            pady=5
-        )
-        msg_label.pack(anchor="w" if is_user else "e", padx=5, pady=(0, 5))
-        
-        return bubble_frame
-
     def create_widgets(self):
         # Create the main frame for the chat interface
         self.main_frame = ttk.Frame(self.window, style='Modern.TFrame')
@@ -226,8 +467,15 @@ class ModernChatbotGUI:
         self.chat_container = tk.Frame(self.main_frame, bg=self.BACKGROUND_COLOR)
         self.chat_container.pack(fill=tk.BOTH, expand=True)
 
-        # Create a scrollable frame for the chat log
-        self.chat_log = ScrolledFrame(self.chat_container)
+        # Create a virtualised, scrollable chat log
+        self.chat_log = VirtualChatLog(
+            self.chat_container,
+            bubble_width=self.WINDOW_WIDTH - 40,
+            user_color=self.USER_MSG_COLOR,
+            bot_color=self.BOT_MSG_COLOR,
+            text_color=self.TEXT_COLOR,
+            background=self.BACKGROUND_COLOR
+        )
         self.chat_log.pack(fill=tk.BOTH, expand=True)
 
         # Create a welcome frame for initial user interaction
@@ -319,8 +567,12 @@ class ModernChatbotGUI:
 
     def handle_name_submission(self, event=None):
         # Retrieve user and chatbot names
-        self.name = self.name_entry.get() or "Friend"
-        self.chatbot_name = self.chatbot_name_entry.get() or get_random_agent_name()
+        self.session = ChatSession(
+            user_name=self.name_entry.get(),
+            agent_name=self.chatbot_name_entry.get()
+        )
+        self.name = self.session.user_name
+        self.chatbot_name = self.session.agent_name
 
         # Hide welcome frame and show input frame
         self.welcome_frame.pack_forget()
@@ -336,11 +588,36 @@ class ModernChatbotGUI:
         self.entry.focus()
 
     def add_message(self, message, is_user=True):
-        # Create and display a message bubble
-        bubble = self.create_message_bubble(message, is_user)
-        bubble.pack(anchor="e", padx=10, pady=5, fill="x")
-        self.chat_log.update_idletasks()  # Update the layout
-        self.chat_log.canvas.yview_moveto(1.0)  # Scroll to the bottom
+        # Record the message and scroll to it; only visible bubbles get drawn
+        self.chat_log.add(message, is_user)
+        self.chat_log.scroll_to_bottom()
+        self.log_message(message, is_user)
+
+    def add_messages(self, entries, log=True):
+        # Show many (message, is_user[, when]) entries at once, e.g. for a
+        # scripted demo; they're laid out in batches and scrolled to once.
+        # A reply still being generated is dropped first, as a new message
+        # would drop it, so its placeholder stays the newest bubble
+        self.cancel_pending()
+        entries = list(entries)
+        self.chat_log.add_many(entries)
+        self.chat_log.scroll_to_bottom()
+        if log:
+            for entry in entries:
+                self.log_message(entry[0], entry[1])
+
+    def restore_transcript(self, records):
+        # Show a saved conversation, e.g. from read_transcripts(); it's
+        # already on record, so it isn't logged again
+        self.add_messages(
+            ((record.text, record.speaker == "user", datetime.fromtimestamp(record.timestamp)) for record in records),
+            log=False
+        )
+
+    def log_message(self, message, is_user):
+        # Keep a copy of the conversation when a transcript is being written
+        if self.transcript is not None:
+            self.transcript.append(self.session_id, "user" if is_user else "bot", message)
 
     def handle_user_input(self, event=None):
         # Get user input and process it
@@ -348,6 +625,9 @@ class ModernChatbotGUI:
         if not user_input:
             return
 
+        # A new message makes any reply still being generated stale
+        self.cancel_pending()
+
         # Check for exit commands
         if self.is_exit_command(user_input):
             self.add_message(user_input, is_user=True)
@@ -355,21 +635,121 @@ class ModernChatbotGUI:
             self.window.after(1500, self.window.quit)  # Close after a delay
             return
 
-        # Display user input and generate chatbot response
+        # Display user input and a placeholder while the reply is generated
         self.add_message(user_input, is_user=True)
-        response = generate_response(user_input)
-        self.add_message(response, is_user=False)
+        self.chat_log.add(self.TYPING_MESSAGE, is_user=False)
+        self.chat_log.scroll_to_bottom()
         self.entry.delete(0, tk.END)  # Clear the entry field
+        self.request_response(user_input)
+
+    def request_response(self, user_input):
+        # Generate the reply on a worker thread
+        self.request_id += 1
+        request_id = self.request_id
+        future = self.executor.submit(self.stream_response, request_id, user_input)
+        future.add_done_callback(lambda done: self.finished.put((request_id, None, done)))
+        self.pending = (request_id, future)
+        self.reply_parts = []
+        if not self.polling:
+            self.polling = True
+            self.window.after(self.POLL_INTERVAL, self.poll_responses)
+
+    def stream_response(self, request_id, user_input):
+        # Runs on a worker thread: hand each part of the reply over as soon
+        # as it's ready, stopping early if a newer message supersedes it.
+        # One superseded while it waited is dropped before it's resolved, so
+        # it never touches the session's state or RNG
+        if request_id != self.request_id:
+            return
+        for part in self.session.respond_stream(user_input):
+            if request_id != self.request_id:
+                break
+            self.finished.put((request_id, part, None))
+
+    def cancel_pending(self):
+        # Stop the reply still being generated. Parts it has already handed
+        # over are drawn first, as a reply can finish before it's polled;
+        # whatever was drawn stays as the bot's message and is logged, and
+        # only a placeholder with nothing in it yet is removed
+        self.take_responses()
+        if self.pending is None:
+            return
+        request_id, future = self.pending
+        future.cancel()
+        self.pending = None
+        if self.reply_parts:
+            self.log_message("".join(self.reply_parts), is_user=False)
+        else:
+            self.chat_log.remove_last()
+
+    def poll_responses(self):
+        # Runs on the Tk thread
+        self.take_responses()
+
+        # Keep polling only while a reply is outstanding
+        if self.pending is not None:
+            self.window.after(self.POLL_INTERVAL, self.poll_responses)
+        else:
+            self.polling = False
+
+    def take_responses(self):
+        # Draw what the worker threads have handed over: the first part of
+        # a reply replaces its placeholder and later parts extend the same
+        # bubble
+        while True:
+            try:
+                request_id, part, future = self.finished.get_nowait()
+            except queue.Empty:
+                break
+            if self.pending is None or request_id != self.pending[0]:
+                continue  # Stale reply for a message that has since been superseded
+            if part is not None:
+                if self.reply_parts:
+                    self.chat_log.extend_last(part)
+                else:
+                    self.chat_log.replace_last(part)
+                self.reply_parts.append(part)
+                self.chat_log.scroll_to_bottom()
+                continue
+
+            # The reply is complete
+            self.pending = None
+            if future.cancelled():
+                continue
+            if future.exception() is not None:
+                response = "Sorry, something went wrong while answering that. Could you try again?"
+                self.chat_log.replace_last(response)
+                self.chat_log.scroll_to_bottom()
+            else:
+                response = "".join(self.reply_parts)
+            self.log_message(response, is_user=False)
 
     def is_exit_command(self, user_input: str) -> bool:
-        # Check if the user input matches # any of the predefined exit phrases
-        return any(phrase in user_input.lower() for phrase in self.EXIT_PHRASES)
+        # Whole words only, so "when does the gym close" doesn't end the chat
+        return is_exit_message(user_input, self.EXIT_PHRASES)
 
     def run(self):
         # Start the main event loop of the application
         self.window.mainloop()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.transcript is not None:
+            self.transcript.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Chat with the assistant in a window.")
+    parser.add_argument("--replay", metavar="DIR", help="show the conversations logged in a transcript directory first")
+    parser.add_argument("--session", help="only replay this session")
+    args = parser.parse_args()
+
+    # Transcripts are kept when CHATBOT_TRANSCRIPT_DIR names a directory
+    chat_app = ModernChatbotGUI(transcript=writer_from_environment())  # Create an instance of the chatbot GUI
+    if args.replay:
+        records = read_transcripts(args.replay)
+        if args.session:
+            records = (record for record in records if record.session == args.session)
+        chat_app.restore_transcript(records)
+    chat_app.run()  # Run the application
 
 # Entry point for the application
 if __name__ == "__main__":
-    chat_app = ModernChatbotGUI()  # Create an instance of the chatbot GUI
-    chat_app.run()  # Run the application
+    main()
@@ -1,169 +1,1037 @@
 import random
-from typing import Dict, List, Tuple
+import time
+from collections import deque
+from datetime import datetime
+from itertools import islice
+from types import MappingProxyType
+from typing import Callable, Deque, Dict, FrozenSet, Iterable, Iterator, List, Mapping, Match, NamedTuple, Optional, Pattern, Sequence, Tuple
 import re
 
-def get_random_agent_name() -> str:
-    """Return a random agent name from a predefined list."""
-    return random.choice(["Alex", "Charlie", "Jordan", "Taylor", "Casey"])
+try:
+    from .fuzzy_index import FuzzyIndex
+    from .instrumentation import Instrumentation, MessageTrace
+    from .keyword_index import WORD_PATTERN, KeywordIndex
+    from .normaliser import normalise
+    from .response_cache import ResponseCache, normalise_key
+    from .schedule import ScheduleIndex, build_schedules, format_day, format_moment, format_names, format_time, parse_when
+    from .session_store import SessionState
+except ImportError:  # run as a script from this folder
+    from fuzzy_index import FuzzyIndex
+    from instrumentation import Instrumentation, MessageTrace
+    from keyword_index import WORD_PATTERN, KeywordIndex
+    from normaliser import normalise
+    from response_cache import ResponseCache, normalise_key
+    from schedule import ScheduleIndex, build_schedules, format_day, format_moment, format_names, format_time, parse_when
+    from session_store import SessionState
 
-def generate_response(user_input: str) -> str:
-    """Generate an appropriate response based on user input."""
-    # Convert input to lowercase for easier matching
-    user_input = user_input.lower()
-
-    # Patterns and responses for greetings
-    greetings = {
-        r'\b(hi|hello|hey|howdy)\b': [
-            "Hi there! How can I help you today?",
-            "Hello! Nice to meet you!",
-            "Hey! How are you doing?",
-            "Hi! What can I do for you today?"
-        ],
-        r'\b(good morning)\b': [
-            "Good morning! Hope you're having a great start to your day!",
-            "Good morning! What can I help you with?",
-            "Morning! How are you today?"
-        ],
-        r'\b(good afternoon)\b': [
-            "Good afternoon! How can I assist you?",
-            "Good afternoon! What brings you here today?",
-            "Afternoon! How can I help?"
-        ],
-        r'\b(good evening)\b': [
-            "Good evening! How may I assist you?",
-            "Good evening! What can I do for you?",
-            "Evening! How can I help?"
-        ]
-    }
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
 
-    # Patterns and responses for "how are you" type questions
-    how_are_you = {
-        r'\b(how are you|how you doing|how\'s it going|what\'s up)\b': [
-            "I'm doing great, thanks for asking! How about you?",
-            "I'm excellent! How are you doing today?",
-            "All good here! How's your day going?",
-            "I'm wonderful! How about yourself?"
-        ]
+# Names the assistant can pick when the user doesn't choose one
+AGENT_NAMES: Tuple[str, ...] = ("Alex", "Charlie", "Jordan", "Taylor", "Casey")
+
+# What to call a user who doesn't give a name
+DEFAULT_USER_NAME = "Friend"
+
+# Patterns and responses for greetings
+GREETINGS: Dict[str, List[str]] = {
+    r'\b(hi|hello|hey|howdy)\b': [
+        "Hi there! How can I help you today?",
+        "Hello! Nice to meet you!",
+        "Hey! How are you doing?",
+        "Hi! What can I do for you today?"
+    ],
+    r'\b(good morning)\b': [
+        "Good morning! Hope you're having a great start to your day!",
+        "Good morning! What can I help you with?",
+        "Morning! How are you today?"
+    ],
+    r'\b(good afternoon)\b': [
+        "Good afternoon! How can I assist you?",
+        "Good afternoon! What brings you here today?",
+        "Afternoon! How can I help?"
+    ],
+    r'\b(good evening)\b': [
+        "Good evening! How may I assist you?",
+        "Good evening! What can I do for you?",
+        "Evening! How can I help?"
+    ]
+}
+
+# Patterns and responses for "how are you" type questions
+HOW_ARE_YOU: Dict[str, List[str]] = {
+    r'\b(how are you|how you doing|how\'s it going|what\'s up)\b': [
+        "I'm doing great, thanks for asking! How about you?",
+        "I'm excellent! How are you doing today?",
+        "All good here! How's your day going?",
+        "I'm wonderful! How about yourself?"
+    ]
+}
+
+# Patterns and responses for feelings
+FEELINGS: Dict[str, List[str]] = {
+    r'\b(i\'m good|i\'m great|i\'m excellent|doing good|doing great)\b': [
+        "That's wonderful to hear! What can I help you with?",
+        "I'm glad you're doing well! How can I assist you today?",
+        "That's great! What brings you here today?"
+    ],
+    r'\b(i\'m tired|i\'m exhausted|i\'m sleepy)\b': [
+        "I hope you can get some rest soon! Meanwhile, how can I help you?",
+        "Make sure to take care of yourself! What do you need assistance with?",
+        "Remember to take breaks when needed! What can I help you with?"
+    ],
+    r'\b(i\'m sad|i\'m upset|i\'m unhappy)\b': [
+        "I'm sorry to hear that. Is there anything I can do to help?",
+        "I hope things get better soon. How can I assist you today?",
+        "That must be difficult. What can I do to help?"
+    ]
+}
+
+# Patterns and responses for gratitude
+GRATITUDE: Dict[str, List[str]] = {
+    r'\b(thanks|thank you|thx|tysm)\b': [
+        "You're welcome! Is there anything else you'd like to know?",
+        "My pleasure! Let me know if you need anything else.",
+        "Happy to help! What else can I do for you?",
+        "Anytime! Don't hesitate to ask if you need more help."
+    ]
+}
+
+# Conversational intents, checked in this order after the facility lookups
+INTENTS: Dict[str, Dict[str, List[str]]] = {
+    "greeting": GREETINGS,
+    "how_are_you": HOW_ARE_YOU,
+    "feeling": FEELINGS,
+    "gratitude": GRATITUDE
+}
+
+# Default responses for unknown inputs
+DEFAULT_RESPONSES: List[str] = [
+    "I'm not quite sure about that. Could you please rephrase your question?",
+    "Interesting! Could you tell me more about what you're looking for?",
+    "I want to help, but I'm not sure I understood. Could you explain a bit more?",
+    "Hmm, I'm not quite following. Could you try asking that in a different way?",
+    "I'm here to help! Could you provide more details about what you need?"
+]
+
+# Information about facilities
+FACILITIES_INFO: Dict[str, Dict[str, str]] = {
+    "library": {
+        "location": "Building A, first floor",
+        "hours": "9:00 AM to 6:00 PM",
+        "details": "It's right across from the student center. Would you like directions?",
+        "follow_up": "From the main entrance, go through the student center and out the far side; Building A is straight across, and the library is on its first floor.",
+        "aliases": "libraries"
+    },
+    "cafeteria": {
+        "location": "Student Center, ground floor",
+        "hours": "7:30 AM to 8:00 PM",
+        "details": "It offers multiple food stations. Need today's menu?",
+        "follow_up": "Today's stations are the grill, pasta, a salad bar and a vegetarian special. The full menu is posted by the Student Center entrance.",
+        "aliases": "canteen, dining hall"
+    },
+    "coffee": {
+        "location": "Student Center, next to the cafeteria",
+        "hours": "8:00 AM to 5:00 PM",
+        "details": "They make amazing lattes! Want to know about their specials?",
+        "follow_up": "This week it's a pumpkin spice latte and a cold brew with oat milk, and any pastry is half price after 3:00 PM.",
+        "aliases": "coffee shop, cafe, café"
+    },
+    "gym": {
+        "location": "Athletics Building, behind the Student Center",
+        "hours": "6:00 AM to 10:00 PM",
+        "details": "It's equipped with modern facilities. Would you like to know about membership?",
+        "follow_up": "Membership is free for enrolled students; just bring your student ID to the front desk. Staff and alumni can join by the semester.",
+        "aliases": "fitness center, fitness centre"
+    },
+    "parking": {
+        "location": "Lots A, B, and C",
+        "hours": "Open 24/7",
+        "details": "Lot A is closest to the main building, while B and C are near the Athletics Building. Need a parking map?",
+        "follow_up": "You can pick up a parking map at the Administration office in Building C, or find one on the board at each lot entrance.",
+        "aliases": "car park, parking lot"
+    },
+    "bookstore": {
+        "location": "Building B, ground floor",
+        "hours": "9:00 AM to 5:00 PM",
+        "details": "They have all your textbook needs plus university merchandise!",
+        "aliases": "book store, bookshop"
+    },
+    "administration": {
+        "location": "Building C, second floor",
+        "hours": "9:00 AM to 5:00 PM",
+        "details": "This includes Admissions, Financial Aid, and the Registrar's office. Need specific directions?",
+        "follow_up": "Take the main stairs in Building C to the second floor: Admissions is on the left, Financial Aid straight ahead and the Registrar on the right.",
+        "aliases": "admin, admin office, admissions, financial aid, registrar"
     }
+}
+
+# Patterns for "where is" questions and opening hours queries; the
+# captured phrase may run to a multi-word name such as "coffee shop"
+WHERE_PATTERN = r'where(?:\s+is)?(?:\s+the)?\s+(?P<where_key>\w+(?:\s+\w+){0,3})'
+HOURS_PATTERN = r'when(?:\s+does)?(?:\s+the)?\s+(?P<hours_key>\w+(?:\s+\w+){0,3}?)\s+(open|close|open\s+and\s+close)'
+
+# Patterns for "is the gym open now?" and "what's open after 9pm?"; the
+# rest of the clause says when ("on sunday", "at 8am"), read by parse_when()
+OPEN_LIST_PATTERN = r"(?:what(?:'s|\s+is|\s+are)|which\s+\w+(?:\s+\w+)?\s+are|is\s+anything|anything)\s+open\b(?P<open_list_when>[^?.!,;]*)"
+OPEN_PATTERN = r'is(?:\s+the)?\s+(?P<open_key>\w+(?:\s+\w+){0,3}?)\s+open\b(?P<open_when>[^?.!,;]*)'
+
+# Separates the alternative names listed in a facility's "aliases" field
+ALIAS_SEPARATOR = ","
+
+# Short replies to a facility answer that ended in an offer ("Would you
+# like directions?"), and whether each takes it up
+FOLLOW_UP_REPLIES: Dict[str, bool] = {
+    **dict.fromkeys((
+        "yes", "yes please", "yes thanks", "yes thank you", "yeah", "yeah please", "yep", "yup", "sure",
+        "sure thing", "ok", "okay", "please", "definitely", "absolutely", "of course", "go ahead", "why not"
+    ), True),
+    **dict.fromkeys(("no", "no thanks", "no thank you", "nope", "nah", "not now", "maybe later"), False)
+}
+
+# Replies to an offer turned down
+DECLINE_RESPONSES: Tuple[str, ...] = (
+    "No problem! Is there anything else I can help you with?",
+    "Alright! Let me know if you need anything else.",
+    "Okay! What else can I do for you?"
+)
+
+# Messages that end the conversation when they make up the whole of it
+EXIT_COMMANDS: FrozenSet[str] = frozenset((
+    "bye", "quit", "exit", "shutdown", "good bye", "goodbye",
+    "you can go", "sleep", "close", "ok bye", "okay bye"
+))
+
+# Farewells that end it on their own or as the last clause of a longer
+# message, set off by punctuation, as in "thanks, bye!"
+FAREWELLS: FrozenSet[str] = frozenset((
+    "bye", "bye bye", "goodbye", "good bye", "see you", "see you later", "ok bye", "okay bye", "bye for now"
+))
+
+# Punctuation that separates the clauses of a message
+CLAUSE_PATTERN = re.compile(r"[,.;:!?]+|\s[-–—]+\s")
+
+# Words that point back at the facility last talked about, as in "when does it open?"
+REFERENCE_PATTERN = re.compile(r"\b(?:it|there|that)\b")
+
+# Lowest confidence at which a misspelt facility name is accepted
+FUZZY_THRESHOLD = 0.75
+
+# Messages answered per chunk by generate_responses
+BATCH_CHUNK_SIZE = 1000
+
+# Upper bound on the literal prefixes collected for a single pattern
+MAX_PREFIXES = 64
+
+
+def literal_prefixes(pattern: str) -> Optional[FrozenSet[str]]:
+    """Return literal strings one of which starts every match of pattern, or None."""
+    parsed = sre_parse.parse(pattern)
+    if parsed.state.flags & (re.IGNORECASE | re.VERBOSE):
+        return None
+    prefixes = frozenset(prefix for prefix, _ in collect_prefixes(parsed))
+    if not prefixes or "" in prefixes:
+        return None
+    return prefixes
+
+def collect_prefixes(items) -> List[Tuple[str, bool]]:
+    """Walk parsed regex items, returning (prefix, reached_end) pairs."""
+    results = [("", True)]
+    for op, av in items:
+        if op is sre_parse.AT:
+            # Anchors like \b don't consume text, so the prefix carries on
+            continue
+        if op is sre_parse.LITERAL:
+            branches = [(chr(av), True)]
+        elif op is sre_parse.SUBPATTERN and not av[1] and not av[2]:
+            branches = collect_prefixes(av[3])
+        elif op is sre_parse.BRANCH:
+            branches = [pair for branch in av[1] for pair in collect_prefixes(branch)]
+        else:
+            branches = [("", False)]
+
+        # Extend every prefix that is still open, freezing the rest
+        extended = []
+        for prefix, open_ended in results:
+            if not open_ended:
+                extended.append((prefix, False))
+                continue
+            for suffix, reached_end in branches:
+                extended.append((prefix + suffix, reached_end))
+        if len(extended) > MAX_PREFIXES:
+            return [(prefix, False) for prefix, _ in results]
+        results = extended
+        if not any(open_ended for _, open_ended in results):
+            break
+    return results
+
+
+def normalise_name(name: str) -> str:
+    """Lowercase a facility name or alias and separate its words with single spaces."""
+    return " ".join(WORD_PATTERN.findall(name.lower()))
+
+def facility_aliases(info: Mapping[str, object]) -> List[str]:
+    """Return the other names a facility goes by, from a list or a comma-separated string."""
+    aliases = info.get("aliases") or ()
+    if isinstance(aliases, str):
+        aliases = aliases.split(ALIAS_SEPARATOR)
+    return [alias for alias in (normalise_name(alias) for alias in aliases) if alias]
 
-    # Patterns and responses for feelings
-    feelings = {
-        r'\b(i\'m good|i\'m great|i\'m excellent|doing good|doing great)\b': [
-            "That's wonderful to hear! What can I help you with?",
-            "I'm glad you're doing well! How can I assist you today?",
-            "That's great! What brings you here today?"
-        ],
-        r'\b(i\'m tired|i\'m exhausted|i\'m sleepy)\b': [
-            "I hope you can get some rest soon! Meanwhile, how can I help you?",
-            "Make sure to take care of yourself! What do you need assistance with?",
-            "Remember to take breaks when needed! What can I help you with?"
-        ],
-        r'\b(i\'m sad|i\'m upset|i\'m unhappy)\b': [
-            "I'm sorry to hear that. Is there anything I can do to help?",
-            "I hope things get better soon. How can I assist you today?",
-            "That must be difficult. What can I do to help?"
+
+class Resolution(NamedTuple):
+    """Which intent answers a message: a facility to describe, or replies to pick from.
+
+    confidence is below 1 when the facility was recognised from a misspelt
+    name, is the classifier's score for a fallback answer and is 0 for the
+    default replies; when holds the words saying when an "open" question is about.
+    """
+    intent: str
+    facility: Optional[str] = None
+    responses: Tuple[str, ...] = ()
+    confidence: float = 1.0
+    when: str = ""
+
+
+class IntentEngine:
+    """Compiled patterns and frozen response tables, built once and shared by every call."""
+
+    def __init__(
+        self,
+        intents: Optional[Mapping[str, Mapping[str, Sequence[str]]]] = None,
+        facilities: Optional[Mapping[str, Mapping[str, str]]] = None,
+        default_responses: Optional[Sequence[str]] = None,
+        seed: Optional[int] = None,
+        cache_size: int = 0,
+        cache_ttl: Optional[float] = None,
+        indexes: Optional[Mapping[str, object]] = None,
+        fuzzy_threshold: Optional[float] = FUZZY_THRESHOLD,
+        fallback_threshold: Optional[float] = None,
+        instrumentation: Optional[Instrumentation] = None,
+        clock: Callable[[], datetime] = datetime.now
+    ):
+        """Build an engine from intent, facility and default-reply tables.
+
+        indexes, as returned by export_indexes(), lets a snapshot skip
+        rebuilding the keyword automaton, the fuzzy name index and the
+        prefilter prefixes. A fuzzy_threshold of None turns off typo
+        tolerance. Setting fallback_threshold scores messages no rule
+        matched against every intent and facility, which needs NumPy and
+        SciPy. With instrumentation, every reply is timed stage by stage and
+        recorded there. clock gives the local time "open now" questions are
+        answered for.
+        """
+        if intents is None:
+            intents = INTENTS
+        if facilities is None:
+            facilities = FACILITIES_INFO
+        if default_responses is None:
+            default_responses = DEFAULT_RESPONSES
+
+        # Compile each intent pattern once, keeping category and pattern order
+        self.rules: Tuple[Tuple[str, Pattern, Tuple[str, ...]], ...] = tuple(
+            (category, re.compile(pattern), tuple(responses))
+            for category, patterns in intents.items()
+            for pattern, responses in patterns.items()
+        )
+
+        # Freeze the facility catalogue so a shared engine can't be mutated
+        self.facilities: Mapping[str, Mapping[str, str]] = MappingProxyType({
+            keyword.lower(): MappingProxyType(dict(info))
+            for keyword, info in facilities.items()
+        })
+        self.default_responses: Tuple[str, ...] = tuple(default_responses)
+
+        # Facilities whose answer ends by offering something more
+        self.offers: FrozenSet[str] = frozenset(
+            keyword for keyword, info in self.facilities.items() if info.get("details", "").rstrip().endswith("?")
+        )
+
+        # Opening hours parsed once into interval arrays, so "open now"
+        # questions are binary searches; facilities whose hours can't be
+        # read are left out and answered from the text instead
+        self.clock = clock
+        self.schedules = build_schedules(self.facilities)
+        self.schedule_index = ScheduleIndex(self.schedules)
+
+        # A seeded engine picks reply variants from its own RNG
+        self.rng: Optional[random.Random] = random.Random(seed) if seed is not None else None
+
+        self.instrumentation = instrumentation
+
+        # Opt-in cache of resolved intents, keyed on normalised text
+        self.cache: Optional[ResponseCache] = ResponseCache(cache_size, cache_ttl) if cache_size else None
+
+        # Every name a facility answers to, mapped to its keyword; the
+        # keywords come first so they win ties against another's alias
+        self.names: Dict[str, str] = {normalise_name(keyword): keyword for keyword in self.facilities}
+        for keyword, info in self.facilities.items():
+            for alias in facility_aliases(info):
+                self.names.setdefault(alias, keyword)
+
+        # Names are matched as whole words by one index, and "where"/"when"
+        # questions fall back to a typo-tolerant one
+        self.fuzzy_threshold = fuzzy_threshold
+        if indexes is not None:
+            self.keyword_index = KeywordIndex.from_state(indexes["keywords"])
+            self.fuzzy_index = FuzzyIndex.from_state(indexes["fuzzy"])
+        else:
+            self.keyword_index = KeywordIndex(self.names)
+            self.fuzzy_index = FuzzyIndex(self.names)
+
+        # Merge every pattern into one alternation, ordered by priority:
+        # where/hours/open questions first, then the intent rules.
+        # Each alternative sits inside a zero-width lookahead, so a single
+        # finditer pass reports the highest-priority pattern starting at
+        # every position, overlapping matches included.
+        alternatives = [
+            f"(?P<where>{WHERE_PATTERN})",
+            f"(?P<hours>{HOURS_PATTERN})",
+            f"(?P<open_list>{OPEN_LIST_PATTERN})",
+            f"(?P<open>{OPEN_PATTERN})"
         ]
-    }
+        self.priorities: Dict[str, int] = {}
+        self.targets: List[Tuple[str, Tuple[str, ...]]] = []
+        for category, pattern, responses in self.rules:
+            self.add_alternative(alternatives, category, pattern.pattern, responses)
+        self.matcher = re.compile("(?=" + "|".join(alternatives) + ")")
 
-    # Information about facilities
-    facilities_info: Dict[str, Dict[str, str]] = {
-        "library": {
-            "location": "Building A, first floor",
-            "hours": "9:00 AM to 6:00 PM",
-            "details": "It's right across from the student center. Would you like directions?"
-        },
-        "cafeteria": {
-            "location": "Student Center, ground floor",
-            "hours": "7:30 AM to 8:00 PM",
-            "details": "It offers multiple food stations. Need today's menu?"
-        },
-        "coffee": {
-            "location": "Student Center, next to the cafeteria",
-            "hours": "8:00 AM to 5:00 PM",
-            "details": "They make amazing lattes! Want to know about their specials?"
-        },
-        "gym": {
-            "location": "Athletics Building, behind the Student Center",
-            "hours": "6:00 AM to 10:00 PM",
-            "details": "It's equipped with modern facilities. Would you like to know about membership?"
-        },
-        "parking": {
-            "location": "Lots A, B, and C",
-            "hours": "Open 24/7",
-            "details": "Lot A is closest to the main building, while B and C are near the Athletics Building. Need a parking map?"
-        },
-        "bookstore": {
-            "location": "Building B, ground floor",
-            "hours": "9:00 AM to 5:00 PM",
-            "details": "They have all your textbook needs plus university merchandise!"
-        },
-        "administration": {
-            "location": "Building C, second floor",
-            "hours": "9:00 AM to 5:00 PM",
-            "details": "This includes Admissions, Financial Aid, and the Registrar's office. Need specific directions?"
+        # Every alternative starts with one of its literal prefixes, so a
+        # plain literal alternation (which re scans for very quickly) finds
+        # the only positions worth trying the combined matcher at
+        if indexes is not None:
+            prefixes = indexes["prefixes"]
+        else:
+            prefixes = set()
+            for pattern in alternatives:
+                pattern_prefixes = literal_prefixes(pattern)
+                if pattern_prefixes is None:
+                    prefixes = None
+                    break
+                prefixes.update(pattern_prefixes)
+        self.prefixes: Optional[Tuple[str, ...]] = None
+        self.prefilter: Optional[Pattern] = None
+        if prefixes:
+            self.prefixes = tuple(sorted(prefixes, key=lambda prefix: (-len(prefix), prefix)))
+            self.prefilter = re.compile("|".join(re.escape(prefix) for prefix in self.prefixes))
+
+        # Optional last tier for messages no rule matched; imported here so
+        # engines without it never load NumPy
+        self.fallback = None
+        if fallback_threshold is not None:
+            try:
+                from .fallback_classifier import FallbackClassifier
+            except ImportError:  # run as a script from this folder
+                from fallback_classifier import FallbackClassifier
+            self.fallback = FallbackClassifier(self.fallback_documents(), fallback_threshold)
+
+    # Pickled to reach worker processes that weren't forked from this one;
+    # the read-only facility views are sent as plain dicts and rebuilt
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["facilities"] = {keyword: dict(info) for keyword, info in self.facilities.items()}
+        return state
+
+    def __setstate__(self, state):
+        state["facilities"] = MappingProxyType({
+            keyword: MappingProxyType(info) for keyword, info in state["facilities"].items()
+        })
+        self.__dict__.update(state)
+
+    def export_indexes(self) -> Dict[str, object]:
+        """Return the prebuilt indexes in plain types, for saving in a snapshot."""
+        return {
+            "keywords": self.keyword_index.to_state(),
+            "fuzzy": self.fuzzy_index.to_state(),
+            "prefixes": self.prefixes
         }
-    }
 
-    # Check for "where is" questions and opening hours queries
-    where_pattern = r'where(?:\s+is)?(?:\s+the)?\s+(\w+)'
-    hours_pattern = r'when(?:\s+does)?(?:\s+the)?\s+(\w+)\s+(open|close|open\s+and\s+close)'
-
-    where_match = re.search(where_pattern, user_input)
-    hours_match = re.search(hours_pattern, user_input)
-
-    if where_match:
-        facility_key = where_match.group(1).lower()
-        if facility_key in facilities_info:
-            info = facilities_info[facility_key]
-            return f"The {facility_key} is located in {info['location']}. It's open from {info['hours']}. {info['details']}"
-    
-    if hours_match:
-        facility_key = hours_match.group(1).lower()
-        if facility_key in facilities_info:
-            info = facilities_info[facility_key]
-            return f"The {facility_key} is open from {info['hours']}."
-
-    # Check for keywords in facilities info
-    for keyword, info in facilities_info.items():
-        if keyword.lower() in user_input:
-            return f"The {keyword} is located in {info['location']}. It's open from {info['hours']}. {info['details']}"
-
-    # Check for greetings
-    for pattern, responses in greetings.items():
-        if re.search(pattern, user_input):
-            return random.choice(responses)
-
-    # Check for "how are you" type questions
-    for pattern, responses in how_are_you.items():
-        if re.search(pattern, user_input):
-            return random.choice(responses)
-
-    # Check for feelings
-    for pattern, responses in feelings.items():
-        if re.search(pattern, user_input):
-            return random.choice(responses)
-
-    # Check for gratitude
-    if re.search(r'\b(thanks|thank you|thx|tysm)\b', user_input):
-        return random.choice([
-            "You're welcome! Is there anything else you'd like to know?",
-            "My pleasure! Let me know if you need anything else.",
-            "Happy to help! What else can I do for you?",
-            "Anytime! Don't hesitate to ask if you need more help."
-        ])
-
-    # Default responses for unknown inputs
-    return random.choice([
-        "I'm not quite sure about that. Could you please rephrase your question?",
-        "Interesting! Could you tell me more about what you're looking for?",
-        "I want to help, but I'm not sure I understood. Could you explain a bit more?",
-        "Hmm, I'm not quite following. Could you try asking that in a different way?",
-        "I'm here to help! Could you provide more details about what you need?"
-    ])
+    def fallback_documents(self) -> List[Tuple[str, Resolution]]:
+        """Return example texts for the fallback classifier, each with the resolution it stands for.
+
+        Intents contribute the literal phrases their patterns are built
+        from, facilities their names and details.
+        """
+        documents = []
+        for category, pattern, responses in self.rules:
+            resolution = Resolution(category, None, responses)
+            for phrase, _ in collect_prefixes(sre_parse.parse(pattern.pattern)):
+                if phrase.strip():
+                    documents.append((phrase, resolution))
+        for name, keyword in self.names.items():
+            documents.append((name, Resolution("facility", keyword)))
+        for keyword, info in self.facilities.items():
+            if info.get("details"):
+                documents.append((f"{keyword} {info['details']}", Resolution("facility", keyword)))
+        return documents
+
+    def add_alternative(self, alternatives: List[str], category: str, pattern: str, responses: Tuple[str, ...]):
+        """Append a named alternative to the combined matcher, in priority order."""
+        name = f"p{len(self.targets)}"
+        alternatives.append(f"(?P<{name}>{pattern})")
+        self.priorities[name] = len(self.targets)
+        self.targets.append((category, responses))
+
+    def scan(self, text: str) -> Iterator[Match]:
+        """Yield the highest-priority match at every position where one starts."""
+        if self.prefilter is None:
+            yield from self.matcher.finditer(text)
+            return
+
+        # Only try the combined matcher where a literal prefix occurs, so a
+        # message with no trigger costs a single prefilter scan
+        trigger = self.prefilter.search(text)
+        while trigger is not None:
+            match = self.matcher.match(text, trigger.start())
+            if match is not None:
+                yield match
+            trigger = self.prefilter.search(text, trigger.start() + 1)
+
+    def find_facility(self, phrase: str) -> Optional[Tuple[str, float]]:
+        """Return the facility a question's phrase starts with and the confidence, or None.
+
+        Exact names are tried longest first, so "coffee shop hours" finds
+        "coffee shop"; failing that, the closest name within a couple of
+        typos is taken if its confidence reaches the threshold.
+        """
+        words = WORD_PATTERN.findall(phrase)
+        for length in range(len(words), 0, -1):
+            keyword = self.names.get(" ".join(words[:length]))
+            if keyword is not None:
+                return keyword, 1.0
+
+        if self.fuzzy_threshold is None:
+            return None
+        found = self.fuzzy_index.lookup(words)
+        if found is None or found[1] < self.fuzzy_threshold:
+            return None
+        return self.names[found[0]], found[1]
+
+    def describe_facility(self, keyword: str) -> str:
+        """Return the full location, hours and details answer for a facility."""
+        return "".join(self.facility_parts(keyword))
+
+    def facility_parts(self, keyword: str) -> Tuple[str, str, str]:
+        """Return a facility's answer as its location, hours and details sentences."""
+        info = self.facilities[keyword]
+        return f"The {keyword} is located in {info['location']}.", f" It's open from {info['hours']}.", f" {info['details']}"
+
+    def is_open(self, keyword: str, when: Optional[datetime] = None) -> Optional[bool]:
+        """Return whether a facility is open at when (default now), or None if its hours can't be read."""
+        schedule = self.schedules.get(keyword)
+        return None if schedule is None else schedule.is_open(when or self.clock())
+
+    def next_opening(self, keyword: str, when: Optional[datetime] = None) -> Optional[datetime]:
+        """Return when a facility next opens after when (default now), when itself if it's open then."""
+        schedule = self.schedules.get(keyword)
+        return None if schedule is None else schedule.next_opening(when or self.clock())
+
+    def open_facilities(self, when: Optional[datetime] = None) -> List[str]:
+        """Return the facilities open at when (default now)."""
+        return self.schedule_index.open_at(when or self.clock())
+
+    def describe_opening(self, keyword: str, when: str = "") -> str:
+        """Answer whether a facility is open now, at a time or on a day described in words."""
+        schedule = self.schedules.get(keyword)
+        if schedule is None:
+            return f"The {keyword} is open from {self.facilities[keyword]['hours']}."
+        now = self.clock()
+        moment = parse_when(when, now)
+
+        if moment.kind == "day":
+            day = format_day(moment.moment.date(), now.date())
+            hours = schedule.hours_on(moment.moment.date())
+            if not hours:
+                return f"No, the {keyword} is closed {day}."
+            if hours == [(0, 24 * 60)]:
+                return f"Yes, the {keyword} is open all day {day}."
+            times = " and ".join(f"{format_time(start)} to {format_time(end)}" for start, end in hours)
+            return f"Yes, the {keyword} is open {day} from {times}."
+
+        at = "right now" if moment.kind == "now" else f"at {format_moment(moment.moment, now.date())}"
+        if schedule.is_open(moment.moment):
+            closing = schedule.open_until(moment.moment)
+            if closing is None:
+                return f"Yes, the {keyword} is open {at}. It's open 24/7."
+            return f"Yes, the {keyword} is open {at}, until {format_moment(closing, now.date())}."
+        opening = schedule.next_opening(moment.moment)
+        if opening is None:
+            return f"No, the {keyword} is closed {at}."
+        return f"No, the {keyword} is closed {at}. It opens at {format_moment(opening, now.date())}."
+
+    def describe_open_list(self, when: str = "") -> str:
+        """Answer which facilities are open now, at or after a time, or on a day described in words."""
+        now = self.clock()
+        moment = parse_when(when, now)
+        if moment.kind == "day":
+            names = self.schedule_index.open_on(moment.moment.date())
+            at = format_day(moment.moment.date(), now.date())
+        elif moment.after:
+            names = self.schedule_index.open_after(moment.moment)
+            at = f"after {format_moment(moment.moment, now.date())}"
+        else:
+            names = self.schedule_index.open_at(moment.moment)
+            at = "right now" if moment.kind == "now" else f"at {format_moment(moment.moment, now.date())}"
+        if not names:
+            return f"Nothing is open {at}, I'm afraid."
+        verb = "is" if len(names) == 1 else "are"
+        return f"{at[0].upper()}{at[1:]}, {format_names(names)} {verb} open."
+
+    def resolve(self, user_input: str) -> Resolution:
+        """Work out which intent answers user input, without picking a reply yet."""
+        resolution = self.match_rules(user_input)
+        if resolution is not None:
+            return resolution
+        return self.fall_back(self.fallback.classify(user_input) if self.fallback is not None else None)
+
+    def resolve_many(self, messages: Sequence[str]) -> List[Resolution]:
+        """Resolve a batch of messages, scoring all the rule misses in one fallback pass."""
+        if self.cache is not None:
+            messages = [normalise_key(message) for message in messages]
+
+        resolutions: List[Optional[Resolution]] = []
+        misses: List[int] = []
+        for position, message in enumerate(messages):
+            resolution = self.cache.get(message) if self.cache is not None else None
+            if resolution is None:
+                resolution = self.match_rules(message)
+                if resolution is None:
+                    misses.append(position)
+                elif self.cache is not None:
+                    self.cache.put(message, resolution)
+            resolutions.append(resolution)
+
+        if misses:
+            if self.fallback is not None:
+                found = self.fallback.classify_many([messages[position] for position in misses])
+            else:
+                found = [None] * len(misses)
+            for position, match in zip(misses, found):
+                resolutions[position] = self.fall_back(match)
+                if self.cache is not None:
+                    self.cache.put(messages[position], resolutions[position])
+        return resolutions
+
+    def fall_back(self, found: Optional[Tuple[Resolution, float]]) -> Resolution:
+        """Return the fallback classifier's resolution with its score, or the default replies with no confidence."""
+        if found is not None:
+            resolution, score = found
+            return resolution._replace(confidence=score)
+        return Resolution("default", None, self.default_responses, confidence=0.0)
+
+    def match_rules(self, user_input: str, stages: Optional[Dict[str, float]] = None) -> Optional[Resolution]:
+        """Return the resolution from the patterns and facility names, or None if nothing matched.
+
+        When stages is given, the time each stage took is recorded in it.
+        """
+        if stages is not None:
+            start = time.perf_counter()
+
+        # Fold case, apostrophes and contractions once; the patterns scan
+        # the folded text and the facility names match its words
+        normalised = normalise(user_input)
+        user_input = normalised.text
+
+        # Scan the input once, keeping the first "where"/"when"/"open"
+        # question and the highest-priority intent seen anywhere
+        where_phrase = hours_phrase = open_match = open_list_when = None
+        best = len(self.targets)
+        for match in self.scan(user_input):
+            name = match.lastgroup
+            if name == "where":
+                if where_phrase is None:
+                    where_phrase = match.group("where_key")
+                    # A "where" question about a known facility settles it
+                    # without reading any further
+                    found = self.find_facility(where_phrase)
+                    if found is not None:
+                        if stages is not None:
+                            stages["scan"] = time.perf_counter() - start
+                        return Resolution("where", found[0], confidence=found[1])
+            elif name == "hours":
+                if hours_phrase is None:
+                    hours_phrase = match.group("hours_key")
+            elif name == "open":
+                if open_match is None:
+                    open_match = match
+            elif name == "open_list":
+                if open_list_when is None:
+                    open_list_when = match.group("open_list_when")
+            elif self.priorities[name] < best:
+                best = self.priorities[name]
+
+        hours_found = self.find_facility(hours_phrase) if hours_phrase is not None else None
+        open_found = self.find_facility(open_match.group("open_key")) if open_match is not None and hours_found is None else None
+        if stages is not None:
+            now = time.perf_counter()
+            stages["scan"] = now - start
+            start = now
+        if hours_found is not None:
+            return Resolution("hours", hours_found[0], confidence=hours_found[1])
+        if open_found is not None:
+            return Resolution("open", open_found[0], confidence=open_found[1], when=open_match.group("open_when").strip())
+        if open_list_when is not None:
+            return Resolution("open_list", when=open_list_when.strip())
+
+        # Check for facility names anywhere in the message
+        matched = self.keyword_index.best_match_words(normalised.tokens)
+        if stages is not None:
+            stages["keywords"] = time.perf_counter() - start
+        if matched is not None:
+            return Resolution("facility", self.names[matched])
+
+        # Check greetings, "how are you", feelings and gratitude in order
+        if best < len(self.targets):
+            category, responses = self.targets[best]
+            return Resolution(category, None, responses)
+        return None
+
+    def render(self, resolution: Resolution, rng: Optional[random.Random] = None) -> str:
+        """Turn a resolution into reply text, picking a variant where there are several."""
+        if resolution.intent in ("where", "facility"):
+            return self.describe_facility(resolution.facility)
+        if resolution.intent == "hours":
+            return f"The {resolution.facility} is open from {self.facilities[resolution.facility]['hours']}."
+        if resolution.intent == "follow_up":
+            info = self.facilities[resolution.facility]
+            return info.get("follow_up") or f"The {resolution.facility} is in {info['location']}."
+        if resolution.intent == "open":
+            return self.describe_opening(resolution.facility, resolution.when)
+        if resolution.intent == "open_list":
+            return self.describe_open_list(resolution.when)
+        if rng is None:
+            rng = self.rng
+        return (random if rng is None else rng).choice(resolution.responses)
+
+    def respond(self, user_input: str, rng: Optional[random.Random] = None) -> str:
+        """Generate an appropriate response based on user input.
+
+        Variants are picked with rng when given, then the engine's own RNG
+        if it was seeded, else the global random module.
+        """
+        return self.answer(user_input, rng)[1]
+
+    def answer(self, user_input: str, rng: Optional[random.Random] = None) -> Tuple[Resolution, str]:
+        """Same as respond(), also returning the resolution the reply was rendered from."""
+        if self.instrumentation is not None:
+            return self.answer_traced(user_input, rng)
+        resolution = self.lookup(user_input)
+        return resolution, self.render(resolution, rng)
+
+    def lookup(self, user_input: str) -> Resolution:
+        """Resolve user input, through the cache when the engine has one."""
+        if self.instrumentation is not None:
+            started = time.perf_counter()
+            resolution, stages, cache_hit, fallback = self.lookup_traced(user_input)
+            self.instrumentation.record(MessageTrace(
+                resolution.intent, resolution.facility, resolution.confidence, cache_hit, fallback, stages,
+                time.perf_counter() - started
+            ))
+            return resolution
+        if self.cache is None:
+            return self.resolve(user_input)
+
+        # Cache the resolved intent rather than the reply, so repeated
+        # questions still get varied answers
+        key = normalise_key(user_input)
+        resolution = self.cache.get(key)
+        if resolution is None:
+            resolution = self.resolve(key)
+            self.cache.put(key, resolution)
+        return resolution
+
+    def quick_lookup(self, user_input: str) -> Resolution:
+        """Resolve user input without the full matcher, for when there's no time to run it.
+
+        The cached resolution is used if there is one; failing that, a
+        facility named anywhere in the message answers it, and otherwise
+        the default replies do.
+        """
+        if self.cache is not None:
+            resolution = self.cache.get(normalise_key(user_input))
+            if resolution is not None:
+                return resolution
+        matched = self.keyword_index.best_match_words(normalise(user_input).tokens)
+        if matched is not None:
+            return Resolution("facility", self.names[matched])
+        return self.fall_back(None)
+
+    def respond_quickly(self, user_input: str, rng: Optional[random.Random] = None) -> str:
+        """Generate a reply from quick_lookup(); a conversation's state is left as it was."""
+        return self.render(self.quick_lookup(user_input), rng)
+
+    def lookup_traced(self, user_input: str) -> Tuple[Resolution, Dict[str, float], Optional[bool], bool]:
+        """Same as lookup() without the recording, returning the stage timings, whether the cache had it and whether the fallback ran."""
+        clock = time.perf_counter
+        started = clock()
+        stages: Dict[str, float] = {}
+        resolution = None
+        cache_hit = None
+        text = user_input
+        if self.cache is not None:
+            text = normalise_key(user_input)
+            resolution = self.cache.get(text)
+            cache_hit = resolution is not None
+            stages["cache"] = clock() - started
+
+        fallback = False
+        if resolution is None:
+            resolution = self.match_rules(text, stages)
+            if resolution is None:
+                if self.fallback is not None:
+                    fallback = True
+                    start = clock()
+                    resolution = self.fall_back(self.fallback.classify(text))
+                    stages["fallback"] = clock() - start
+                else:
+                    resolution = self.fall_back(None)
+            if self.cache is not None:
+                self.cache.put(text, resolution)
+        return resolution, stages, cache_hit, fallback
+
+    def answer_traced(self, user_input: str, rng: Optional[random.Random] = None) -> Tuple[Resolution, str]:
+        """Same as answer(), timing each stage and recording the outcome with the instrumentation."""
+        clock = time.perf_counter
+        started = clock()
+        resolution, stages, cache_hit, fallback = self.lookup_traced(user_input)
+        start = clock()
+        reply = self.render(resolution, rng)
+        finished = clock()
+        stages["render"] = finished - start
+        self.instrumentation.record(MessageTrace(
+            resolution.intent, resolution.facility, resolution.confidence, cache_hit, fallback, stages, finished - started
+        ))
+        return resolution, reply
+
+    def resolve_in_context(self, user_input: str, state: SessionState) -> Resolution:
+        """Resolve user input in the light of a conversation's state, updating the state to match.
+
+        A yes or no straight after a facility answer that ended in an offer
+        takes it up or turns it down, and a message nothing matched that
+        says "it", "there" or "that" is read as being about the facility
+        last talked about. Only the message as sent is cached, and an
+        instrumented engine records one trace for it, follow-ups included.
+        """
+        traced = self.instrumentation is not None
+        if traced:
+            started = time.perf_counter()
+            stages: Dict[str, float] = {}
+            cache_hit = None
+            fallback = False
+
+        # A reload may have dropped the facility the conversation was about
+        if state.offer is not None and state.offer not in self.facilities:
+            state.offer = None
+        if state.facility is not None and state.facility not in self.facilities:
+            state.facility = None
+
+        resolution = None
+        if state.offer is not None:
+            accepted = FOLLOW_UP_REPLIES.get(normalise_key(user_input))
+            if accepted is not None:
+                resolution = Resolution("follow_up", state.offer) if accepted else Resolution("decline", None, DECLINE_RESPONSES)
+        if resolution is None:
+            if traced:
+                resolution, stages, cache_hit, fallback = self.lookup_traced(user_input)
+            else:
+                resolution = self.lookup(user_input)
+            if resolution.intent == "default" and state.facility is not None:
+                text = user_input.lower()
+                referred = REFERENCE_PATTERN.sub(lambda match: state.facility, text, count=1)
+                if referred != text:
+                    # The rewrite only makes sense in this conversation, so
+                    # it's resolved afresh rather than through the cache
+                    if traced:
+                        start = time.perf_counter()
+                    referred_resolution = self.resolve(referred)
+                    if traced:
+                        stages["context"] = time.perf_counter() - start
+                    if referred_resolution.intent != "default":
+                        resolution = referred_resolution
+
+        state.intent = resolution.intent
+        if resolution.facility is not None:
+            state.facility = resolution.facility
+        state.offer = resolution.facility if resolution.intent in ("where", "facility") and resolution.facility in self.offers else None
+        state.turns += 1
+
+        if traced:
+            self.instrumentation.record(MessageTrace(
+                resolution.intent, resolution.facility, resolution.confidence, cache_hit, fallback, stages,
+                time.perf_counter() - started
+            ))
+        return resolution
+
+    def respond_in_context(self, user_input: str, state: SessionState, rng: Optional[random.Random] = None) -> str:
+        """Generate a response as respond() does, reading and updating a conversation's state."""
+        return self.render(self.resolve_in_context(user_input, state), rng)
+
+    def render_parts(self, resolution: Resolution, rng: Optional[random.Random] = None) -> Iterator[str]:
+        """Yield the reply for a resolution a part at a time; the parts join up to render()'s text."""
+        if resolution.intent in ("where", "facility"):
+            yield from self.facility_parts(resolution.facility)
+        else:
+            yield self.render(resolution, rng)
+
+    def respond_stream(
+        self,
+        user_input: str,
+        rng: Optional[random.Random] = None,
+        state: Optional[SessionState] = None
+    ) -> Iterator[str]:
+        """Yield the reply respond() would give, each part as soon as it's ready.
+
+        Nothing runs until the first part is asked for. Given a
+        conversation's state, follow-ups are understood as by
+        respond_in_context().
+        """
+        resolution = self.lookup(user_input) if state is None else self.resolve_in_context(user_input, state)
+        yield from self.render_parts(resolution, rng)
+
+    def respond_many(self, messages: Sequence[str], rng: Optional[random.Random] = None) -> List[str]:
+        """Generate responses for a batch of messages, picking variants as respond() would.
+
+        An instrumented engine answers them one at a time so each is traced.
+        """
+        if self.instrumentation is not None:
+            return [self.answer_traced(message, rng)[1] for message in messages]
+        return [self.render(resolution, rng) for resolution in self.resolve_many(messages)]
+
+
+# Shared engine used by the module-level helpers, built on first use so
+# importing this module stays cheap
+shared_engine: Optional[IntentEngine] = None
+
+def get_default_engine() -> IntentEngine:
+    """Return the shared engine, building it the first time it's needed."""
+    global shared_engine
+    if shared_engine is None:
+        shared_engine = IntentEngine()
+    return shared_engine
+
+def get_random_agent_name(rng: Optional[random.Random] = None) -> str:
+    """Return a random agent name from a predefined list."""
+    return (random if rng is None else rng).choice(AGENT_NAMES)
+
+def is_exit_message(user_input: str, commands: Iterable[str] = EXIT_COMMANDS) -> bool:
+    """Return whether a message asks to end the conversation.
+
+    It must be one of commands as a whole, words and not substrings, or
+    a farewell on its own or after punctuation; so "close" and "thanks,
+    bye" end it but "when does the gym close" and "how do i say goodbye"
+    don't.
+    """
+    normalised = normalise(user_input)
+    words = normalised.tokens
+    if not words:
+        return False
+    if " ".join(words) in commands:
+        return True
+    clauses = [clause for clause in CLAUSE_PATTERN.split(normalised.text) if clause.strip()]
+    return " ".join(WORD_PATTERN.findall(clauses[-1])) in FAREWELLS
+
+def generate_response(user_input: str) -> str:
+    """Generate an appropriate response based on user input."""
+    return get_default_engine().respond(user_input)
+
+class ChatSession:
+    """One conversation, with its own RNG so replies don't share global state.
+
+    Sessions created with the same seed pick the same agent name and reply
+    variants for the same messages, which keeps replays reproducible. The
+    conversation's state lets follow-ups like "yes" or "when does it
+    open?" be answered.
+    """
+
+    def __init__(
+        self,
+        user_name: Optional[str] = None,
+        agent_name: Optional[str] = None,
+        seed: Optional[int] = None,
+        engine: Optional[IntentEngine] = None
+    ):
+        self.rng = random.Random(seed)
+        self.engine = engine if engine is not None else get_default_engine()
+        self.user_name = user_name or DEFAULT_USER_NAME
+        self.agent_name = agent_name or get_random_agent_name(self.rng)
+        self.state = SessionState(self.user_name, self.agent_name)
+
+    def respond(self, user_input: str) -> str:
+        """Generate a response using this session's RNG and what's been said so far."""
+        return self.engine.respond_in_context(user_input, self.state, self.rng)
+
+    def respond_stream(self, user_input: str) -> Iterator[str]:
+        """Yield the response a part at a time, as respond() would give it."""
+        return self.engine.respond_stream(user_input, self.rng, self.state)
+
+# Engine a batch worker process answers with, handed over as the pool starts it
+worker_engine: Optional[IntentEngine] = None
+
+def set_worker_engine(engine: Optional[IntentEngine]):
+    """Pool initializer setting the engine this worker process answers with."""
+    global worker_engine
+    worker_engine = engine
+
+def get_worker_engine() -> IntentEngine:
+    """Return the engine set for this worker process, or the shared one."""
+    return worker_engine if worker_engine is not None else get_default_engine()
+
+def respond_chunk(job: Tuple[Optional[int], int, List[str]], engine: Optional[IntentEngine] = None) -> List[str]:
+    """Answer one chunk of a batch with an RNG derived from the seed and chunk number."""
+    seed, number, messages = job
+    rng = random.Random(f"{seed}:{number}") if seed is not None else random.Random()
+    return (engine or get_worker_engine()).respond_many(messages, rng)
+
+def generate_responses(
+    messages: Iterable[str],
+    seed: Optional[int] = None,
+    processes: Optional[int] = None,
+    chunksize: int = BATCH_CHUNK_SIZE,
+    engine: Optional[IntentEngine] = None
+) -> Iterator[str]:
+    """Yield a response for each message, in order.
+
+    Messages are answered in chunks of chunksize, each with its own RNG
+    seeded from seed and the chunk number, so the same seed and chunksize
+    give the same replies whether or not the batch is sharded. With
+    processes set, chunks are spread over a pool of worker processes;
+    only a few chunks per worker are in flight, so messages can come from
+    an unbounded generator. engine defaults to the shared one.
+    """
+    iterator = iter(messages)
+    jobs = (
+        (seed, number, chunk)
+        for number, chunk in enumerate(iter(lambda: list(islice(iterator, chunksize)), []))
+    )
+
+    if not processes or processes == 1:
+        for job in jobs:
+            yield from respond_chunk(job, engine)
+        return
+
+    # Imported here as it's only needed for sharded batches and is slow to load
+    import multiprocessing
+
+    # Build the engine before the pool forks so workers inherit it. A given
+    # engine is handed to each worker, pickled where the start method
+    # doesn't fork; without one, a worker that wasn't forked builds the
+    # shared engine itself
+    if engine is None:
+        get_default_engine()
+    with multiprocessing.Pool(processes, set_worker_engine, (engine,)) as pool:
+        pending: Deque = deque()
+        for job in jobs:
+            pending.append(pool.apply_async(respond_chunk, (job,)))
+            if len(pending) >= 2 * processes:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
 
 # Example usage:
-user_input = "Where is the library?"
-print(generate_response(user_input))
+if __name__ == "__main__":
+    user_input = "Where is the library?"
+    print(generate_response(user_input))
 
-user_input = "When does the coffee shop open?"
-print(generate_response(user_input))
\ No newline at end of file
+    user_input = "When does the coffee shop open?"
+    print(generate_response(user_input))
@@ -0,0 +1,170 @@
+import re
+from typing import Dict, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+try:
+    import numpy
+    from scipy import sparse
+except ImportError:  # the fallback tier is optional
+    numpy = sparse = None
+
+try:
+    from .fuzzy_index import CHARACTERS_PER_EDIT, MAX_EDIT_DISTANCE, edit_distance
+except ImportError:  # run as a script from this folder
+    from fuzzy_index import CHARACTERS_PER_EDIT, MAX_EDIT_DISTANCE, edit_distance
+
+# Words are runs of letters, digits, underscores and apostrophes
+TOKEN_PATTERN = re.compile(r"[\w']+")
+
+# Character n-gram sizes; taken within padded words, so "libary" still
+# shares most of its n-grams with "library"
+NGRAM_SIZES = (3, 4)
+
+# Lowest cosine similarity at which the best document is trusted
+FALLBACK_THRESHOLD = 0.35
+
+# Documents of up to this many words are phrases a message must contain
+# every word of, typos aside, to match; a short text scores highly on the
+# words it shares with a message ("who are you" with "how are you") even
+# when the one it lacks changes the meaning. Longer documents, such as
+# descriptions, only need to score
+PHRASE_WORDS = 4
+
+# Messages scored per matrix product, bounding the dense score block
+SCORE_BLOCK_SIZE = 256
+
+Label = TypeVar("Label")
+
+
+def char_ngrams(text: str) -> List[str]:
+    """Return the character n-grams of every word in text, each word padded with spaces."""
+    ngrams = []
+    for word in TOKEN_PATTERN.findall(text.lower()):
+        padded = f" {word} "
+        for size in NGRAM_SIZES:
+            ngrams.extend(padded[i:i + size] for i in range(len(padded) - size + 1))
+    return ngrams
+
+
+class FallbackClassifier(Generic[Label]):
+    """TF-IDF character n-gram classifier for messages no rule matched.
+
+    Each document is a short text with a label, such as an intent's
+    example phrase or a facility's description. Documents become rows of a
+    sparse L2-normalised TF-IDF matrix, so scoring a message, or a whole
+    batch of messages, against all of them is one sparse matrix product.
+    The label of the closest document is returned along with its
+    cosine similarity, provided that reaches the threshold and, for a
+    short phrase, that the message has each of its words.
+    """
+
+    def __init__(self, documents: Sequence[Tuple[str, Label]], threshold: float = FALLBACK_THRESHOLD):
+        if numpy is None:
+            raise ImportError("NumPy and SciPy are needed for the fallback classifier: pip install numpy scipy")
+        self.threshold = threshold
+        self.labels: List[Label] = [label for _, label in documents]
+        self.vocabulary: Dict[str, int] = {}
+        # The words each phrase document needs a message to have; none for longer ones
+        self.phrase_words: List[Tuple[str, ...]] = []
+        for text, _ in documents:
+            words = tuple(TOKEN_PATTERN.findall(text.lower()))
+            self.phrase_words.append(words if len(words) <= PHRASE_WORDS else ())
+
+        # Count n-grams per document, growing the vocabulary as we go
+        rows: List[int] = []
+        columns: List[int] = []
+        for row, (text, _) in enumerate(documents):
+            for ngram in char_ngrams(text):
+                rows.append(row)
+                columns.append(self.vocabulary.setdefault(ngram, len(self.vocabulary)))
+        shape = (len(documents), len(self.vocabulary))
+        counts = sparse.csr_matrix((numpy.ones(len(rows)), (rows, columns)), shape=shape)
+        counts.sum_duplicates()
+
+        # Smoothed inverse document frequency, as scikit-learn computes it
+        frequencies = numpy.bincount(counts.indices, minlength=shape[1])
+        self.idf = numpy.log((1 + shape[0]) / (1 + frequencies)) + 1
+
+        # Transposed so a batch of query rows multiplies straight onto it
+        self.matrix = self.weigh(counts).T.tocsr()
+
+    def weigh(self, counts):
+        """Turn a sparse count matrix into L2-normalised TF-IDF rows."""
+        weights = counts.copy()
+        # Dampen repeated n-grams so long texts don't drown out short ones
+        weights.data = numpy.log1p(weights.data) * self.idf[weights.indices]
+        norms = numpy.sqrt(numpy.asarray(weights.multiply(weights).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        return sparse.diags(1 / norms) @ weights
+
+    def vectorise(self, texts: Sequence[str]):
+        """Return the TF-IDF rows for texts; n-grams no document has are ignored."""
+        rows: List[int] = []
+        columns: List[int] = []
+        for row, text in enumerate(texts):
+            for ngram in char_ngrams(text):
+                column = self.vocabulary.get(ngram)
+                if column is not None:
+                    rows.append(row)
+                    columns.append(column)
+        counts = sparse.csr_matrix(
+            (numpy.ones(len(rows)), (rows, columns)),
+            shape=(len(texts), len(self.vocabulary))
+        )
+        counts.sum_duplicates()
+        return self.weigh(counts)
+
+    def classify(self, text: str) -> Optional[Tuple[Label, float]]:
+        """Return the best label for text and its score, or None below the threshold."""
+        counts: Dict[int, int] = {}
+        for ngram in char_ngrams(text):
+            column = self.vocabulary.get(ngram)
+            if column is not None:
+                counts[column] = counts.get(column, 0) + 1
+        if not counts:
+            return None
+        columns = numpy.fromiter(counts, dtype=numpy.int64, count=len(counts))
+        weights = numpy.log1p(numpy.fromiter(counts.values(), dtype=float, count=len(counts))) * self.idf[columns]
+        weights /= numpy.sqrt(weights @ weights)
+
+        # Building sparse matrices costs more than the product for a single
+        # message, so gather each n-gram's documents from the CSR arrays and
+        # sum their weights directly
+        starts = self.matrix.indptr[columns]
+        lengths = self.matrix.indptr[columns + 1] - starts
+        positions = numpy.repeat(starts - numpy.cumsum(lengths) + lengths, lengths) + numpy.arange(lengths.sum())
+        scores = numpy.bincount(
+            self.matrix.indices[positions],
+            weights=self.matrix.data[positions] * numpy.repeat(weights, lengths),
+            minlength=len(self.labels)
+        )
+        return self.best(scores, TOKEN_PATTERN.findall(text.lower()))
+
+    def classify_many(self, texts: Sequence[str]) -> List[Optional[Tuple[Label, float]]]:
+        """Classify a batch of texts, one sparse matrix product per block of them."""
+        if not self.labels:
+            return [None] * len(texts)
+        results: List[Optional[Tuple[Label, float]]] = []
+        for start in range(0, len(texts), SCORE_BLOCK_SIZE):
+            block = texts[start:start + SCORE_BLOCK_SIZE]
+            scores = (self.vectorise(block) @ self.matrix).toarray()
+            for row, text in enumerate(block):
+                results.append(self.best(scores[row], TOKEN_PATTERN.findall(text.lower())))
+        return results
+
+    def best(self, scores, words: Sequence[str]) -> Optional[Tuple[Label, float]]:
+        """Return the label and score of the best document reaching the threshold that words match, or None."""
+        above = numpy.flatnonzero(scores >= self.threshold)
+        # Highest score first, ties going to the earlier document
+        for document in above[numpy.argsort(-scores[above], kind="stable")]:
+            if self.has_words(words, self.phrase_words[document]):
+                return self.labels[document], float(scores[document])
+        return None
+
+    @staticmethod
+    def has_words(words: Sequence[str], required: Sequence[str]) -> bool:
+        """Whether words include each required word, allowing as many typos as the fuzzy facility names do."""
+        for needed in required:
+            limit = min(MAX_EDIT_DISTANCE, len(needed) // CHARACTERS_PER_EDIT)
+            if not any(edit_distance(word, needed, limit) <= limit for word in words):
+                return False
+        return True
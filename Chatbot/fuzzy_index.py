@@ -0,0 +1,168 @@
+import sys
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+# Most typos are one or two edits away from the intended word
+MAX_EDIT_DISTANCE = 2
+# Words allowed one edit per this many characters, so short words like
+# "my" or "art" must be spelt exactly
+CHARACTERS_PER_EDIT = 3
+# Longest name, in words, a query is matched against
+MAX_NAME_WORDS = 4
+
+
+def edit_distance(source: str, target: str, limit: int) -> int:
+    """Return the edit distance between two strings, counting a swap of neighbours as one edit.
+
+    Gives up early and returns limit + 1 once the distance must exceed limit.
+    """
+    if abs(len(source) - len(target)) > limit:
+        return limit + 1
+    before_previous: List[int] = []
+    previous = list(range(len(target) + 1))
+    for i in range(1, len(source) + 1):
+        current = [i] + [0] * len(target)
+        char = source[i - 1]
+        row_minimum = i
+        for j in range(1, len(target) + 1):
+            other = target[j - 1]
+            distance = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char != other)
+            )
+            # Transposed neighbours, "libaray" for "library"
+            if i > 1 and j > 1 and char == target[j - 2] and source[i - 2] == other:
+                distance = min(distance, before_previous[j - 2] + 1)
+            current[j] = distance
+            if distance < row_minimum:
+                row_minimum = distance
+        if row_minimum > limit:
+            return limit + 1
+        before_previous, previous = previous, current
+    return previous[-1] if previous[-1] <= limit else limit + 1
+
+def name_starts(name: str) -> List[str]:
+    """Return every leading run of words in a name, "student", "student center", ..."""
+    words = name.split()
+    return [" ".join(words[:length]) for length in range(1, len(words) + 1)]
+
+def deletions(term: str, distance: int) -> Set[str]:
+    """Return term plus every string made by deleting up to distance characters from it."""
+    results = {term}
+    frontier = {term}
+    for _ in range(distance):
+        frontier = {word[:i] + word[i + 1:] for word in frontier for i in range(len(word))}
+        results |= frontier
+    return results
+
+
+class FuzzyIndex:
+    """Symmetric-deletion index for finding names within a few typos of a query.
+
+    Names are split into words, and every distinct word is stored under
+    each string that deleting up to max_distance characters turns it into.
+    A query word generates the same deletions of itself, so its candidate
+    spellings come from a few dict lookups however many names there are.
+    Spellings are then chained word by word, keeping only runs that begin
+    some name, which keeps a lookup bounded by the query's length.
+    """
+
+    def __init__(self, names: Iterable[str], max_distance: int = MAX_EDIT_DISTANCE):
+        self.max_distance = max_distance
+        self.names: Dict[str, int] = {}
+        self.words: List[str] = []
+        self.word_ids: Dict[str, int] = {}
+        self.deletes: Dict[str, List[int]] = {}
+        self.starts: Set[str] = set()
+        for name in names:
+            self.names.setdefault(name, len(self.names))
+            self.starts.update(name_starts(name))
+            for word in name.split():
+                if word in self.word_ids:
+                    continue
+                self.word_ids[word] = len(self.words)
+                self.words.append(sys.intern(word))
+                for variant in deletions(word, max_distance):
+                    self.deletes.setdefault(sys.intern(variant), []).append(self.word_ids[word])
+
+    def to_state(self) -> Tuple:
+        """Return the index as plain lists and dicts, e.g. for marshal."""
+        return (list(self.names), self.words, self.deletes, self.max_distance)
+
+    @classmethod
+    def from_state(cls, state: Tuple) -> "FuzzyIndex":
+        """Rebuild an index from to_state() output without regenerating the deletions."""
+        index = cls.__new__(cls)
+        names, words, deletes, index.max_distance = state
+        index.names = {name: position for position, name in enumerate(names)}
+        index.words = list(words)
+        index.word_ids = {word: position for position, word in enumerate(index.words)}
+        index.deletes = dict(deletes)
+        index.starts = {start for name in index.names for start in name_starts(name)}
+        return index
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def candidates(self, word: str) -> Tuple[Set[int], int]:
+        """Return ids of the indexed words that may be within a few edits of word, and the edit limit.
+
+        A correctly spelt word is among them, but so are close spellings,
+        since "centre" may be how someone writes "center".
+        """
+        limit = min(self.max_distance, len(word) // CHARACTERS_PER_EDIT)
+        found: Set[int] = set()
+        for variant in deletions(word, limit):
+            # A word needing more deletions than the limit to reach this
+            # variant is too far away to bother checking
+            longest = len(variant) + limit
+            found.update(
+                word_id for word_id in self.deletes.get(variant, ())
+                if len(self.words[word_id]) <= longest
+            )
+        return found, limit
+
+    def lookup(self, words: Sequence[str]) -> Optional[Tuple[str, float]]:
+        """Return the name closest to the leading words of a query, with a confidence between 0 and 1.
+
+        Every leading run of up to MAX_NAME_WORDS words is tried. Confidence
+        is one minus the edit distance over the longer string's length; ties
+        go to the longer run, then to whichever name was indexed first.
+        """
+        best = None
+        best_key = None
+        # Runs of corrected words that begin some name, with their total distance
+        partial = [("", 0)]
+        query_length = -1
+        for length, word in enumerate(words[:MAX_NAME_WORDS], 1):
+            query_length += len(word) + 1
+            candidates, limit = self.candidates(word)
+            extended = []
+            for word_id in candidates:
+                candidate = self.words[word_id]
+                # Only pay for an edit distance when the spelling continues a name
+                runs = []
+                for start, total in partial:
+                    run = f"{start} {candidate}" if start else candidate
+                    if run in self.starts:
+                        runs.append((run, total))
+                if not runs:
+                    continue
+                distance = edit_distance(word, candidate, limit)
+                if distance > limit:
+                    continue
+
+                for run, total in runs:
+                    total += distance
+                    extended.append((run, total))
+                    position = self.names.get(run)
+                    if position is None:
+                        continue
+                    confidence = 1.0 - total / max(query_length, len(run))
+                    key = (-confidence, -length, position)
+                    if best_key is None or key < best_key:
+                        best, best_key = (run, confidence), key
+            if not extended:
+                break
+            partial = extended
+        return best
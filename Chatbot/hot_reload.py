@@ -0,0 +1,154 @@
+import logging
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+try:
+    from .chatbot_logic import IntentEngine
+    from .knowledge_base import load_engine
+except ImportError:  # run as a script from this folder
+    from chatbot_logic import IntentEngine
+    from knowledge_base import load_engine
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks of the rule files
+DEFAULT_RELOAD_INTERVAL = 2.0
+
+
+class ReloadingEngine:
+    """Engine wrapper that swaps in a rebuilt engine whenever its rule files change.
+
+    The new engine is built on a background thread while the old one keeps
+    answering, then published with a single attribute assignment. A call
+    reads self.engine once, so requests already running finish on the
+    version they started with. A source that fails to load leaves the old
+    engine in place until the files change again.
+    """
+
+    def __init__(
+        self,
+        sources: Sequence[str],
+        snapshot: Optional[str] = None,
+        include_builtin: bool = True,
+        interval: float = DEFAULT_RELOAD_INTERVAL,
+        **engine_options
+    ):
+        self.sources = list(sources)
+        self.snapshot = snapshot
+        self.include_builtin = include_builtin
+        self.interval = interval
+        self.engine_options = engine_options
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+        # Metrics about reloads
+        self.version = 0
+        self.reloads = 0
+        self.failures = 0
+        self.last_duration = 0.0
+        self.last_reload_at = 0.0
+        self.last_error: Optional[str] = None
+
+        self.signature = self.source_signature()
+        self.failed_signature: Optional[Tuple] = None
+        self.engine: IntentEngine = self.build()
+
+    def source_signature(self) -> Tuple:
+        """Return the modification time and size of every rule file."""
+        signature = []
+        for path in self.sources:
+            try:
+                stat = os.stat(path)
+                signature.append((path, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append((path, None, None))
+        return tuple(signature)
+
+    def build(self) -> IntentEngine:
+        """Build a fresh engine from the sources and record how long it took."""
+        start = time.perf_counter()
+        engine = load_engine(self.sources, self.snapshot, self.include_builtin, **self.engine_options)
+        self.last_duration = time.perf_counter() - start
+        self.last_reload_at = time.time()
+        self.version += 1
+        return engine
+
+    def reload(self) -> bool:
+        """Rebuild the engine now and swap it in; return False if the sources failed to load."""
+        with self.lock:
+            signature = self.source_signature()
+            try:
+                engine = self.build()
+            except Exception as error:
+                self.failures += 1
+                self.last_error = str(error)
+                self.failed_signature = signature
+                logger.warning("Keeping knowledge base version %d, reload failed: %s", self.version, error)
+                return False
+            # Publish the new engine; readers see either the old or the new one
+            self.engine = engine
+            self.signature = signature
+            self.reloads += 1
+            self.last_error = None
+            logger.info("Loaded knowledge base version %d in %.1fms", self.version, self.last_duration * 1000)
+            return True
+
+    def check(self) -> bool:
+        """Reload if any rule file changed since the last load attempt."""
+        signature = self.source_signature()
+        if signature == self.signature or signature == self.failed_signature:
+            return False
+        return self.reload()
+
+    def start(self):
+        """Start watching the rule files on a daemon thread."""
+        if self.thread is not None:
+            return
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.watch, name="knowledge-base-reloader", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the watcher thread."""
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def watch(self):
+        while not self.stopped.wait(self.interval):
+            self.check()
+
+    def metrics(self) -> Dict[str, object]:
+        """Return the knowledge base version and reload statistics."""
+        return {
+            "version": self.version,
+            "reloads": self.reloads,
+            "reload_failures": self.failures,
+            "last_reload_seconds": self.last_duration,
+            "last_reload_at": self.last_reload_at,
+            "last_error": self.last_error
+        }
+
+    # The engine interface, each call served by whichever version is current
+    def resolve(self, user_input: str):
+        return self.engine.resolve(user_input)
+
+    def render(self, resolution, rng: Optional[random.Random] = None) -> str:
+        return self.engine.render(resolution, rng)
+
+    def respond(self, user_input: str, rng: Optional[random.Random] = None) -> str:
+        return self.engine.respond(user_input, rng)
+
+    def respond_in_context(self, user_input: str, state, rng: Optional[random.Random] = None) -> str:
+        return self.engine.respond_in_context(user_input, state, rng)
+
+    def respond_stream(self, user_input: str, rng: Optional[random.Random] = None, state=None):
+        return self.engine.respond_stream(user_input, rng, state)
+
+    def respond_quickly(self, user_input: str, rng: Optional[random.Random] = None) -> str:
+        return self.engine.respond_quickly(user_input, rng)
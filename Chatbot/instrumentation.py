@@ -0,0 +1,187 @@
+from bisect import bisect_left
+import logging
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in seconds, from a microsecond to a tenth of a second
+DEFAULT_BUCKETS = (
+    0.000001, 0.0000025, 0.000005, 0.00001, 0.000025, 0.00005,
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01, 0.1
+)
+
+# Stages of answering a message, in the order they run
+STAGES = ("cache", "scan", "keywords", "fallback", "context", "render")
+
+
+class MessageTrace(NamedTuple):
+    """What happened while answering one message.
+
+    stages maps each stage that ran to its duration in seconds: "scan"
+    covers the pattern scan and the facility names in "where"/"when"
+    questions, "keywords" the search for facility names anywhere in the
+    message, "context" the second look at a message read as being about
+    the facility last talked about. cache_hit is None when the engine has
+    no cache.
+    """
+    intent: str
+    facility: Optional[str]
+    confidence: float
+    cache_hit: Optional[bool]
+    fallback: bool
+    stages: Dict[str, float]
+    total: float
+
+
+class Histogram:
+    """Counts of observations per bucket, plus their sum, as Prometheus histograms keep them."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        # One count per bucket, the last for values above every bound
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[int]:
+        """Return the count at or below each bound, ending with the overall count."""
+        totals = []
+        running = 0
+        for count in self.counts:
+            running += count
+            totals.append(running)
+        return totals
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class Instrumentation:
+    """Counters and latency histograms for an engine, plus callbacks for every answered message.
+
+    Pass one to IntentEngine(instrumentation=...). Engines without one skip
+    the timing entirely, so leaving it off costs a single attribute check
+    per message. Safe to share between threads and between engines, e.g.
+    across hot reloads.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.listeners: List[Callable[[MessageTrace], None]] = []
+        self.messages = 0
+        self.intents: Dict[str, int] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.fallback_attempts = 0
+        self.fallback_hits = 0
+        self.stages: Dict[str, Histogram] = {}
+        self.response_time = Histogram(self.buckets)
+
+
+    # The lock can't be pickled, so a copy sent to another process gets its own
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def add_listener(self, callback: Callable[[MessageTrace], None]):
+        """Call callback with a MessageTrace for every message answered from now on."""
+        self.listeners = self.listeners + [callback]
+
+    def remove_listener(self, callback: Callable[[MessageTrace], None]):
+        self.listeners = [listener for listener in self.listeners if listener is not callback]
+
+    def record(self, trace: MessageTrace):
+        """Add one answered message to the metrics and pass it to the listeners."""
+        with self.lock:
+            self.messages += 1
+            self.intents[trace.intent] = self.intents.get(trace.intent, 0) + 1
+            if trace.cache_hit is not None:
+                if trace.cache_hit:
+                    self.cache_hits += 1
+                else:
+                    self.cache_misses += 1
+            if trace.fallback:
+                self.fallback_attempts += 1
+                if trace.intent != "default":
+                    self.fallback_hits += 1
+            for stage, seconds in trace.stages.items():
+                histogram = self.stages.get(stage)
+                if histogram is None:
+                    histogram = self.stages[stage] = Histogram(self.buckets)
+                histogram.observe(seconds)
+            self.response_time.observe(trace.total)
+
+        # Listeners run outside the lock so a slow one can't stall other threads
+        for listener in self.listeners:
+            try:
+                listener(trace)
+            except Exception:
+                logger.exception("Instrumentation listener failed")
+
+    def snapshot(self) -> Dict[str, object]:
+        """Return the current metrics as plain Python values."""
+        with self.lock:
+            return {
+                "messages": self.messages,
+                "intents": dict(self.intents),
+                "cache_hits": self.cache_hits,
+                "cache_misses": self.cache_misses,
+                "fallback_attempts": self.fallback_attempts,
+                "fallback_hits": self.fallback_hits,
+                "fallback_rate": self.fallback_attempts / self.messages if self.messages else 0.0,
+                "stages": {
+                    stage: {"count": histogram.count, "seconds": histogram.sum}
+                    for stage, histogram in self.stages.items()
+                },
+                "response_seconds": {"count": self.response_time.count, "seconds": self.response_time.sum}
+            }
+
+    def prometheus_text(self, prefix: str = "chatbot") -> str:
+        """Return the metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+
+        def counter(name: str, help_text: str, samples: Dict[str, int]):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for labels, value in samples.items():
+                lines.append(f"{prefix}_{name}{labels} {value}")
+
+        def histogram(name: str, help_text: str, series: Dict[str, Histogram]):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} histogram")
+            for label, values in series.items():
+                label_prefix = f"{label}," if label else ""
+                bounds = [repr(bound) for bound in values.buckets] + ["+Inf"]
+                for bound, total in zip(bounds, values.cumulative()):
+                    lines.append(f"{prefix}_{name}_bucket{{{label_prefix}le=\"{bound}\"}} {total}")
+                braces = f"{{{label}}}" if label else ""
+                lines.append(f"{prefix}_{name}_sum{braces} {values.sum!r}")
+                lines.append(f"{prefix}_{name}_count{braces} {values.count}")
+
+        with self.lock:
+            counter("messages_total", "Messages answered.", {"": self.messages})
+            counter("intent_total", "Messages answered, by the intent that answered them.", {
+                f"{{intent=\"{escape_label(intent)}\"}}": count for intent, count in sorted(self.intents.items())
+            })
+            counter("cache_hits_total", "Messages answered from the resolution cache.", {"": self.cache_hits})
+            counter("cache_misses_total", "Messages the resolution cache didn't have.", {"": self.cache_misses})
+            counter("fallback_attempts_total", "Messages no rule matched that went to the fallback classifier.", {"": self.fallback_attempts})
+            counter("fallback_hits_total", "Messages the fallback classifier answered.", {"": self.fallback_hits})
+            histogram("stage_seconds", "Time spent in each stage of answering a message.", {
+                f"stage=\"{stage}\"": self.stages[stage] for stage in STAGES if stage in self.stages
+            })
+            histogram("response_seconds", "Time to answer a message, all stages included.", {"": self.response_time})
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,121 @@
+import re
+import sys
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Words are runs of letters, digits and underscores, as with \w in patterns
+WORD_PATTERN = re.compile(r"\w+")
+
+
+class KeywordIndex:
+    """Aho-Corasick automaton over whole words for a catalogue of keywords.
+
+    Keywords may span several words ("student center"). Lookup walks the
+    input's words once, so its cost depends on the length of the message
+    rather than on how many keywords are indexed.
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        # State 0 is the root; each state maps a word to the next state
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.outputs: List[Tuple[int, ...]] = [()]
+        self.keywords: List[str] = []
+        self.lengths: List[int] = []
+        self.vocabulary: FrozenSet[str] = frozenset()
+
+        # Build the trie, remembering which keyword ends at each state.
+        # Words are interned since the same few recur across states.
+        ends: List[List[int]] = [[]]
+        for keyword in keywords:
+            words = [sys.intern(word) for word in WORD_PATTERN.findall(keyword.lower())]
+            if not words:
+                continue
+            state = 0
+            for word in words:
+                next_state = self.goto[state].get(word)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][word] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    ends.append([])
+                state = next_state
+            if not ends[state]:
+                ends[state].append(len(self.keywords))
+                self.keywords.append(keyword)
+                self.lengths.append(len(words))
+
+        self.vocabulary = frozenset(word for state in self.goto for word in state)
+
+        # Breadth-first pass to link each state to its longest proper suffix
+        # and merge in the keywords that end there
+        self.outputs = [tuple(found) for found in ends]
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for word, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and word not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(word, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.outputs[next_state] += self.outputs[self.fail[next_state]]
+
+    def to_state(self) -> Tuple:
+        """Return the automaton as plain lists and dicts, e.g. for marshal."""
+        return (self.goto, self.fail, self.outputs, self.keywords, self.lengths)
+
+    @classmethod
+    def from_state(cls, state: Tuple) -> "KeywordIndex":
+        """Rebuild an index from to_state() output without redoing the construction."""
+        index = cls.__new__(cls)
+        goto, fail, outputs, keywords, lengths = state
+        index.goto = list(goto)
+        index.fail = list(fail)
+        index.outputs = [tuple(found) for found in outputs]
+        index.keywords = list(keywords)
+        index.lengths = list(lengths)
+        index.vocabulary = frozenset(word for state in index.goto for word in state)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.keywords)
+
+    def find_all(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """Yield (start, end, keyword) for every whole-word keyword in text."""
+        state = 0
+        starts: List[int] = []
+        for match in WORD_PATTERN.finditer(text.lower()):
+            word = match.group()
+            starts.append(match.start())
+            while state and word not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(word, 0)
+            for index in self.outputs[state]:
+                yield starts[-self.lengths[index]], match.end(), self.keywords[index]
+
+    def best_match(self, text: str) -> Optional[str]:
+        """Return the keyword to answer with, or None if nothing matches.
+
+        Longer keywords win, being more specific ("student center" over
+        "center"); ties go to whichever was indexed first.
+        """
+        return self.best_match_words(WORD_PATTERN.findall(text.lower()))
+
+    def best_match_words(self, words: Sequence[str]) -> Optional[str]:
+        """Same as best_match() for a message already split into lowercase words."""
+        # Most messages share no word with the catalogue; a set check in C
+        # settles those without walking the automaton
+        if self.vocabulary.isdisjoint(words):
+            return None
+
+        best = None
+        state = 0
+        for word in words:
+            while state and word not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(word, 0)
+            for index in self.outputs[state]:
+                if best is None or (-self.lengths[index], index) < (-self.lengths[best], best):
+                    best = index
+        return None if best is None else self.keywords[best]
@@ -0,0 +1,256 @@
+import argparse
+import csv
+import hashlib
+import json
+import marshal
+import os
+import re
+import struct
+import sys
+import zlib
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence
+
+try:
+    from .chatbot_logic import DEFAULT_RESPONSES, FACILITIES_INFO, INTENTS, IntentEngine
+except ImportError:  # run as a script from this folder
+    from chatbot_logic import DEFAULT_RESPONSES, FACILITIES_INFO, INTENTS, IntentEngine
+
+# Identifies a snapshot file and the layout version it was written with
+SNAPSHOT_MAGIC = b"CHATKB\x00\x02"
+# Magic, CRC-32 of the payload, payload length
+SNAPSHOT_HEADER = struct.Struct("<8sIQ")
+
+# Columns a facility CSV must have; any others are kept as extra fields
+FACILITY_COLUMNS = ("name", "location", "hours", "details")
+
+# Entries every snapshot payload has
+SNAPSHOT_KEYS = frozenset(("digest", "intents", "facilities", "default_responses", "indexes"))
+
+
+class KnowledgeBaseError(Exception):
+    """Raised when a rule source or snapshot can't be loaded."""
+
+
+class KnowledgeBase:
+    """Intents, facilities and default replies, wherever they were loaded from.
+
+    intents maps a category ("greeting", ...) to {pattern: [responses]},
+    facilities maps a keyword to its location, hours and details, and
+    default_responses are the replies for messages nothing matched.
+    """
+
+    def __init__(
+        self,
+        intents: Optional[Mapping[str, Mapping[str, Sequence[str]]]] = None,
+        facilities: Optional[Mapping[str, Mapping[str, str]]] = None,
+        default_responses: Optional[Sequence[str]] = None
+    ):
+        self.intents: Dict[str, Dict[str, List[str]]] = {
+            category: {pattern: list(responses) for pattern, responses in patterns.items()}
+            for category, patterns in (intents or {}).items()
+        }
+        self.facilities: Dict[str, Dict[str, str]] = {
+            keyword.lower(): dict(info) for keyword, info in (facilities or {}).items()
+        }
+        self.default_responses: List[str] = list(default_responses or [])
+
+    @classmethod
+    def builtin(cls) -> "KnowledgeBase":
+        """Return the tables that ship in chatbot_logic."""
+        return cls(INTENTS, FACILITIES_INFO, DEFAULT_RESPONSES)
+
+    def merge(self, other: "KnowledgeBase"):
+        """Add other's entries on top of these, replacing any with the same key."""
+        for category, patterns in other.intents.items():
+            self.intents.setdefault(category, {}).update(patterns)
+        self.facilities.update(other.facilities)
+        if other.default_responses:
+            self.default_responses = list(other.default_responses)
+
+    def build_engine(self, **options) -> IntentEngine:
+        """Build an IntentEngine over these tables; options go to its constructor."""
+        return IntentEngine(self.intents, self.facilities, self.default_responses or DEFAULT_RESPONSES, **options)
+
+
+def load_source(path: str) -> KnowledgeBase:
+    """Load one JSON, YAML or CSV rule file.
+
+    JSON and YAML files hold an object with any of "intents", "facilities"
+    and "default_responses". A CSV file is a facility catalogue with name,
+    location, hours and details columns.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    try:
+        if extension == ".csv":
+            return load_facility_csv(path)
+        with open(path, encoding="utf-8") as source:
+            if extension == ".json":
+                data = json.load(source)
+            elif extension in (".yaml", ".yml"):
+                try:
+                    import yaml
+                except ImportError:
+                    raise KnowledgeBaseError(f"PyYAML is needed to load {path}: pip install pyyaml")
+                try:
+                    data = yaml.safe_load(source)
+                except yaml.YAMLError as error:
+                    raise KnowledgeBaseError(f"Could not load {path}: {error}") from error
+            else:
+                raise KnowledgeBaseError(f"Unsupported rule file type: {path}")
+
+        if not isinstance(data, dict):
+            raise KnowledgeBaseError(f"{path} must contain an object at the top level")
+        knowledge_base = KnowledgeBase(data.get("intents"), data.get("facilities"), data.get("default_responses"))
+    # Unreadable files, malformed CSV and tables of the wrong shape (a list
+    # where a mapping belongs, say) all come out as a KnowledgeBaseError
+    except (OSError, ValueError, TypeError, AttributeError, csv.Error) as error:
+        raise KnowledgeBaseError(f"Could not load {path}: {error}") from error
+
+    # Check the patterns here, where the file and rule can still be named
+    for category, patterns in knowledge_base.intents.items():
+        for pattern in patterns:
+            try:
+                re.compile(pattern)
+            except (re.error, TypeError) as error:
+                raise KnowledgeBaseError(f"Bad pattern {pattern!r} for {category} in {path}: {error}") from error
+    return knowledge_base
+
+def load_facility_csv(path: str) -> KnowledgeBase:
+    """Load a facility catalogue from a CSV file with a header row."""
+    with open(path, newline="", encoding="utf-8") as source:
+        reader = csv.DictReader(source)
+        missing = [column for column in FACILITY_COLUMNS if column not in (reader.fieldnames or ())]
+        if missing:
+            raise KnowledgeBaseError(f"{path} is missing columns: {', '.join(missing)}")
+        facilities = {}
+        for row in reader:
+            name = row.pop("name").strip()
+            if name:
+                facilities[name] = {field: (value or "").strip() for field, value in row.items() if field}
+    return KnowledgeBase(facilities=facilities)
+
+def load_sources(paths: Iterable[str], include_builtin: bool = True) -> KnowledgeBase:
+    """Load and merge rule files in order, on top of the built-in tables by default."""
+    knowledge_base = KnowledgeBase.builtin() if include_builtin else KnowledgeBase()
+    for path in paths:
+        knowledge_base.merge(load_source(path))
+    return knowledge_base
+
+def source_digest(paths: Iterable[str], include_builtin: bool = True) -> str:
+    """Return a hash of the rule files' contents, used to spot stale snapshots."""
+    digest = hashlib.sha256()
+    # The built-in tables are hashed too, so a snapshot goes stale when they change
+    if include_builtin:
+        digest.update(json.dumps([INTENTS, FACILITIES_INFO, DEFAULT_RESPONSES], sort_keys=True).encode("utf-8"))
+    for path in paths:
+        with open(path, "rb") as source:
+            digest.update(hashlib.sha256(source.read()).digest())
+    return digest.hexdigest()
+
+
+def compile_snapshot(knowledge_base: KnowledgeBase, path: str, digest: str = ""):
+    """Write the tables plus the engine's prebuilt indexes to a binary snapshot.
+
+    The payload is marshal data, which loads far faster than JSON or YAML
+    and keeps strings interned, so repeated values such as shared opening
+    hours are stored and loaded once.
+    """
+    engine = knowledge_base.build_engine()
+    facilities = {
+        sys.intern(keyword): {
+            sys.intern(field): sys.intern(value) if isinstance(value, str) else value
+            for field, value in info.items()
+        }
+        for keyword, info in knowledge_base.facilities.items()
+    }
+    payload = marshal.dumps({
+        "digest": digest,
+        "intents": knowledge_base.intents,
+        "facilities": facilities,
+        "default_responses": knowledge_base.default_responses,
+        "indexes": engine.export_indexes()
+    })
+
+    # Write to a temporary file and rename, so readers never see half a
+    # snapshot; the name is per process as server workers may race to rebuild it
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as snapshot:
+        snapshot.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, zlib.crc32(payload), len(payload)))
+        snapshot.write(payload)
+    os.replace(temporary, path)
+
+def read_snapshot(path: str) -> dict:
+    """Read a snapshot file and decode its payload.
+
+    The whole payload is decoded up front; nothing is mapped or loaded
+    lazily. The time saved is the parsing and index building, and server
+    workers forked afterwards share the decoded tables copy-on-write.
+    """
+    try:
+        with open(path, "rb") as snapshot:
+            data = snapshot.read()
+        if len(data) < SNAPSHOT_HEADER.size:
+            raise KnowledgeBaseError(f"{path} is too short to be a snapshot")
+        magic, checksum, length = SNAPSHOT_HEADER.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC:
+            raise KnowledgeBaseError(f"{path} is not a knowledge base snapshot")
+        with memoryview(data)[SNAPSHOT_HEADER.size:SNAPSHOT_HEADER.size + length] as body:
+            if len(body) != length or zlib.crc32(body) != checksum:
+                raise KnowledgeBaseError(f"{path} is truncated or corrupt")
+            payload = marshal.loads(body)
+    # marshal raises any of these on bytes it didn't write
+    except (OSError, ValueError, EOFError, TypeError) as error:
+        raise KnowledgeBaseError(f"Could not read snapshot {path}: {error}") from error
+    if not isinstance(payload, dict) or not SNAPSHOT_KEYS <= payload.keys():
+        raise KnowledgeBaseError(f"{path} is missing parts of a snapshot")
+    return payload
+
+def load_snapshot(path: str, **options) -> IntentEngine:
+    """Build an engine from a snapshot without re-parsing or re-indexing the sources."""
+    payload = read_snapshot(path)
+    return IntentEngine(
+        payload["intents"],
+        payload["facilities"],
+        payload["default_responses"] or DEFAULT_RESPONSES,
+        indexes=payload["indexes"],
+        **options
+    )
+
+def load_engine(sources: Sequence[str], snapshot: Optional[str] = None, include_builtin: bool = True, **options) -> IntentEngine:
+    """Build an engine for the rule files, going through a snapshot when one is given.
+
+    A snapshot that is missing or was compiled from different sources is
+    rebuilt first, so callers can always pass the same paths.
+    """
+    if snapshot is None:
+        return load_sources(sources, include_builtin).build_engine(**options)
+
+    digest = source_digest(sources, include_builtin)
+    try:
+        if read_snapshot(snapshot)["digest"] == digest:
+            return load_snapshot(snapshot, **options)
+    except KnowledgeBaseError:
+        pass
+    compile_snapshot(load_sources(sources, include_builtin), snapshot, digest)
+    return load_snapshot(snapshot, **options)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile rule files into a knowledge base snapshot.")
+    parser.add_argument("sources", nargs="*", help="JSON, YAML or CSV rule files, merged in order")
+    parser.add_argument("-o", "--output", required=True, help="snapshot file to write")
+    parser.add_argument("--no-builtin", action="store_true", help="don't start from the built-in tables")
+    args = parser.parse_args()
+
+    include_builtin = not args.no_builtin
+    try:
+        knowledge_base = load_sources(args.sources, include_builtin)
+        compile_snapshot(knowledge_base, args.output, source_digest(args.sources, include_builtin))
+    except KnowledgeBaseError as error:
+        sys.exit(str(error))
+    print(f"Wrote {args.output}: {len(knowledge_base.facilities)} facilities, "
+          f"{sum(len(patterns) for patterns in knowledge_base.intents.values())} intent patterns")
+
+# Entry point for compiling snapshots
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import re
+from typing import Dict, List, Match, Optional, Tuple
+
+try:
+    from .keyword_index import WORD_PATTERN
+except ImportError:  # run as a script from this folder
+    from keyword_index import WORD_PATTERN
+
+# Apostrophe look-alikes from phone keyboards and word processors, straightened
+APOSTROPHES = str.maketrans({"’": "'", "‘": "'", "ʼ": "'", "′": "'", "`": "'", "´": "'"})
+
+# Contractions typed without their apostrophe, restored so patterns written
+# with one ("i'm tired") still match. Ones that double as ordinary words
+# ("its", "ill", "id", "were", "wont") are left alone.
+CONTRACTIONS: Dict[str, str] = {
+    "im": "i'm", "ive": "i've", "youre": "you're", "youve": "you've", "theyre": "they're",
+    "dont": "don't", "doesnt": "doesn't", "didnt": "didn't", "cant": "can't", "couldnt": "couldn't",
+    "wouldnt": "wouldn't", "shouldnt": "shouldn't", "isnt": "isn't", "arent": "aren't", "wasnt": "wasn't",
+    "havent": "haven't", "hasnt": "hasn't", "whats": "what's", "wheres": "where's", "whens": "when's",
+    "hows": "how's", "thats": "that's", "theres": "there's", "whos": "who's"
+}
+CONTRACTION_PATTERN = re.compile(r"\b(?:" + "|".join(CONTRACTIONS) + r")\b")
+
+# The bare contractions as a whitespace split leaves them, punctuation
+# and all, for a quick check before the pattern runs
+CONTRACTION_WORDS = frozenset(word + end for word in CONTRACTIONS for end in ("", ",", ".", "?", "!", ";", ":"))
+
+
+class Normalised:
+    """A message folded once for every matcher: its text, its words and where each word sits.
+
+    text is lowercased with apostrophes straightened and contractions
+    restored. tokens are its words as the keyword index splits them
+    ("i'm" is "i", "m") and offsets each token's (start, end) in text;
+    both are only worked out if asked for, as a pattern that settles the
+    message on the text alone never needs them.
+    """
+    __slots__ = ("text", "words", "spans")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.words: Optional[List[str]] = None
+        self.spans: Optional[Tuple[Tuple[int, int], ...]] = None
+
+    @property
+    def tokens(self) -> List[str]:
+        if self.words is None:
+            self.words = WORD_PATTERN.findall(self.text)
+        return self.words
+
+    @property
+    def offsets(self) -> Tuple[Tuple[int, int], ...]:
+        if self.spans is None:
+            self.spans = tuple(match.span() for match in WORD_PATTERN.finditer(self.text))
+        return self.spans
+
+    def __repr__(self):
+        return f"Normalised({self.text!r})"
+
+
+def expand_contraction(match: Match) -> str:
+    return CONTRACTIONS[match.group()]
+
+def normalise(text: str) -> Normalised:
+    """Fold a message once for every matcher to share."""
+    text = text.lower()
+    if not text.isascii():
+        text = text.translate(APOSTROPHES)
+    # Most messages have no bare contraction, which a split and a set check in C settle
+    if not CONTRACTION_WORDS.isdisjoint(text.split()):
+        text = CONTRACTION_PATTERN.sub(expand_contraction, text)
+    return Normalised(text)
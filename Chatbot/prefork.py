@@ -0,0 +1,147 @@
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Connections the kernel queues on a listening socket before refusing more
+LISTEN_BACKLOG = 1024
+
+# A worker exiting sooner than this after it started is restarted only
+# after RESTART_DELAY, so one that crashes on startup doesn't spin
+MIN_WORKER_LIFETIME = 5.0
+RESTART_DELAY = 1.0
+
+# Seconds workers get to finish after being asked to stop, before they're killed
+SHUTDOWN_TIMEOUT = 10.0
+
+
+def listening_socket(host: str, port: int, reuse_port: bool = False) -> socket.socket:
+    """Bind a TCP listening socket, optionally with SO_REUSEPORT so several processes can bind the same port."""
+    return socket.create_server((host, port), backlog=LISTEN_BACKLOG, reuse_port=reuse_port)
+
+
+class PreforkServer:
+    """Runs a server function in forked worker processes, all accepting on one port.
+
+    Whatever the master has loaded before run() (the engine with its
+    compiled patterns, facility tables and indexes) is inherited by every
+    worker instead of being rebuilt, and gc.freeze() moves it out of the
+    collector's reach first, so the collector never writes to those pages
+    and they stay shared copy-on-write. By default the master binds one
+    socket that all workers accept on; with reuse_port each worker binds
+    its own SO_REUSEPORT socket and the kernel spreads connections between
+    them evenly. serve is called in each worker with its socket and should
+    run until interrupted; anything holding threads, files or connections
+    (session stores, transcript writers) belongs inside it, since those
+    don't survive a fork. A worker that exits for any reason is replaced,
+    and SIGINT or SIGTERM to the master stops them all.
+    """
+
+    def __init__(
+        self,
+        serve: Callable[[socket.socket], None],
+        workers: Optional[int] = None,
+        host: str = "127.0.0.1",
+        port: int = 8080,
+        reuse_port: bool = False
+    ):
+        if not hasattr(os, "fork"):
+            raise RuntimeError("Pre-fork serving needs os.fork(), which this platform lacks")
+        if reuse_port and not hasattr(socket, "SO_REUSEPORT"):
+            raise RuntimeError("SO_REUSEPORT isn't supported on this platform")
+        self.serve = serve
+        self.workers = workers or os.cpu_count() or 1
+        self.host = host
+        self.port = port
+        self.reuse_port = reuse_port
+        self.sock: Optional[socket.socket] = None
+        # Process id of every running worker, mapped to when it started
+        self.children: Dict[int, float] = {}
+        self.restarts = 0
+        self.stopping = False
+
+    def run(self):
+        """Fork the workers and keep them running until the master is interrupted."""
+        if not self.reuse_port:
+            self.sock = listening_socket(self.host, self.port)
+        # Signals reach the master as KeyboardInterrupt, which breaks out of waiting on the workers
+        previous_handler = signal.signal(signal.SIGTERM, signal.default_int_handler)
+        gc.freeze()
+        try:
+            for _ in range(self.workers):
+                self.spawn()
+            self.supervise()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+            signal.signal(signal.SIGTERM, previous_handler)
+            gc.unfreeze()
+            if self.sock is not None:
+                self.sock.close()
+
+    def spawn(self) -> int:
+        """Fork one worker and return its process id."""
+        pid = os.fork()
+        if pid:
+            self.children[pid] = time.monotonic()
+            return pid
+
+        # In the worker: serve, then leave without running the master's cleanup
+        code = 0
+        try:
+            signal.signal(signal.SIGTERM, signal.default_int_handler)
+            sock = self.sock if self.sock is not None else listening_socket(self.host, self.port, reuse_port=True)
+            self.serve(sock)
+        except KeyboardInterrupt:
+            pass
+        except BaseException:
+            logger.exception("Worker %d failed", os.getpid())
+            code = 1
+        finally:
+            logging.shutdown()
+            os._exit(code)
+
+    def supervise(self):
+        """Wait on the workers, replacing each one that exits."""
+        while self.children:
+            pid, status = os.wait()
+            started = self.children.pop(pid, None)
+            if started is None or self.stopping:
+                continue
+            logger.warning("Worker %d exited with status %d; starting another", pid, os.waitstatus_to_exitcode(status))
+            if time.monotonic() - started < MIN_WORKER_LIFETIME:
+                time.sleep(RESTART_DELAY)
+            self.restarts += 1
+            self.spawn()
+
+    def stop(self, timeout: float = SHUTDOWN_TIMEOUT):
+        """Ask every worker to stop, killing any still running after timeout seconds."""
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                self.children.pop(pid, None)
+
+        deadline = time.monotonic() + timeout
+        while self.children and time.monotonic() < deadline:
+            for pid in list(self.children):
+                try:
+                    exited = os.waitpid(pid, os.WNOHANG)[0]
+                except ChildProcessError:
+                    exited = pid
+                if exited:
+                    del self.children[pid]
+            if self.children:
+                time.sleep(0.05)
+        for pid in list(self.children):
+            logger.warning("Worker %d didn't stop in time; killing it", pid)
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            del self.children[pid]
@@ -0,0 +1,102 @@
+from collections import OrderedDict
+import re
+import threading
+import time
+from typing import Any, Callable, NamedTuple, Optional, Tuple
+
+try:
+    from .normaliser import APOSTROPHES
+except ImportError:  # run as a script from this folder
+    from normaliser import APOSTROPHES
+
+# Runs of anything other than word characters and apostrophes collapse to a space
+SEPARATOR_PATTERN = re.compile(r"[^\w']+")
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    maxsize: int
+    currsize: int
+
+
+def normalise_key(text: str) -> str:
+    """Lowercase text, straighten apostrophes and collapse whitespace and punctuation to single spaces."""
+    text = text.lower()
+    if not text.isascii():
+        text = text.translate(APOSTROPHES)
+    return SEPARATOR_PATTERN.sub(" ", text).strip()
+
+
+class ResponseCache:
+    """Bounded LRU cache with an optional time-to-live per entry.
+
+    Safe to share between threads. Counters mirror functools.lru_cache's
+    cache_info(), plus evictions and expirations.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    # The lock can't be pickled, so a copy sent to another process gets its own
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None on a miss."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if self.ttl is not None and expires_at <= self.clock():
+                del self.entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: Any):
+        """Store value under key, evicting the least recently used entry if full."""
+        expires_at = self.clock() + self.ttl if self.ttl is not None else 0.0
+        with self.lock:
+            self.entries[key] = (value, expires_at)
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry and reset the counters."""
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def info(self) -> CacheInfo:
+        """Return the hit, miss, eviction and expiration counters."""
+        with self.lock:
+            return CacheInfo(self.hits, self.misses, self.evictions, self.expirations, self.maxsize, len(self.entries))
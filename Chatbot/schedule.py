@@ -0,0 +1,466 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+import re
+from typing import Dict, FrozenSet, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Set, Tuple, Union
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+DAY_NAMES = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+# Day words as they appear in hours text, by weekday number (Monday is 0)
+DAY_WORDS: Dict[str, int] = {}
+for number, day_name in enumerate(DAY_NAMES):
+    for length in (3, 4, len(day_name)):
+        DAY_WORDS.setdefault(day_name[:length], number)
+DAY_WORDS.update({"tues": 1, "wednes": 2, "thur": 3, "thurs": 3})
+
+# Words that stand for several days at once
+DAY_GROUPS: Dict[str, Tuple[int, ...]] = {
+    "daily": tuple(range(7)),
+    "everyday": tuple(range(7)),
+    "weekdays": tuple(range(5)),
+    "weekday": tuple(range(5)),
+    "weekends": (5, 6),
+    "weekend": (5, 6)
+}
+
+# Times as "9:00 AM", "9pm", "21:00", "noon" or "midnight"; a space may
+# stand in for the colon before AM/PM, as it does in normalised cache keys
+TIME_PATTERN = r"(?:\d{1,2}(?:[:\s]\d{2})?\s*[ap]\.?\s*m\b\.?|\d{1,2}:\d{2}|noon|midnight)"
+RANGE_PATTERN = re.compile(rf"(?P<start>{TIME_PATTERN})\s*(?:to|until|till|through|-|–)\s*(?P<end>{TIME_PATTERN})")
+DAY_RANGE_PATTERN = re.compile(r"(?P<first>[a-z]+)\s*(?:to|through|thru|-|–)\s*(?P<last>[a-z]+)")
+ALWAYS_OPEN_PATTERN = re.compile(r"24\s*/\s*7|24\s*hours|always\s+open|around\s+the\s+clock")
+WHEN_TIME_PATTERN = re.compile(rf"(?:(?P<preposition>at|after|by|around|from)\s+)?(?P<time>{TIME_PATTERN})")
+
+# Separates the dates in a facility's "closed_on" field
+DATE_SEPARATOR = ","
+
+# Facilities listed by name in one answer before the rest are counted
+MAX_LISTED = 8
+
+# Cuts through the week between full copies of the open set in a ScheduleIndex
+CHECKPOINT_INTERVAL = 32
+
+# Minutes past midnight "tonight" means when asked earlier in the day
+EVENING = 20 * 60
+
+
+class ScheduleError(ValueError):
+    """Raised when opening hours text can't be read as a schedule."""
+
+
+class Moment(NamedTuple):
+    """When a question asks about: kind is "now", "time" (at moment) or "day" (any time on moment's date).
+
+    after is set for "after 9pm" style questions.
+    """
+    kind: str
+    moment: datetime
+    after: bool = False
+
+
+def parse_time(text: str, end: bool = False) -> int:
+    """Return the minutes past midnight for "9:00 AM", "9pm", "21:00", "noon" or "midnight".
+
+    Midnight is the end of the day rather than its start when end is set.
+    """
+    text = text.strip().lower().replace(".", "")
+    if text == "noon":
+        return 12 * 60
+    if text == "midnight":
+        return MINUTES_PER_DAY if end else 0
+    match = re.fullmatch(r"(\d{1,2})(?:[:\s](\d{2}))?\s*(?:([ap])\s*m)?", text)
+    if match is None:
+        raise ScheduleError(f"Can't read {text!r} as a time")
+    hour, minute = int(match.group(1)), int(match.group(2) or 0)
+    if match.group(3):
+        if not 1 <= hour <= 12:
+            raise ScheduleError(f"Can't read {text!r} as a time")
+        hour = hour % 12 + (12 if match.group(3) == "p" else 0)
+    if hour > 23 or minute > 59:
+        raise ScheduleError(f"Can't read {text!r} as a time")
+    minutes = hour * 60 + minute
+    return MINUTES_PER_DAY if end and minutes == 0 else minutes
+
+def parse_days(text: str) -> Optional[Tuple[int, ...]]:
+    """Return the weekdays named in text ("Mon-Fri", "weekends", "Sat & Sun"), or None if it names none."""
+    text = text.lower()
+    days = set()
+    for match in DAY_RANGE_PATTERN.finditer(text):
+        first, last = DAY_WORDS.get(match.group("first")), DAY_WORDS.get(match.group("last"))
+        if first is not None and last is not None:
+            days.update((first + offset) % 7 for offset in range((last - first) % 7 + 1))
+            text = text.replace(match.group(0), " ")
+    for word in re.findall(r"[a-z]+", text.replace("every day", "everyday")):
+        if word in DAY_GROUPS:
+            days.update(DAY_GROUPS[word])
+        elif word in DAY_WORDS:
+            days.add(DAY_WORDS[word])
+    return tuple(sorted(days)) if days else None
+
+def parse_hours(text: str) -> List[Tuple[int, int]]:
+    """Turn opening hours text into sorted, merged [start, end) minute-of-week intervals.
+
+    Parts separated by semicolons each give hours for some days, every
+    day when they name none, and later parts override earlier ones:
+    "Mon-Fri 9:00 AM to 5:00 PM; Sat 10:00 AM to 2:00 PM; Sun closed".
+    Ranges ending before they start run past midnight, and "24/7" or
+    "24 hours" means open all day.
+    """
+    hours_by_day: Dict[int, List[Tuple[int, int]]] = {}
+    understood = False
+    for part in re.split(r"[;\n]", text.lower()):
+        part = part.strip()
+        if not part:
+            continue
+        ranges = list(RANGE_PATTERN.finditer(part))
+        days_text = part[:ranges[0].start()] if ranges else part
+        days = parse_days(days_text) or tuple(range(7))
+
+        if ALWAYS_OPEN_PATTERN.search(part):
+            day_hours = [(0, MINUTES_PER_DAY)]
+        elif ranges:
+            day_hours = []
+            for match in ranges:
+                start = parse_time(match.group("start"))
+                end = parse_time(match.group("end"), end=True)
+                # Ranges like 10:00 PM to 2:00 AM run into the next day
+                day_hours.append((start, end if end > start else end + MINUTES_PER_DAY))
+        elif "closed" in part:
+            day_hours = []
+        else:
+            continue
+        understood = True
+        for day in days:
+            hours_by_day[day] = day_hours
+
+    if not understood:
+        raise ScheduleError(f"Can't read {text!r} as opening hours")
+
+    intervals = []
+    for day, day_hours in hours_by_day.items():
+        for start, end in day_hours:
+            start += day * MINUTES_PER_DAY
+            end += day * MINUTES_PER_DAY
+            # Hours running past the end of Sunday wrap round to Monday
+            if end > MINUTES_PER_WEEK:
+                intervals.append((0, end - MINUTES_PER_WEEK))
+                end = MINUTES_PER_WEEK
+            intervals.append((start, end))
+    return merge_intervals(intervals)
+
+def merge_intervals(intervals: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Sort intervals and join any that overlap or touch."""
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def parse_dates(value: Union[str, Sequence[str], None]) -> List[date]:
+    """Read ISO dates from a comma-separated string or a list."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(DATE_SEPARATOR)
+    try:
+        return [date.fromisoformat(text.strip()) for text in value if text.strip()]
+    except ValueError as error:
+        raise ScheduleError(f"Can't read closing dates {value!r}: {error}") from error
+
+def minute_of_week(when: datetime) -> int:
+    return when.weekday() * MINUTES_PER_DAY + when.hour * 60 + when.minute
+
+def start_of_week(when: datetime) -> datetime:
+    """Return midnight on the Monday of when's week."""
+    return datetime.combine(when.date() - timedelta(days=when.weekday()), datetime.min.time(), when.tzinfo)
+
+
+class Schedule:
+    """When one facility is open: sorted minute-of-week intervals and dates it's closed all day.
+
+    Intervals are kept as two parallel arrays of starts and ends, so
+    whether it's open at a moment is a single binary search.
+    """
+
+    def __init__(self, intervals: Iterable[Tuple[int, int]], closed_on: Iterable[date] = ()):
+        merged = merge_intervals(intervals)
+        self.starts = array("I", [start for start, _ in merged])
+        self.ends = array("I", [end for _, end in merged])
+        self.closed_on = frozenset(closed_on)
+
+    @classmethod
+    def parse(cls, hours: str, closed_on: Union[str, Sequence[str], None] = None) -> "Schedule":
+        return cls(parse_hours(hours), parse_dates(closed_on))
+
+    @property
+    def whole_week(self) -> bool:
+        """Whether the weekly hours cover every minute, closed days aside."""
+        return len(self.starts) == 1 and self.starts[0] == 0 and self.ends[0] == MINUTES_PER_WEEK
+
+    @property
+    def always_open(self) -> bool:
+        return self.whole_week and not self.closed_on
+
+    def key(self) -> Tuple:
+        """Return a value equal for schedules that are open at exactly the same times."""
+        return tuple(self.starts), tuple(self.ends), self.closed_on
+
+    def interval_at(self, minute: int) -> int:
+        """Return the index of the interval containing a minute of the week, or -1."""
+        index = bisect_right(self.starts, minute) - 1
+        return index if index >= 0 and minute < self.ends[index] else -1
+
+    def is_open(self, when: datetime) -> bool:
+        if when.date() in self.closed_on:
+            return False
+        return self.interval_at(minute_of_week(when)) >= 0
+
+    def open_until(self, when: datetime) -> Optional[datetime]:
+        """Return when the facility next closes if it's open at when, else None, as it is if it never closes."""
+        if not self.is_open(when):
+            return None
+        if self.whole_week:
+            later = [day for day in self.closed_on if day > when.date()]
+            return datetime.combine(min(later), datetime.min.time(), when.tzinfo) if later else None
+        week = start_of_week(when)
+        index = self.interval_at(minute_of_week(when))
+        end = self.ends[index]
+        # An interval running to the end of Sunday carries on into Monday's
+        if end == MINUTES_PER_WEEK and self.starts[0] == 0:
+            end = MINUTES_PER_WEEK + self.ends[0]
+        closing = week + timedelta(minutes=end)
+        # A closed day cuts the hours short at its midnight
+        midnight = datetime.combine(when.date() + timedelta(days=1), datetime.min.time(), when.tzinfo)
+        while midnight < closing and midnight.date() not in self.closed_on:
+            midnight += timedelta(days=1)
+        return min(closing, midnight)
+
+    def next_opening(self, when: datetime) -> Optional[datetime]:
+        """Return when the facility next opens, when itself if it's open then, or None if it never does."""
+        if not self.starts:
+            return None
+        # Nothing opens on a closed day, though hours that began on one may
+        # run on into the next
+        while when.date() in self.closed_on:
+            when = datetime.combine(when.date() + timedelta(days=1), datetime.min.time(), when.tzinfo)
+        if self.is_open(when):
+            return when
+        week = start_of_week(when)
+        index = bisect_right(self.starts, minute_of_week(when))
+        # Walk the intervals forward week by week, passing over any that
+        # start on a closed day; a year ahead is as far as it's worth looking
+        for _ in range(len(self.starts) * 54):
+            if index == len(self.starts):
+                index = 0
+                week += timedelta(days=7)
+            opening = week + timedelta(minutes=self.starts[index])
+            if opening.date() not in self.closed_on:
+                return opening
+            # An interval starting on a closed day may still run on past it
+            next_day = datetime.combine(opening.date() + timedelta(days=1), datetime.min.time(), when.tzinfo)
+            if self.is_open(next_day):
+                return next_day
+            index += 1
+        return None
+
+    def hours_on(self, day: date) -> List[Tuple[int, int]]:
+        """Return the (start, end) minutes past midnight the facility is open on a date."""
+        if day in self.closed_on:
+            return []
+        first = day.weekday() * MINUTES_PER_DAY
+        last = first + MINUTES_PER_DAY
+        hours = []
+        for index in range(bisect_right(self.ends, first), bisect_left(self.starts, last)):
+            start, end = max(self.starts[index], first), min(self.ends[index], last)
+            if start < end:
+                hours.append((start - first, end - first))
+        return hours
+
+
+class ScheduleIndex:
+    """Every facility's schedule, indexed so "what's open at T" needs no scan of the facilities.
+
+    Facilities with identical schedules share a group. The week is cut at
+    every group's opening and closing minutes; each cut records the groups
+    opening and closing there, and every CHECKPOINT_INTERVAL cuts the full
+    set of open groups is stored too. A query binary-searches for its cut
+    and replays at most that many cuts' changes onto the checkpoint before
+    it, so memory stays proportional to the number of intervals even when
+    every facility keeps different hours.
+    """
+
+    def __init__(self, schedules: Mapping[str, Schedule]):
+        self.schedules = dict(schedules)
+
+        groups: Dict[Tuple, int] = {}
+        self.members: List[List[str]] = []
+        self.group_schedules: List[Schedule] = []
+        for name, schedule in self.schedules.items():
+            group = groups.get(schedule.key())
+            if group is None:
+                group = groups[schedule.key()] = len(self.members)
+                self.members.append([])
+                self.group_schedules.append(schedule)
+            self.members[group].append(name)
+
+        # Sweep the week, starting or ending groups at each boundary
+        changes: Dict[int, List[Tuple[int, int]]] = {0: []}
+        for group, schedule in enumerate(self.group_schedules):
+            for start, end in zip(schedule.starts, schedule.ends):
+                changes.setdefault(start, []).append((group, 1))
+                changes.setdefault(end, []).append((group, -1))
+        self.boundaries = array("I")
+        self.opened: List[Tuple[int, ...]] = []
+        self.closed: List[Tuple[int, ...]] = []
+        self.checkpoints: List[FrozenSet[int]] = []
+        open_groups: Set[int] = set()
+        for minute in sorted(changes):
+            if minute == MINUTES_PER_WEEK:
+                break
+            opened = tuple(group for group, change in changes[minute] if change > 0)
+            closed = tuple(group for group, change in changes[minute] if change < 0)
+            open_groups.difference_update(closed)
+            open_groups.update(opened)
+            if len(self.boundaries) % CHECKPOINT_INTERVAL == 0:
+                self.checkpoints.append(frozenset(open_groups))
+            self.boundaries.append(minute)
+            self.opened.append(opened)
+            self.closed.append(closed)
+
+        # Every opening in the week, sorted, for "what opens later" questions
+        openings = sorted(
+            (start, group) for group, schedule in enumerate(self.group_schedules) for start in schedule.starts
+        )
+        self.opening_minutes = array("I", [minute for minute, _ in openings])
+        self.opening_groups = array("I", [group for _, group in openings])
+
+    def __len__(self) -> int:
+        return len(self.schedules)
+
+    def open_groups(self, minute: int) -> Set[int]:
+        """Return the groups open at a minute of the week."""
+        cut = bisect_right(self.boundaries, minute) - 1
+        first = cut - cut % CHECKPOINT_INTERVAL
+        groups = set(self.checkpoints[first // CHECKPOINT_INTERVAL])
+        for index in range(first + 1, cut + 1):
+            groups.difference_update(self.closed[index])
+            groups.update(self.opened[index])
+        return groups
+
+    def names(self, groups: Iterable[int], day: date) -> List[str]:
+        """Return the facilities in groups, leaving out any closed on day."""
+        found = []
+        for group in sorted(groups):
+            if day not in self.group_schedules[group].closed_on:
+                found.extend(self.members[group])
+        return found
+
+    def open_at(self, when: datetime) -> List[str]:
+        """Return the facilities open at a moment."""
+        return self.names(self.open_groups(minute_of_week(when)), when.date())
+
+    def open_after(self, when: datetime) -> List[str]:
+        """Return the facilities open at a moment or opening later the same day."""
+        minute = minute_of_week(when)
+        end_of_day = (minute // MINUTES_PER_DAY + 1) * MINUTES_PER_DAY
+        first = bisect_right(self.opening_minutes, minute)
+        last = bisect_left(self.opening_minutes, end_of_day)
+        groups = self.open_groups(minute)
+        groups.update(self.opening_groups[first:last])
+        return self.names(groups, when.date())
+
+    def open_on(self, day: date) -> List[str]:
+        """Return the facilities open at some point on a date."""
+        return self.open_after(datetime.combine(day, datetime.min.time()))
+
+
+def build_schedules(facilities: Mapping[str, Mapping[str, object]]) -> Dict[str, Schedule]:
+    """Parse every facility's "hours" and "closed_on" fields, leaving out any that can't be read."""
+    schedules = {}
+    parsed: Dict[Tuple, Schedule] = {}
+    for name, info in facilities.items():
+        hours = info.get("hours")
+        if not isinstance(hours, str):
+            continue
+        closed_on = info.get("closed_on")
+        # Catalogues repeat the same few hours, so each distinct one is parsed once
+        key = (hours, closed_on if isinstance(closed_on, (str, type(None))) else tuple(closed_on))
+        schedule = parsed.get(key)
+        if schedule is None:
+            try:
+                schedule = parsed[key] = Schedule.parse(hours, closed_on)
+            except ScheduleError:
+                continue
+        schedules[name] = schedule
+    return schedules
+
+def parse_when(phrase: str, now: datetime) -> Moment:
+    """Work out the moment a question is about from what follows "open": "now", "at 9pm", "on sunday", ...
+
+    Midnight is the one at the end of the day asked about. Anything
+    unrecognised means now.
+    """
+    phrase = phrase.lower()
+    day = None
+    if "tomorrow" in phrase:
+        day = now.date() + timedelta(days=1)
+    elif "today" in phrase or "tonight" in phrase:
+        day = now.date()
+    else:
+        for word in re.findall(r"[a-z]+", phrase):
+            weekday = DAY_WORDS.get(word)
+            if weekday is not None and len(word) >= 3:
+                day = now.date() + timedelta(days=(weekday - now.weekday()) % 7)
+                break
+
+    match = WHEN_TIME_PATTERN.search(phrase)
+    if match is not None:
+        try:
+            # Midnight is the one ending the day, so "at midnight" is the
+            # coming one rather than the one already past
+            minutes = parse_time(match.group("time"), end=True)
+        except ScheduleError:
+            match = None
+    if match is not None:
+        moment = datetime.combine(day or now.date(), datetime.min.time(), now.tzinfo) + timedelta(minutes=minutes)
+        return Moment("time", moment, match.group("preposition") == "after")
+    if "tonight" in phrase:
+        evening = datetime.combine(now.date(), datetime.min.time(), now.tzinfo) + timedelta(minutes=EVENING)
+        return Moment("time", evening) if now < evening else Moment("now", now)
+    if day is not None:
+        return Moment("day", datetime.combine(day, datetime.min.time(), now.tzinfo))
+    return Moment("now", now)
+
+def format_time(minutes: int) -> str:
+    """Format minutes past midnight the way the facility table writes times: "9:00 AM"."""
+    hour, minute = divmod(minutes % MINUTES_PER_DAY, 60)
+    return f"{(hour - 1) % 12 + 1}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+
+def format_day(day: date, today: date) -> str:
+    """Name a date relative to today: "today", "tomorrow", "on Friday" or "on Friday 25 December"."""
+    offset = (day - today).days
+    if offset == 0:
+        return "today"
+    if offset == 1:
+        return "tomorrow"
+    if 1 < offset < 7:
+        return f"on {day:%A}"
+    return f"on {day:%A} {day.day} {day:%B}"
+
+def format_moment(when: datetime, today: date) -> str:
+    """Format a moment as "9:00 PM today" or "6:00 AM tomorrow"."""
+    return f"{format_time(when.hour * 60 + when.minute)} {format_day(when.date(), today)}"
+
+def format_names(names: Sequence[str]) -> str:
+    """Join facility names as "the library, the gym and the cafeteria", summarising long lists."""
+    listed = [f"the {name}" for name in names[:MAX_LISTED]]
+    if len(names) > MAX_LISTED:
+        listed.append(f"{len(names) - MAX_LISTED} more")
+    if len(listed) == 1:
+        return listed[0]
+    return ", ".join(listed[:-1]) + " and " + listed[-1]
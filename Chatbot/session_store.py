@@ -0,0 +1,193 @@
+from collections import OrderedDict
+import threading
+import time
+from typing import Callable, Optional
+
+# Seconds a conversation can sit idle before it's forgotten
+SESSION_TTL = 30 * 60.0
+
+# Writes to a SQLite store between sweeps of its idle sessions
+SQLITE_SWEEP_INTERVAL = 1000
+
+# Seconds a SQLite store waits for another process's write lock
+SQLITE_BUSY_TIMEOUT = 5.0
+
+COLUMNS = ("user_name", "agent_name", "intent", "facility", "offer", "turns", "last_seen")
+
+
+class SessionState:
+    """What one conversation has covered so far, kept small as a server may hold hundreds of thousands.
+
+    intent and facility are from the last message that named them; offer
+    is the facility whose answer ended with a question ("Would you like
+    directions?") that a plain yes or no would answer.
+    """
+    __slots__ = COLUMNS
+
+    def __init__(
+        self,
+        user_name: Optional[str] = None,
+        agent_name: Optional[str] = None,
+        intent: Optional[str] = None,
+        facility: Optional[str] = None,
+        offer: Optional[str] = None,
+        turns: int = 0,
+        last_seen: float = 0.0
+    ):
+        self.user_name = user_name
+        self.agent_name = agent_name
+        self.intent = intent
+        self.facility = facility
+        self.offer = offer
+        self.turns = turns
+        self.last_seen = last_seen
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in COLUMNS)
+        return f"SessionState({fields})"
+
+
+class MemorySessionStore:
+    """Sessions held in this process, oldest first so idle ones expire from the front.
+
+    Safe to share between threads. States are returned by reference, but
+    put() them back after a reply anyway so the code works with any store.
+    Sessions idle for longer than ttl are dropped, and beyond max_sessions
+    the least recently used goes; both happen as new sessions arrive, so
+    there's no sweeper thread.
+    """
+
+    def __init__(self, ttl: Optional[float] = SESSION_TTL, max_sessions: Optional[int] = None, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.clock = clock
+        self.sessions: "OrderedDict[str, SessionState]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.expirations = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        """Return the state of a live session, or None if it's unknown or has expired."""
+        with self.lock:
+            state = self.sessions.get(session_id)
+            if state is None:
+                return None
+            if self.ttl is not None and self.clock() - state.last_seen > self.ttl:
+                del self.sessions[session_id]
+                self.expirations += 1
+                return None
+            return state
+
+    def put(self, session_id: str, state: SessionState):
+        """Store a session's state and mark it as just used."""
+        with self.lock:
+            now = state.last_seen = self.clock()
+            self.sessions[session_id] = state
+            self.sessions.move_to_end(session_id)
+            self.drop_idle(now)
+            if self.max_sessions is not None:
+                while len(self.sessions) > self.max_sessions:
+                    self.sessions.popitem(last=False)
+                    self.evictions += 1
+
+    def delete(self, session_id: str):
+        with self.lock:
+            self.sessions.pop(session_id, None)
+
+    def expire(self) -> int:
+        """Drop every idle session now; return how many went."""
+        with self.lock:
+            return self.drop_idle(self.clock())
+
+    def drop_idle(self, now: float) -> int:
+        """Drop idle sessions from the front of the queue. Call with the lock held."""
+        if self.ttl is None:
+            return 0
+        dropped = 0
+        while self.sessions:
+            session_id, state = next(iter(self.sessions.items()))
+            if now - state.last_seen <= self.ttl:
+                break
+            del self.sessions[session_id]
+            dropped += 1
+        self.expirations += dropped
+        return dropped
+
+
+class SQLiteSessionStore:
+    """Sessions in a SQLite database file, shared by every process that opens it.
+
+    Works as a local stand-in for a networked store such as Redis: worker
+    processes on one machine see each other's sessions, and the file
+    outlives restarts. The database is in WAL mode so readers don't block
+    the writer, and last_seen is wall-clock time so every process agrees on
+    it. Idle sessions are swept every SQLITE_SWEEP_INTERVAL writes. Any
+    object with the same get, put, delete and __len__ methods can take the
+    place of either store.
+    """
+
+    def __init__(self, path: str, ttl: Optional[float] = SESSION_TTL, clock: Callable[[], float] = time.time):
+        # Imported here so processes keeping sessions in memory never load it
+        import sqlite3
+
+        self.path = path
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.writes = 0
+        # Autocommit: every statement is its own short transaction
+        self.connection = sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "id TEXT PRIMARY KEY, user_name TEXT, agent_name TEXT, intent TEXT, facility TEXT, "
+            "offer TEXT, turns INTEGER NOT NULL, last_seen REAL NOT NULL) WITHOUT ROWID"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen)")
+        self.select = f"SELECT {', '.join(COLUMNS)} FROM sessions WHERE id = ?"
+        self.upsert = f"INSERT OR REPLACE INTO sessions (id, {', '.join(COLUMNS)}) VALUES ({', '.join('?' * (len(COLUMNS) + 1))})"
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        """Return the state of a live session, or None if it's unknown or has expired."""
+        with self.lock:
+            row = self.connection.execute(self.select, (session_id,)).fetchone()
+        if row is None:
+            return None
+        state = SessionState(*row)
+        if self.ttl is not None and self.clock() - state.last_seen > self.ttl:
+            self.delete(session_id)
+            return None
+        return state
+
+    def put(self, session_id: str, state: SessionState):
+        """Store a session's state and mark it as just used."""
+        state.last_seen = self.clock()
+        with self.lock:
+            self.connection.execute(self.upsert, (session_id,) + tuple(getattr(state, name) for name in COLUMNS))
+            self.writes += 1
+            sweep = self.writes % SQLITE_SWEEP_INTERVAL == 0
+        if sweep:
+            self.expire()
+
+    def delete(self, session_id: str):
+        with self.lock:
+            self.connection.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def expire(self) -> int:
+        """Drop every idle session now; return how many went."""
+        if self.ttl is None:
+            return 0
+        with self.lock:
+            return self.connection.execute("DELETE FROM sessions WHERE last_seen < ?", (self.clock() - self.ttl,)).rowcount
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,352 @@
+import argparse
+from collections import deque
+import json
+import logging
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from typing import BinaryIO, Deque, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+try:
+    import zstandard
+except ImportError:  # zlib is used unless zstd is asked for
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Identifies a segment file and the layout version it was written with
+SEGMENT_MAGIC = b"CHATLOG\x01"
+# Codec, compressed length, record count, CRC-32 of the compressed bytes,
+# earliest and latest timestamp in the block
+BLOCK_HEADER = struct.Struct("<BIIIdd")
+# Offset of a block in its segment, earliest and latest timestamp
+INDEX_ENTRY = struct.Struct("<Qdd")
+# Length of one encoded record inside a decompressed block
+RECORD_LENGTH = struct.Struct("<I")
+
+SEGMENT_SUFFIX = ".log"
+INDEX_SUFFIX = ".idx"
+
+# Codecs a block can be compressed with, as numbered in its header
+CODECS = {"zlib": 1, "zstd": 2}
+
+# Records per block; the writer also wakes every FLUSH_INTERVAL seconds to
+# write out a partial one
+BLOCK_RECORDS = 512
+FLUSH_INTERVAL = 1.0
+
+# A writer starts a new segment once its current one reaches this size
+MAX_SEGMENT_BYTES = 64 * 1024 * 1024
+
+# Messages waiting for the writer thread before new ones are dropped
+QUEUE_SIZE = 100000
+
+# Environment variable the GUIs read their transcript directory from
+TRANSCRIPT_DIR_VARIABLE = "CHATBOT_TRANSCRIPT_DIR"
+
+
+class TranscriptError(Exception):
+    """Raised when a file in a transcript directory isn't a transcript segment."""
+
+
+class TranscriptRecord(NamedTuple):
+    """One message in a conversation; speaker is "user" or "bot"."""
+    timestamp: float
+    session: str
+    speaker: str
+    text: str
+
+
+class TranscriptWriter:
+    """Appends conversation messages to a directory of compressed, append-only segment files.
+
+    append() only puts the message on a deque, so callers on the GUI thread
+    or the server's event loop never wait for the disk; a background thread
+    packs messages into blocks of length-prefixed JSON records, compresses
+    each block with zlib (or zstd, with the zstandard package) and appends
+    it to the current segment. Each segment has an index file listing its
+    blocks' offsets and time ranges, so readers can seek straight to a time
+    range. Every writer starts segments of its own, named after the
+    earliest timestamp in them and the process id, so several processes
+    can share one directory and readers can pass over whole segments that
+    start after the time range they want.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        compression: str = "zlib",
+        block_records: int = BLOCK_RECORDS,
+        flush_interval: float = FLUSH_INTERVAL,
+        max_segment_bytes: int = MAX_SEGMENT_BYTES,
+        queue_size: int = QUEUE_SIZE
+    ):
+        if compression not in CODECS:
+            raise ValueError(f"compression must be one of {', '.join(CODECS)}")
+        if compression == "zstd":
+            if zstandard is None:
+                raise ImportError("zstd compression needs the zstandard package: pip install zstandard")
+            self.compress = zstandard.ZstdCompressor().compress
+        else:
+            self.compress = zlib.compress
+        self.codec = CODECS[compression]
+        self.directory = directory
+        self.block_records = block_records
+        self.flush_interval = flush_interval
+        self.max_segment_bytes = max_segment_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        # Messages waiting to be written, with flush() markers among them
+        self.buffer: Deque[Union[Tuple[float, str, str, str], threading.Event]] = deque()
+        self.queue_size = queue_size
+        self.wakeup = threading.Event()
+        self.stopping = False
+        self.dropped = 0
+        self.records_written = 0
+        self.blocks_written = 0
+        self.segment: Optional[BinaryIO] = None
+        self.index: Optional[BinaryIO] = None
+        self.segment_bytes = 0
+        self.segments_started = 0
+        self.thread: Optional[threading.Thread] = threading.Thread(target=self.run, name="transcript-writer", daemon=True)
+        self.thread.start()
+
+    def __enter__(self) -> "TranscriptWriter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def append(self, session: str, speaker: str, text: str, timestamp: Optional[float] = None):
+        """Queue one message for writing. Never blocks: if the writer has fallen far behind, the message is dropped.
+
+        timestamp defaults to now; given ones should rise from call to call,
+        as a segment is named after its first.
+        """
+        buffer = self.buffer
+        if len(buffer) >= self.queue_size:
+            self.dropped += 1
+            return
+        # deque.append is atomic, so this needs no lock
+        buffer.append((time.time() if timestamp is None else timestamp, session, speaker, text))
+        if len(buffer) >= self.block_records:
+            self.wakeup.set()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every message appended so far has been written; return False on timeout."""
+        written = threading.Event()
+        self.buffer.append(written)
+        self.wakeup.set()
+        return written.wait(timeout)
+
+    def close(self):
+        """Write out whatever is waiting and stop the writer thread."""
+        if self.thread is None:
+            return
+        self.stopping = True
+        self.wakeup.set()
+        self.thread.join()
+        self.thread = None
+
+    def run(self):
+        while True:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            stopping = self.stopping
+
+            # Write everything waiting, in blocks of up to block_records
+            pending: List[Tuple[float, str, str, str]] = []
+            while self.buffer:
+                item = self.buffer.popleft()
+                if isinstance(item, threading.Event):
+                    if pending:
+                        self.write_block(pending)
+                        pending = []
+                    item.set()
+                    continue
+                pending.append(item)
+                if len(pending) >= self.block_records:
+                    self.write_block(pending)
+                    pending = []
+            if pending:
+                self.write_block(pending)
+
+            if stopping:
+                for stream in (self.segment, self.index):
+                    if stream is not None:
+                        stream.close()
+                return
+
+    def write_block(self, records: List[Tuple[float, str, str, str]]):
+        """Compress records into one block and append it to the current segment."""
+        payload = bytearray()
+        for record in records:
+            data = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            payload += RECORD_LENGTH.pack(len(data))
+            payload += data
+        compressed = self.compress(bytes(payload))
+        timestamps = [record[0] for record in records]
+        earliest, latest = min(timestamps), max(timestamps)
+        header = BLOCK_HEADER.pack(self.codec, len(compressed), len(records), zlib.crc32(compressed), earliest, latest)
+
+        try:
+            if self.segment is None or self.segment_bytes >= self.max_segment_bytes:
+                self.start_segment(earliest)
+            offset = self.segment_bytes
+            # The block goes in before its index entry, so an index never
+            # points past the end of its segment
+            self.segment.write(header + compressed)
+            self.segment.flush()
+            self.segment_bytes += len(header) + len(compressed)
+            self.index.write(INDEX_ENTRY.pack(offset, earliest, latest))
+            self.index.flush()
+        except OSError:
+            logger.exception("Could not write %d transcript records", len(records))
+            return
+        self.records_written += len(records)
+        self.blocks_written += 1
+
+    def start_segment(self, earliest: float):
+        """Close the current segment and open a new one, named after the earliest timestamp it will hold."""
+        for stream in (self.segment, self.index):
+            if stream is not None:
+                stream.close()
+        self.segments_started += 1
+        name = f"{int(earliest * 1000):013d}-{os.getpid()}-{self.segments_started:04d}"
+        path = os.path.join(self.directory, name + SEGMENT_SUFFIX)
+        self.segment = open(path, "xb")
+        self.segment.write(SEGMENT_MAGIC)
+        self.segment_bytes = len(SEGMENT_MAGIC)
+        self.index = open(os.path.join(self.directory, name + INDEX_SUFFIX), "wb")
+
+
+def writer_from_environment() -> Optional[TranscriptWriter]:
+    """Return a writer for the directory named by CHATBOT_TRANSCRIPT_DIR, or None if it isn't set."""
+    directory = os.environ.get(TRANSCRIPT_DIR_VARIABLE)
+    return TranscriptWriter(directory) if directory else None
+
+
+def segment_paths(directory: str) -> List[str]:
+    """Return the segment files in a transcript directory, oldest first."""
+    names = sorted(name for name in os.listdir(directory) if name.endswith(SEGMENT_SUFFIX))
+    return [os.path.join(directory, name) for name in names]
+
+def segment_start(path: str) -> Optional[float]:
+    """Return the earliest timestamp a segment can hold, from its name, or None if the name doesn't say."""
+    prefix = os.path.basename(path).split("-", 1)[0]
+    return int(prefix) / 1000 if prefix.isdigit() else None
+
+def scan_blocks(segment: BinaryIO, offset: int) -> Iterator[Tuple[int, float, float]]:
+    """Yield (offset, earliest, latest) for each complete block from offset onwards, reading only headers."""
+    end = segment.seek(0, os.SEEK_END)
+    while offset + BLOCK_HEADER.size <= end:
+        segment.seek(offset)
+        _, length, _, _, earliest, latest = BLOCK_HEADER.unpack(segment.read(BLOCK_HEADER.size))
+        if offset + BLOCK_HEADER.size + length > end:
+            return
+        yield offset, earliest, latest
+        offset += BLOCK_HEADER.size + length
+
+def block_index(path: str, segment: BinaryIO) -> List[Tuple[int, float, float]]:
+    """Return (offset, earliest, latest) for every block in a segment.
+
+    Blocks come from the index file; any written after its last entry (the
+    writer stopped in between) or in a segment with no index are found by
+    scanning the block headers.
+    """
+    entries = []
+    try:
+        with open(path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX, "rb") as index:
+            data = index.read()
+        # A partly written last entry is ignored
+        usable = len(data) - len(data) % INDEX_ENTRY.size
+        entries = list(INDEX_ENTRY.iter_unpack(data[:usable]))
+    except OSError:
+        pass
+
+    offset = len(SEGMENT_MAGIC)
+    if entries:
+        last = entries[-1][0]
+        segment.seek(last)
+        header = segment.read(BLOCK_HEADER.size)
+        if len(header) < BLOCK_HEADER.size:
+            return entries[:-1]
+        offset = last + BLOCK_HEADER.size + BLOCK_HEADER.unpack(header)[1]
+    return entries + list(scan_blocks(segment, offset))
+
+def decompress(codec: int, data: bytes) -> bytes:
+    if codec == CODECS["zlib"]:
+        return zlib.decompress(data)
+    if codec == CODECS["zstd"]:
+        if zstandard is None:
+            raise ImportError("Reading zstd transcripts needs the zstandard package: pip install zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise TranscriptError(f"Unknown transcript block codec {codec}")
+
+def read_segment(path: str, start: Optional[float] = None, end: Optional[float] = None) -> Iterator[TranscriptRecord]:
+    """Yield the records in one segment timestamped between start and end, in the order they were written.
+
+    Blocks outside the time range are skipped without being read. A
+    block cut short or damaged, e.g. by a crash mid-write, ends the
+    segment early.
+    """
+    with open(path, "rb") as segment:
+        if segment.read(len(SEGMENT_MAGIC)) != SEGMENT_MAGIC:
+            raise TranscriptError(f"{path} is not a transcript segment")
+        for offset, earliest, latest in block_index(path, segment):
+            if (start is not None and latest < start) or (end is not None and earliest > end):
+                continue
+            segment.seek(offset)
+            codec, length, _, checksum, _, _ = BLOCK_HEADER.unpack(segment.read(BLOCK_HEADER.size))
+            compressed = segment.read(length)
+            if len(compressed) < length or zlib.crc32(compressed) != checksum:
+                logger.warning("Stopped reading %s at a damaged block at offset %d", path, offset)
+                return
+            payload = decompress(codec, compressed)
+
+            position = 0
+            while position < len(payload):
+                (size,) = RECORD_LENGTH.unpack_from(payload, position)
+                position += RECORD_LENGTH.size
+                record = TranscriptRecord(*json.loads(payload[position:position + size]))
+                position += size
+                if (start is None or record.timestamp >= start) and (end is None or record.timestamp <= end):
+                    yield record
+
+def read_transcripts(directory: str, start: Optional[float] = None, end: Optional[float] = None) -> Iterator[TranscriptRecord]:
+    """Yield every record in a transcript directory timestamped between start and end.
+
+    Segments are read oldest first and one block at a time, so memory use
+    stays flat however much has been logged. Segments named as starting
+    after end aren't opened at all. Records from writers running at the
+    same time come out segment by segment rather than strictly in time
+    order.
+    """
+    for path in segment_paths(directory):
+        # Names sort by start time, so every segment from here on starts too late
+        started = segment_start(path)
+        if end is not None and started is not None and started > end:
+            return
+        yield from read_segment(path, start, end)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print transcript records as JSON lines.")
+    parser.add_argument("directory")
+    parser.add_argument("--since", type=float, help="earliest Unix timestamp to print")
+    parser.add_argument("--until", type=float, help="latest Unix timestamp to print")
+    parser.add_argument("--session", help="only print this session's messages")
+    args = parser.parse_args()
+
+    try:
+        for record in read_transcripts(args.directory, args.since, args.until):
+            if args.session is None or record.session == args.session:
+                print(json.dumps(record._asdict(), ensure_ascii=False))
+    except (OSError, TranscriptError) as error:
+        sys.exit(f"Could not read transcripts: {error}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import json
+import multiprocessing
+import pickle
+import subprocess
+import sys
+from pathlib import Path
+
+from Chatbot.chat_cli import generate_message_replies
+from Chatbot.chatbot_logic import IntentEngine, generate_responses, respond_chunk, set_worker_engine
+from Chatbot.instrumentation import Instrumentation
+
+ROOT = Path(__file__).resolve().parent.parent
+MESSAGES = ["hi", "where is the gym", "when does the library open", "thanks", "gibberish words"] * 40
+
+
+def test_engine_pickles_with_cache_and_instrumentation():
+    engine = IntentEngine(cache_size=10, instrumentation=Instrumentation())
+    engine.respond("hi")
+    copy = pickle.loads(pickle.dumps(engine))
+    assert copy.describe_facility("library") == engine.describe_facility("library")
+    assert copy.cache.info().currsize == 1
+    assert copy.respond("where is the gym") == engine.respond("where is the gym")
+
+
+def test_spawned_workers_answer_with_the_given_engine():
+    jobs = [(5, number, MESSAGES[number * 50:(number + 1) * 50]) for number in range(4)]
+    engine = IntentEngine(cache_size=100)
+    with multiprocessing.get_context("spawn").Pool(2, set_worker_engine, (engine,)) as pool:
+        sharded = [reply for chunk in pool.map(respond_chunk, jobs) for reply in chunk]
+    assert sharded == list(generate_responses(MESSAGES, seed=5, chunksize=50))
+
+
+def test_spawned_workers_build_the_shared_engine_themselves():
+    jobs = [(5, number, MESSAGES[number * 50:(number + 1) * 50]) for number in range(4)]
+    with multiprocessing.get_context("spawn").Pool(2, set_worker_engine, (None,)) as pool:
+        sharded = [reply for chunk in pool.map(respond_chunk, jobs) for reply in chunk]
+    assert sharded == list(generate_responses(MESSAGES, seed=5, chunksize=50))
+
+
+def test_cli_workers_under_spawn(tmp_path):
+    source = tmp_path / "messages.jsonl"
+    source.write_text("".join(
+        json.dumps({"session": f"s{index % 3}", "message": message}) + "\n" for index, message in enumerate(MESSAGES)
+    ))
+    script = (
+        "import multiprocessing, sys\n"
+        "if __name__ == '__main__':\n"
+        "    multiprocessing.set_start_method('spawn', force=True)\n"
+        "    from Chatbot import chat_cli\n"
+        "    sys.argv = ['chat_cli'] + sys.argv[1:]\n"
+        "    chat_cli.main()\n"
+    )
+
+    def run(*options):
+        return subprocess.run(
+            [sys.executable, "-c", script, "--jsonl", "--seed", "3", "--cache-size", "50", *options, str(source)],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout
+
+    assert run("--workers", "2") == run("--workers", "1")
+
+
+def test_dropped_sessions_are_the_same_for_any_worker_count():
+    # s2 pushes out s0, the least recently active, but not s1
+    messages = [({}, session_id, text) for session_id, text in [
+        ("s0", "where is the gym"),
+        ("s1", "where is the gym"),
+        ("s1", "when does it open"),
+        ("s2", "where is the gym"),
+        ("s1", "when does it open"),
+        ("s0", "when does it open")
+    ]]
+
+    def run(processes):
+        return [reply for _, reply in generate_message_replies(messages, seed=2, processes=processes, chunksize=4, max_sessions=2)]
+
+    replies = run(1)
+    assert replies[4] == "The gym is open from 6:00 AM to 10:00 PM."
+    assert replies[5] != replies[4]
+    assert run(3) == replies
@@ -0,0 +1,19 @@
+import pytest
+
+from Chatbot.chatbot_logic import is_exit_message
+
+
+@pytest.mark.parametrize("message", [
+    "bye", "Goodbye!", "good bye", "quit", "close", "ok bye", "See you.",
+    "thanks, bye", "Thanks so much! Goodbye.", "great - see you later", "that's all; bye for now!"
+])
+def test_farewells_end_the_conversation(message):
+    assert is_exit_message(message)
+
+
+@pytest.mark.parametrize("message", [
+    "how do I say goodbye", "what time will I see you", "when does the gym close",
+    "i'm sleepy", "bye, where is the library?", "say bye to the library", "", "?!"
+])
+def test_messages_merely_mentioning_a_farewell_do_not(message):
+    assert not is_exit_message(message)
@@ -0,0 +1,62 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+
+from Chatbot.chatbot_logic import IntentEngine
+from Chatbot.fallback_classifier import FALLBACK_THRESHOLD, FallbackClassifier
+from Chatbot.instrumentation import Instrumentation
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return IntentEngine(fallback_threshold=FALLBACK_THRESHOLD)
+
+
+@pytest.mark.parametrize("message", ["who are you", "are you a robot", "what is the meaning of life"])
+def test_near_misses_get_the_default_replies(engine, message):
+    resolution = engine.resolve(message)
+    assert resolution.intent == "default" and resolution.confidence == 0.0
+
+
+@pytest.mark.parametrize("message, intent, facility", [
+    ("libary hours pls", "facility", "library"),
+    ("wher is the cafetria", "facility", "cafeteria"),
+    ("helo", "greeting", None),
+    ("thnks so much", "gratitude", None)
+])
+def test_typos_are_still_answered(engine, message, intent, facility):
+    resolution = engine.resolve(message)
+    assert (resolution.intent, resolution.facility) == (intent, facility)
+    assert FALLBACK_THRESHOLD <= resolution.confidence < 1.0
+
+
+def test_phrases_need_every_word_but_descriptions_only_a_score():
+    classifier = FallbackClassifier([
+        ("how are you", "how_are_you"),
+        ("bookstore they have all your textbook needs and university merchandise", "bookstore")
+    ])
+    assert classifier.classify("who are you") is None
+    assert classifier.classify("how are yuo")[0] == "how_are_you"
+    assert classifier.classify("textbook needs")[0] == "bookstore"
+
+
+def test_batch_agrees_with_one_at_a_time(engine):
+    messages = ["who are you", "libary hours pls", "helo", "are you a robot", "gym membrship", ""]
+    batch = engine.fallback.classify_many(messages)
+    single = [engine.fallback.classify(message) for message in messages]
+    assert [found and found[0] for found in batch] == [found and found[0] for found in single]
+    assert [found and found[1] for found in batch] == pytest.approx([found and found[1] for found in single])
+
+
+def test_unanswered_messages_are_traced_with_no_confidence():
+    instrumentation = Instrumentation()
+    engine = IntentEngine(fallback_threshold=FALLBACK_THRESHOLD, instrumentation=instrumentation)
+    traces = []
+    instrumentation.add_listener(traces.append)
+    engine.respond("who are you")
+    engine.respond("libary hours pls")
+    assert [(trace.intent, trace.fallback) for trace in traces] == [("default", True), ("facility", True)]
+    assert traces[0].confidence == 0.0 and 0.0 < traces[1].confidence < 1.0
+    assert instrumentation.fallback_attempts == 2 and instrumentation.fallback_hits == 1
+    assert IntentEngine().resolve("who are you").confidence == 0.0
@@ -0,0 +1,65 @@
+import marshal
+
+import pytest
+
+from Chatbot.fuzzy_index import FuzzyIndex, edit_distance
+
+NAMES = ["library", "student center", "student", "coffee shop", "gym", "art studio"]
+
+
+@pytest.mark.parametrize("source, target, distance", [
+    ("library", "library", 0), ("libary", "library", 1), ("libaray", "library", 2), ("librray", "library", 1),
+    ("centre", "center", 1), ("cofee", "coffee", 1)
+])
+def test_edit_distance(source, target, distance):
+    assert edit_distance(source, target, 2) == distance
+
+
+def test_edit_distance_gives_up_past_the_limit():
+    assert edit_distance("gym", "library", 2) == 3
+    assert edit_distance("abcdef", "uvwxyz", 1) == 2
+
+
+@pytest.mark.parametrize("words, name", [
+    (["libary"], "library"),
+    (["libaray", "hours"], "library"),
+    (["studnet", "centre"], "student center"),
+    (["cofee", "shop"], "coffee shop"),
+    (["gym"], "gym")
+])
+def test_lookup_corrects_typos(words, name):
+    assert FuzzyIndex(NAMES).lookup(words)[0] == name
+
+
+def test_exact_name_is_fully_confident_and_typos_less_so():
+    index = FuzzyIndex(NAMES)
+    assert index.lookup(["library"]) == ("library", 1.0)
+    name, confidence = index.lookup(["libary"])
+    assert name == "library" and confidence == pytest.approx(1 - 1 / 7)
+
+
+def test_short_words_must_be_spelt_exactly():
+    index = FuzzyIndex(NAMES)
+    assert index.lookup(["gim"]) is not None
+    assert FuzzyIndex(["my"]).lookup(["mx"]) is None
+    assert index.lookup(["xyzzy"]) is None
+
+
+def test_ties_go_to_the_longer_name():
+    # "student" and "student center" both match exactly; the longer run wins
+    for names in (["student", "student center"], ["student center", "student"]):
+        assert FuzzyIndex(names).lookup(["student", "center", "hours"]) == ("student center", 1.0)
+    assert FuzzyIndex(["student", "student center"]).lookup(["student", "union"]) == ("student", 1.0)
+
+
+def test_equal_matches_go_to_the_name_indexed_first():
+    assert FuzzyIndex(["gym", "gem"]).lookup(["gxm"])[0] == "gym"
+    assert FuzzyIndex(["gem", "gym"]).lookup(["gxm"])[0] == "gem"
+
+
+def test_state_round_trip():
+    index = FuzzyIndex(NAMES)
+    rebuilt = FuzzyIndex.from_state(marshal.loads(marshal.dumps(index.to_state())))
+    assert len(rebuilt) == len(index)
+    for words in (["libary"], ["studnet", "centre"], ["art", "studoi"], ["nothing"]):
+        assert rebuilt.lookup(words) == index.lookup(words)
@@ -0,0 +1,105 @@
+import time
+
+import pytest
+
+tk = pytest.importorskip("tkinter")
+
+from Chatbot.chatbot_gui import VirtualChatLog
+
+
+@pytest.fixture
+def chat_log():
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        pytest.skip("no display")
+    log = VirtualChatLog(root, bubble_width=400, user_color="#616161", bot_color="#9E9E9E", text_color="#FFFFFF")
+    log.pack(fill="both", expand=True)
+    root.update()
+    yield log
+    root.destroy()
+
+
+def drain(log):
+    while log.queued or log.flush_pending:
+        log.update()
+
+
+def test_add_many_keeps_order_across_batches(chat_log):
+    entries = [(f"message {number}", number % 2 == 0) for number in range(chat_log.BATCH_SIZE * 2 + 7)]
+    chat_log.add("first", is_user=True)
+    chat_log.add_many(entries)
+    assert len(chat_log.history) == 1
+    drain(chat_log)
+    assert chat_log.history.messages == ["first"] + [message for message, _ in entries]
+    assert list(chat_log.history.senders) == [1] + [1 if is_user else 0 for _, is_user in entries]
+
+
+def test_queued_messages_come_before_later_changes(chat_log):
+    chat_log.add_many([("one", True), ("two", False)])
+    chat_log.add("three", is_user=True)
+    assert chat_log.history.messages == ["one", "two", "three"]
+
+    chat_log.add_many([("four", False)])
+    chat_log.replace_last("FOUR")
+    assert chat_log.history.messages == ["one", "two", "three", "FOUR"]
+
+    chat_log.add_many([("five", True)])
+    chat_log.remove_last()
+    assert chat_log.history.messages == ["one", "two", "three", "FOUR"]
+    assert chat_log.history.total_height == sum(chat_log.history.heights)
+
+
+def test_resize_events_redraw_once(chat_log):
+    renders = []
+    chat_log.schedule_render = lambda: renders.append(True)
+    for _ in range(20):
+        chat_log.on_configure(None)
+    deadline = time.monotonic() + 1.0
+    while time.monotonic() < deadline and not renders:
+        chat_log.update()
+    time.sleep(chat_log.RESIZE_DELAY / 1000 * 2)
+    chat_log.update()
+    assert renders == [True]
+
+
+class RecordingTranscript:
+    def __init__(self):
+        self.records = []
+
+    def append(self, session, speaker, text):
+        self.records.append((speaker, text))
+
+
+@pytest.fixture
+def gui():
+    from Chatbot.chatbot_gui import ModernChatbotGUI
+    try:
+        app = ModernChatbotGUI(transcript=RecordingTranscript())
+    except tk.TclError:
+        pytest.skip("no display")
+    app.handle_name_submission()
+    yield app
+    app.executor.shutdown(wait=True)
+    app.window.destroy()
+
+
+def send(app, message):
+    app.entry.delete(0, tk.END)
+    app.entry.insert(0, message)
+    app.handle_user_input()
+
+
+def test_reply_finished_but_not_polled_is_kept_when_another_message_is_sent(gui):
+    send(gui, "where is the library")
+    gui.pending[1].result(timeout=5)
+    # The reply is complete on the worker thread but the Tk side hasn't
+    # polled it yet when the next message goes out
+    send(gui, "thanks")
+    gui.pending[1].result(timeout=5)
+    while gui.pending is not None:
+        gui.window.update()
+    messages = gui.chat_log.history.messages
+    assert messages[2].startswith("The library is located in") and gui.TYPING_MESSAGE not in messages
+    assert [speaker for speaker, _ in gui.transcript.records] == ["bot", "user", "bot", "user", "bot"]
+    assert gui.transcript.records[2][1] == messages[2]
@@ -0,0 +1,44 @@
+import json
+
+from Chatbot.hot_reload import ReloadingEngine
+from Chatbot.session_store import SessionState
+
+
+def write_rules(path, facilities):
+    path.write_text(json.dumps({"facilities": facilities}))
+
+
+SAUNA = {
+    "location": "Pool Building, lower floor",
+    "hours": "7:00 AM to 9:00 PM",
+    "details": "Towels are provided. Would you like the booking rules?",
+    "follow_up": "Book a slot at the pool reception."
+}
+
+
+def test_follow_up_to_a_facility_dropped_by_a_reload(tmp_path):
+    path = tmp_path / "rules.json"
+    write_rules(path, {"sauna": SAUNA})
+    engine = ReloadingEngine([str(path)], include_builtin=False)
+    state = SessionState("Sam", "Alex")
+    assert "Pool Building" in engine.respond_in_context("where is the sauna", state)
+    assert state.offer == "sauna"
+
+    write_rules(path, {"steam room": dict(SAUNA, location="Pool Building, upper floor")})
+    assert engine.reload()
+    # The offer went with the facility, so "yes" is answered as a message of its own
+    reply = engine.respond_in_context("yes", state)
+    assert reply in engine.engine.default_responses
+    assert state.offer is None and state.facility is None
+
+
+def test_reference_to_a_facility_dropped_by_a_reload(tmp_path):
+    path = tmp_path / "rules.json"
+    write_rules(path, {"sauna": SAUNA})
+    engine = ReloadingEngine([str(path)], include_builtin=False)
+    state = SessionState("Sam", "Alex")
+    engine.respond_in_context("where is the sauna", state)
+    write_rules(path, {"steam room": SAUNA})
+    assert engine.reload()
+    assert engine.respond_in_context("when does it open?", state) in engine.engine.default_responses
+    assert state.facility is None
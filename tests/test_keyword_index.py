@@ -0,0 +1,54 @@
+import marshal
+
+from Chatbot.keyword_index import KeywordIndex
+
+
+def test_find_all_reports_overlapping_keywords():
+    index = KeywordIndex(["center", "student center", "student"])
+    text = "Is the Student Center near the center?"
+    assert sorted(index.find_all(text)) == [
+        (7, 14, "student"), (7, 21, "student center"), (15, 21, "center"), (31, 37, "center")
+    ]
+
+
+def test_whole_words_only():
+    index = KeywordIndex(["gym", "art"])
+    assert index.best_match("where is the gymnasium for martial arts") is None
+    assert index.best_match("where is the GYM?") == "gym"
+
+
+def test_longer_keywords_win_whatever_the_order():
+    for keywords in (["center", "student center"], ["student center", "center"]):
+        index = KeywordIndex(keywords)
+        assert index.best_match("the center by the student center") == "student center"
+
+
+def test_equal_lengths_go_to_the_keyword_indexed_first():
+    assert KeywordIndex(["library", "gym"]).best_match("gym or library") == "library"
+    assert KeywordIndex(["gym", "library"]).best_match("library or gym") == "gym"
+
+
+def test_failure_links_find_keywords_inside_a_broken_off_match():
+    # "student center" fails at "hall", where "center hall" carries on
+    index = KeywordIndex(["student center office", "center hall"])
+    assert index.best_match("student center hall") == "center hall"
+
+
+def test_duplicate_keywords_are_indexed_once():
+    index = KeywordIndex(["gym", "GYM", "library"])
+    assert len(index) == 2 and index.keywords == ["gym", "library"]
+
+
+def test_best_match_words_skips_messages_sharing_no_word():
+    index = KeywordIndex(["coffee shop"])
+    assert index.best_match_words(["hello", "there"]) is None
+    assert index.best_match_words(["coffee", "please"]) is None
+    assert index.best_match_words(["the", "coffee", "shop"]) == "coffee shop"
+
+
+def test_state_round_trip():
+    index = KeywordIndex(["center", "student center", "coffee shop", "gym"])
+    rebuilt = KeywordIndex.from_state(marshal.loads(marshal.dumps(index.to_state())))
+    for text in ("student center", "the center", "coffee shop gym", "nothing here"):
+        assert rebuilt.best_match(text) == index.best_match(text)
+        assert list(rebuilt.find_all(text)) == list(index.find_all(text))
@@ -0,0 +1,106 @@
+import marshal
+import subprocess
+import sys
+import zlib
+from pathlib import Path
+
+import pytest
+
+from Chatbot import knowledge_base
+from Chatbot.knowledge_base import (
+    SNAPSHOT_HEADER,
+    SNAPSHOT_MAGIC,
+    KnowledgeBaseError,
+    load_engine,
+    load_source,
+    read_snapshot,
+    source_digest
+)
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_malformed_yaml_names_the_file(tmp_path):
+    pytest.importorskip("yaml")
+    path = tmp_path / "rules.yaml"
+    path.write_text("intents:\n  greeting: [unclosed\n")
+    with pytest.raises(KnowledgeBaseError, match="rules.yaml"):
+        load_source(str(path))
+
+
+def test_yaml_of_the_wrong_shape_names_the_file(tmp_path):
+    pytest.importorskip("yaml")
+    path = tmp_path / "rules.yaml"
+    path.write_text("facilities:\n  - gym\n  - pool\n")
+    with pytest.raises(KnowledgeBaseError, match="rules.yaml"):
+        load_source(str(path))
+
+
+def test_json_of_the_wrong_shape_names_the_file(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text('{"intents": {"greeting": ["hi"]}}')
+    with pytest.raises(KnowledgeBaseError, match="rules.json"):
+        load_source(str(path))
+
+
+def test_malformed_csv_names_the_file(tmp_path):
+    path = tmp_path / "facilities.csv"
+    # A field past the csv module's size limit is a csv.Error
+    path.write_text('name,location,hours,details\ngym,"' + "x" * 200000 + '",9-5,\n')
+    with pytest.raises(KnowledgeBaseError, match="facilities.csv"):
+        load_source(str(path))
+
+
+def test_csv_missing_columns_names_the_file(tmp_path):
+    path = tmp_path / "facilities.csv"
+    path.write_text("name,location\ngym,Block C\n")
+    with pytest.raises(KnowledgeBaseError, match="facilities.csv"):
+        load_source(str(path))
+
+
+def test_digest_follows_the_builtin_tables(monkeypatch):
+    before = source_digest([])
+    monkeypatch.setattr(knowledge_base, "DEFAULT_RESPONSES", ["Something else entirely."])
+    assert source_digest([]) != before
+    assert source_digest([], include_builtin=False) == source_digest([], include_builtin=False)
+
+
+def test_bad_pattern_names_the_file_and_rule(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text('{"intents": {"greeting": {"(hello|hi": ["Hello!"]}}}')
+    with pytest.raises(KnowledgeBaseError, match=r"greeting in .*rules\.json"):
+        load_source(str(path))
+
+
+def test_chat_cli_reports_a_bad_pattern_without_a_traceback(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text('{"intents": {"greeting": {"(hello|hi": ["Hello!"]}}}')
+    result = subprocess.run(
+        [sys.executable, "-m", "Chatbot.chat_cli", "--rules", str(path)],
+        input="hello\n", capture_output=True, text=True, cwd=ROOT
+    )
+    assert result.returncode == 1
+    assert "Bad pattern" in result.stderr and "Traceback" not in result.stderr
+
+
+def write_snapshot(path, payload):
+    with open(path, "wb") as snapshot:
+        snapshot.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, zlib.crc32(payload), len(payload)))
+        snapshot.write(payload)
+
+
+@pytest.mark.parametrize("payload", [
+    # A frozenset holding a list: marshal raises TypeError on it
+    b">\x01\x00\x00\x00[\x00\x00\x00\x00",
+    b"\xff\xff",
+    marshal.dumps(["not", "a", "snapshot"]),
+    marshal.dumps({"digest": ""})
+])
+def test_corrupt_snapshot_is_rebuilt(tmp_path, payload):
+    snapshot = tmp_path / "kb.snap"
+    write_snapshot(snapshot, payload)
+    with pytest.raises(KnowledgeBaseError):
+        read_snapshot(str(snapshot))
+    engine = load_engine([], str(snapshot))
+    assert "library" in engine.respond("where is the library")
+    assert read_snapshot(str(snapshot))["digest"] == source_digest([])
@@ -0,0 +1,145 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from Chatbot import schedule
+from Chatbot.schedule import (
+    MINUTES_PER_DAY,
+    MINUTES_PER_WEEK,
+    Schedule,
+    ScheduleError,
+    ScheduleIndex,
+    parse_days,
+    parse_hours,
+    parse_time,
+    parse_when
+)
+
+# A Monday
+MONDAY = datetime(2024, 1, 1)
+
+
+def at(day, hour, minute=0):
+    return MONDAY + timedelta(days=day, hours=hour, minutes=minute)
+
+
+@pytest.mark.parametrize("text, minutes", [
+    ("9:00 AM", 9 * 60), ("9pm", 21 * 60), ("12:30 a.m.", 30), ("12 PM", 12 * 60),
+    ("21:15", 21 * 60 + 15), ("noon", 12 * 60), ("midnight", 0), ("9 30 pm", 21 * 60 + 30)
+])
+def test_parse_time(text, minutes):
+    assert parse_time(text) == minutes
+
+
+def test_midnight_ends_the_day_when_it_ends_a_range():
+    assert parse_time("midnight", end=True) == MINUTES_PER_DAY
+    assert parse_time("12:00 AM", end=True) == MINUTES_PER_DAY
+
+
+@pytest.mark.parametrize("text", ["25:00", "13 pm", "9:75", "soon"])
+def test_parse_time_rejects_nonsense(text):
+    with pytest.raises(ScheduleError):
+        parse_time(text)
+
+
+@pytest.mark.parametrize("text, days", [
+    ("Mon-Fri", (0, 1, 2, 3, 4)), ("weekends", (5, 6)), ("Sat & Sun", (5, 6)),
+    ("Fri to Mon", (0, 4, 5, 6)), ("every day", tuple(range(7))), ("9:00 AM", None)
+])
+def test_parse_days(text, days):
+    assert parse_days(text) == days
+
+
+def test_later_parts_override_earlier_ones():
+    intervals = parse_hours("Daily 9:00 AM to 5:00 PM; Sat 10:00 AM to 2:00 PM; Sun closed")
+    assert intervals == [
+        (day * MINUTES_PER_DAY + 9 * 60, day * MINUTES_PER_DAY + 17 * 60) for day in range(5)
+    ] + [(5 * MINUTES_PER_DAY + 10 * 60, 5 * MINUTES_PER_DAY + 14 * 60)]
+
+
+def test_overnight_hours_run_into_the_next_day_and_wrap_round_the_week():
+    intervals = parse_hours("10:00 PM to 2:00 AM")
+    # Sunday night's hours carry on into Monday morning
+    assert intervals[0] == (0, 2 * 60)
+    assert intervals[1] == (22 * 60, MINUTES_PER_DAY + 2 * 60)
+    assert intervals[-1] == (6 * MINUTES_PER_DAY + 22 * 60, MINUTES_PER_WEEK)
+
+
+def test_always_open_and_unreadable_hours():
+    assert parse_hours("Open 24/7") == [(0, MINUTES_PER_WEEK)]
+    assert Schedule.parse("24 hours").always_open
+    with pytest.raises(ScheduleError):
+        parse_hours("by appointment")
+
+
+def test_overnight_schedule():
+    bar = Schedule.parse("Fri-Sat 8:00 PM to 1:00 AM")
+    assert bar.is_open(at(5, 0, 30))  # Friday's hours, early on Saturday
+    assert not bar.is_open(at(6, 1, 30))
+    assert bar.open_until(at(4, 23)) == at(5, 1)
+    assert bar.next_opening(at(0, 12)) == at(4, 20)
+    assert bar.hours_on(at(5, 0).date()) == [(0, 60), (20 * 60, MINUTES_PER_DAY)]
+
+
+def test_closed_on_dates():
+    gym = Schedule.parse("Mon-Fri 6:00 AM to 10:00 PM", closed_on="2024-01-01, 2024-01-02")
+    assert not gym.is_open(at(0, 12))
+    assert gym.next_opening(at(0, 12)) == at(2, 6)
+    assert gym.hours_on(date(2024, 1, 2)) == []
+    assert gym.hours_on(date(2024, 1, 3)) == [(6 * 60, 22 * 60)]
+    with pytest.raises(ScheduleError):
+        Schedule.parse("9:00 AM to 5:00 PM", closed_on="next tuesday")
+
+
+def test_always_open_until_a_closed_day():
+    desk = Schedule.parse("24/7", closed_on=["2024-01-03"])
+    assert desk.open_until(at(0, 12)) == at(2, 0)
+    assert desk.next_opening(at(2, 12)) == at(3, 0)
+    assert Schedule.parse("24/7").open_until(at(0, 12)) is None
+
+
+def test_schedule_index_matches_every_schedule(monkeypatch):
+    # Small checkpoints so queries replay changes from several of them
+    monkeypatch.setattr(schedule, "CHECKPOINT_INTERVAL", 4)
+    schedules = {
+        f"room {number}": Schedule.parse(f"Mon-Sat {7 + number % 5}:00 AM to {number % 7 + 1}:30 PM; Sun closed")
+        for number in range(30)
+    }
+    schedules["bar"] = Schedule.parse("Fri-Sat 8:00 PM to 1:00 AM")
+    schedules["desk"] = Schedule.parse("24/7", closed_on="2024-01-03")
+    index = ScheduleIndex(schedules)
+    assert len(index.checkpoints) > 2
+    for minute in range(0, MINUTES_PER_WEEK, 10):
+        when = MONDAY + timedelta(minutes=minute)
+        assert sorted(index.open_at(when)) == sorted(name for name, found in schedules.items() if found.is_open(when))
+
+
+def test_schedule_index_later_the_same_day():
+    index = ScheduleIndex({
+        "library": Schedule.parse("9:00 AM to 5:00 PM"),
+        "bar": Schedule.parse("8:00 PM to 1:00 AM"),
+        "gym": Schedule.parse("Mon closed; Tue-Sun 6:00 AM to 10:00 PM")
+    })
+    assert sorted(index.open_after(at(0, 18))) == ["bar"]
+    assert sorted(index.open_on(at(1, 0).date())) == ["bar", "gym", "library"]
+
+
+@pytest.mark.parametrize("phrase, expected", [
+    ("now", ("now", at(2, 15, 10))),
+    ("at 9pm", ("time", at(2, 21))),
+    ("tomorrow at 9am", ("time", at(3, 9))),
+    ("on sunday", ("day", at(6, 0))),
+    ("on monday", ("day", at(7, 0))),
+    ("tonight", ("time", at(2, 20))),
+    ("at midnight", ("time", at(3, 0))),
+    ("on friday at midnight", ("time", at(5, 0))),
+    ("whenever", ("now", at(2, 15, 10)))
+])
+def test_parse_when(phrase, expected):
+    moment = parse_when(phrase, at(2, 15, 10))
+    assert (moment.kind, moment.moment) == expected
+
+
+def test_parse_when_after_and_late_tonight():
+    assert parse_when("after 9pm", at(2, 12)).after
+    assert parse_when("tonight", at(2, 22)) == ("now", at(2, 22), False)
@@ -0,0 +1,175 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from Chatbot.admission import AdmissionController
+from Chatbot.chat_server import ChatServer
+from Chatbot.chatbot_logic import IntentEngine
+
+
+class SlowEngine(IntentEngine):
+    """Takes a while over any message mentioning "slow"."""
+
+    def respond_in_context(self, user_input, state, rng=None):
+        if "slow" in user_input:
+            time.sleep(0.5)
+        return super().respond_in_context(user_input, state, rng)
+
+
+async def request(port, method, path, payload=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nConnection: close\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+    data = await reader.read()
+    writer.close()
+    head, _, body = data.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+
+async def answer_while_slow(server):
+    await server.start()
+    port = server.server.sockets[0].getsockname()[1]
+    slow = asyncio.ensure_future(request(port, "POST", "/chat", {"message": "a slow question"}))
+    await asyncio.sleep(0.05)
+    started = time.monotonic()
+    status, reply = await request(port, "POST", "/chat", {"message": "where is the gym"})
+    waited = time.monotonic() - started
+    assert (await slow)[0] == 200
+    server.server.close()
+    return status, reply, waited
+
+
+def test_slow_message_does_not_hold_up_others():
+    status, reply, waited = asyncio.run(answer_while_slow(ChatServer(SlowEngine(), port=0)))
+    assert status == 200 and "gym" in reply["response"]
+    assert waited < 0.3
+
+
+def test_slow_message_under_admission_control_does_not_hold_up_others():
+    # The other engine threads answer the queue while one is on the slow message
+    admission = AdmissionController(deadline=0.2)
+    status, reply, waited = asyncio.run(answer_while_slow(ChatServer(SlowEngine(), port=0, admission=admission)))
+    assert status == 200 and "gym" in reply["response"]
+    assert "degraded" not in reply
+    assert waited < 0.3
+    assert admission.workers == 4 and admission.metrics()["answered"] == 2
+
+
+def test_slow_message_with_one_admission_worker_gets_cheap_reply_for_others():
+    # With one worker the one behind the slow message misses its deadline
+    # and gets the cheap answer rather than waiting on
+    admission = AdmissionController(deadline=0.2, workers=1)
+    status, reply, waited = asyncio.run(answer_while_slow(ChatServer(SlowEngine(), port=0, admission=admission)))
+    assert status == 200 and "gym" in reply["response"]
+    assert reply.get("degraded") is True
+    assert admission.metrics()["degraded"] == 1
+
+
+def test_admission_rejects_rates_it_cannot_refill_at():
+    for options in ({"rate": 0}, {"rate": -1.0}, {"rate": 1.0, "burst": 0.5}):
+        with pytest.raises(ValueError):
+            AdmissionController(**options)
+
+class SlowStreamEngine(IntentEngine):
+    """Takes a while over the second part of every streamed reply."""
+
+    def respond_stream(self, user_input, rng=None, state=None):
+        yield "The first part. "
+        time.sleep(0.5)
+        yield "The second part."
+
+
+async def stream_first_delta(server):
+    await server.start()
+    port = server.server.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps({"message": "hello", "stream": True}).encode()
+    started = time.monotonic()
+    writer.write(f"POST /chat HTTP/1.1\r\nConnection: close\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+    await reader.readuntil(b"\r\n\r\n")
+    objects = []
+    first_after = None
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        if line.startswith(b"{"):
+            objects.append(json.loads(line))
+            if first_after is None:
+                first_after = time.monotonic() - started
+    writer.close()
+    server.server.close()
+    return objects, first_after
+
+
+def test_streamed_reply_sends_each_part_as_it_is_ready():
+    objects, first_after = asyncio.run(stream_first_delta(ChatServer(SlowStreamEngine(), port=0)))
+    assert [item.get("delta") for item in objects[:2]] == ["The first part. ", "The second part."]
+    assert objects[-1]["response"] == "The first part. The second part." and objects[-1]["done"]
+    assert first_after < 0.3
+
+
+class OverlapEngine(IntentEngine):
+    """Counts how many messages each conversation has being answered at once."""
+
+    def __init__(self):
+        super().__init__()
+        self.active = {}
+        self.most = 0
+
+    def respond_in_context(self, user_input, state, rng=None):
+        key = id(state)
+        self.active[key] = self.active.get(key, 0) + 1
+        self.most = max(self.most, self.active[key])
+        time.sleep(0.05)
+        self.active[key] -= 1
+        return super().respond_in_context(user_input, state, rng)
+
+
+class BrokenEngine(IntentEngine):
+    def respond_in_context(self, user_input, state, rng=None):
+        raise RuntimeError("broken rules")
+
+
+async def serve(server, requests):
+    await server.start()
+    port = server.server.sockets[0].getsockname()[1]
+    try:
+        return await requests(port)
+    finally:
+        server.server.close()
+
+
+def test_requests_in_one_session_take_turns():
+    engine = OverlapEngine()
+
+    async def requests(port):
+        _, first = await request(port, "POST", "/chat", {"message": "where is the gym"})
+        session = first["session"]
+        replies = await asyncio.gather(*(
+            request(port, "POST", "/chat", {"message": message, "session": session})
+            for message in ("hello", "thanks", "where is the library")
+        ))
+        return session, replies
+
+    session, replies = asyncio.run(serve(ChatServer(engine, port=0), requests))
+    assert all(status == 200 and reply["session"] == session for status, reply in replies)
+    assert engine.most == 1
+
+
+def test_session_of_the_wrong_type_is_a_bad_request():
+    async def requests(port):
+        return await request(port, "POST", "/chat", {"message": "hello", "session": ["a", "b"]})
+
+    status, reply = asyncio.run(serve(ChatServer(port=0), requests))
+    assert status == 400 and "session" in reply["error"]
+
+
+def test_engine_failure_is_a_server_error():
+    async def requests(port):
+        return await request(port, "POST", "/chat", {"message": "hello"})
+
+    status, reply = asyncio.run(serve(ChatServer(BrokenEngine(), port=0), requests))
+    assert status == 500 and reply == {"error": "internal error"}
@@ -0,0 +1,28 @@
+from Chatbot.chatbot_logic import ChatSession, IntentEngine
+from Chatbot.instrumentation import Instrumentation
+
+CONVERSATION = ["where is the library", "yes", "when does it open", "thanks", "is it busy there", "no"]
+
+
+def test_one_trace_and_one_cache_entry_per_message():
+    instrumentation = Instrumentation()
+    traces = []
+    instrumentation.add_listener(traces.append)
+    engine = IntentEngine(cache_size=100, instrumentation=instrumentation)
+    session = ChatSession(seed=1, engine=engine)
+    for message in CONVERSATION:
+        session.respond(message)
+
+    assert [trace.intent for trace in traces] == ["where", "follow_up", "hours", "gratitude", "facility", "decline"]
+    assert len(traces) == len(CONVERSATION)
+    assert instrumentation.messages == len(CONVERSATION)
+    # "yes" and "no" take up or turn down an offer and never reach the
+    # cache; "when does it open" is cached as sent, not as rewritten for
+    # this conversation
+    assert list(engine.cache.entries) == ["where is the library", "when does it open", "thanks", "is it busy there"]
+
+
+def test_replies_do_not_depend_on_instrumentation_or_cache():
+    plain = ChatSession(seed=7, engine=IntentEngine())
+    traced = ChatSession(seed=7, engine=IntentEngine(cache_size=10, instrumentation=Instrumentation()))
+    assert [plain.respond(message) for message in CONVERSATION] == [traced.respond(message) for message in CONVERSATION]
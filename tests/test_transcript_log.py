@@ -0,0 +1,102 @@
+import os
+
+import pytest
+
+from Chatbot import transcript_log
+from Chatbot.transcript_log import (
+    INDEX_SUFFIX,
+    SEGMENT_SUFFIX,
+    TranscriptRecord,
+    TranscriptWriter,
+    read_transcripts,
+    segment_paths,
+    segment_start
+)
+
+START = 1700000000.0
+
+
+def write(directory, records, **options):
+    with TranscriptWriter(str(directory), **options) as writer:
+        for record in records:
+            writer.append(record.session, record.speaker, record.text, record.timestamp)
+    return writer
+
+
+def conversation(count, start=START):
+    return [
+        TranscriptRecord(start + number, f"session {number % 3}", "user" if number % 2 == 0 else "bot", f"message {number} é")
+        for number in range(count)
+    ]
+
+
+def test_round_trip(tmp_path):
+    records = conversation(1200)
+    writer = write(tmp_path, records, block_records=100)
+    assert writer.blocks_written == 12
+    assert list(read_transcripts(str(tmp_path))) == records
+    assert [name[-4:] for name in sorted(os.listdir(tmp_path))] == [INDEX_SUFFIX, SEGMENT_SUFFIX]
+
+
+def test_round_trip_zstd(tmp_path):
+    pytest.importorskip("zstandard")
+    records = conversation(300)
+    write(tmp_path, records, compression="zstd", block_records=64)
+    assert list(read_transcripts(str(tmp_path))) == records
+
+
+def test_rollover_starts_segments_named_after_their_first_record(tmp_path):
+    records = conversation(1000)
+    writer = write(tmp_path, records, block_records=50, max_segment_bytes=2000)
+    paths = segment_paths(str(tmp_path))
+    assert writer.segments_started == len(paths) > 2
+    assert all(os.path.exists(path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX) for path in paths)
+    assert segment_start(paths[0]) == START
+    assert list(read_transcripts(str(tmp_path))) == records
+    # Each segment starts with the record after the last one in the one before
+    firsts = [next(transcript_log.read_segment(path)).timestamp for path in paths]
+    assert [segment_start(path) for path in paths] == firsts
+
+
+def test_time_range(tmp_path):
+    records = conversation(1000)
+    write(tmp_path, records, block_records=50, max_segment_bytes=2000)
+    assert list(read_transcripts(str(tmp_path), START + 120, START + 480.5)) == records[120:481]
+
+
+def test_segments_starting_after_the_range_are_not_opened(tmp_path, monkeypatch):
+    write(tmp_path, conversation(1000), block_records=50, max_segment_bytes=2000)
+    opened = []
+    read_segment = transcript_log.read_segment
+
+    def recording_read_segment(path, start=None, end=None):
+        opened.append(path)
+        return read_segment(path, start, end)
+
+    monkeypatch.setattr(transcript_log, "read_segment", recording_read_segment)
+    found = list(read_transcripts(str(tmp_path), end=START + 99))
+    assert len(found) == 100
+    paths = segment_paths(str(tmp_path))
+    assert opened == [path for path in paths if segment_start(path) <= START + 99] and len(opened) < len(paths)
+
+
+def test_blocks_missing_from_the_index_are_found_by_scanning(tmp_path):
+    records = conversation(500)
+    write(tmp_path, records, block_records=50)
+    (index,) = [name for name in os.listdir(tmp_path) if name.endswith(INDEX_SUFFIX)]
+    # Lose the last few entries and half of one more, as a crash might
+    path = tmp_path / index
+    path.write_bytes(path.read_bytes()[:transcript_log.INDEX_ENTRY.size * 6 + 5])
+    assert list(read_transcripts(str(tmp_path))) == records
+    path.unlink()
+    assert list(read_transcripts(str(tmp_path))) == records
+
+
+def test_damaged_block_ends_the_segment(tmp_path):
+    records = conversation(500)
+    write(tmp_path, records, block_records=50)
+    (segment,) = segment_paths(str(tmp_path))
+    with open(segment, "r+b") as stream:
+        stream.seek(-10, os.SEEK_END)
+        stream.write(b"\xff" * 10)
+    assert list(read_transcripts(str(tmp_path))) == records[:450]